@@ -0,0 +1,92 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+class DigestCache:
+    """
+    Cache kết quả tóm tắt, khóa là hash của (model, prompt, toàn bộ nội dung trước khi chia chunk, loại bài).
+    Lưu trong một file SQLite cục bộ; entry hết hạn theo TTL và khi vượt max_entries
+    thì xóa các entry lâu không dùng nhất. Dùng chung được giữa nhiều thread.
+    """
+
+    # Cứ sau bấy nhiêu lần ghi thì dọn entry hết hạn / vượt kích thước một lần
+    EVICT_EVERY = 100
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        ttl_seconds: Optional[int] = None,
+        max_entries: Optional[int] = None,
+    ):
+        self.path = Path(path or os.getenv("DIGEST_CACHE_PATH", ".cache/digests.sqlite3"))
+        self.ttl_seconds = ttl_seconds or int(os.getenv("DIGEST_CACHE_TTL_DAYS", "30")) * 86400
+        self.max_entries = max_entries or int(os.getenv("DIGEST_CACHE_MAX_ENTRIES", "50000"))
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS digest_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS ix_digest_cache_accessed_at ON digest_cache (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(model_name: str, prompt: str, content: str, article_type: str) -> str:
+        payload = json.dumps([model_name, prompt, content, article_type], ensure_ascii=False)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM digest_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl_seconds:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE digest_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, key: str, value: Dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO digest_cache (key, value, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, json.dumps(value, ensure_ascii=False), now, now),
+            )
+            self._writes += 1
+            if self._writes % self.EVICT_EVERY == 0:
+                self._evict(now)
+            self._conn.commit()
+
+    def _evict(self, now: float) -> None:
+        self._conn.execute("DELETE FROM digest_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+        self._conn.execute(
+            "DELETE FROM digest_cache WHERE key IN ("
+            " SELECT key FROM digest_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": round(self.hit_rate, 3)}
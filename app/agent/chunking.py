@@ -0,0 +1,59 @@
+import re
+from typing import List
+
+from .tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# Ranh giới câu: dấu kết câu hoặc xuống dòng (transcript thường chỉ có khoảng trắng)
+_SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?…])\s+|\n+")
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cắt văn bản về khoảng max_tokens token, ưu tiên cắt ở khoảng trắng."""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars]
+
+
+def _split_long_piece(piece: str, max_chars: int) -> List[str]:
+    """Tách một câu quá dài theo từ (transcript không dấu câu rơi vào trường hợp này)."""
+    parts: List[str] = []
+    current: List[str] = []
+    current_len = 0
+    for word in piece.split():
+        if current and current_len + len(word) + 1 > max_chars:
+            parts.append(" ".join(current))
+            current, current_len = [], 0
+        current.append(word)
+        current_len += len(word) + 1
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def split_into_chunks(text: str, max_tokens: int) -> List[str]:
+    """
+    Chia văn bản thành các đoạn liên tiếp, mỗi đoạn không quá max_tokens token.
+    Cắt ở ranh giới câu khi có thể, nếu không thì cắt theo từ.
+    """
+    max_chars = int(max_tokens * CHARS_PER_TOKEN)
+    chunks: List[str] = []
+    current: List[str] = []
+    current_len = 0
+
+    for sentence in _SENTENCE_BOUNDARY.split(text):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        pieces = [sentence] if len(sentence) <= max_chars else _split_long_piece(sentence, max_chars)
+        for piece in pieces:
+            if current and current_len + len(piece) + 1 > max_chars:
+                chunks.append(" ".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + 1
+
+    if current:
+        chunks.append(" ".join(current))
+    return chunks
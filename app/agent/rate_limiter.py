@@ -0,0 +1,59 @@
+import threading
+import time
+from typing import Optional
+
+
+class RateLimiter:
+    """
+    Giới hạn số request/phút và token/phút dùng chung giữa các worker (thread-safe).
+    Mỗi giới hạn là một token bucket đầy lúc khởi tạo và nạp lại đều theo thời gian.
+    Giá trị None nghĩa là không giới hạn.
+    """
+
+    def __init__(self, requests_per_minute: Optional[int] = None, tokens_per_minute: Optional[int] = None):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+
+        self._lock = threading.Lock()
+        self._request_allowance = float(requests_per_minute or 0)
+        self._token_allowance = float(tokens_per_minute or 0)
+        self._last_refill = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        if self.requests_per_minute:
+            self._request_allowance = min(
+                float(self.requests_per_minute),
+                self._request_allowance + elapsed * self.requests_per_minute / 60,
+            )
+        if self.tokens_per_minute:
+            self._token_allowance = min(
+                float(self.tokens_per_minute),
+                self._token_allowance + elapsed * self.tokens_per_minute / 60,
+            )
+
+    def acquire(self, tokens: int = 0) -> None:
+        """Chặn cho tới khi đủ hạn mức cho 1 request tiêu tốn `tokens` token."""
+        if self.tokens_per_minute:
+            # Một request lớn hơn cả hạn mức/phút vẫn phải được chạy (chờ bucket đầy)
+            tokens = min(tokens, self.tokens_per_minute)
+
+        while True:
+            with self._lock:
+                self._refill()
+                wait = 0.0
+                if self.requests_per_minute and self._request_allowance < 1:
+                    wait = max(wait, (1 - self._request_allowance) * 60 / self.requests_per_minute)
+                if self.tokens_per_minute and self._token_allowance < tokens:
+                    wait = max(wait, (tokens - self._token_allowance) * 60 / self.tokens_per_minute)
+
+                if wait == 0.0:
+                    if self.requests_per_minute:
+                        self._request_allowance -= 1
+                    if self.tokens_per_minute:
+                        self._token_allowance -= tokens
+                    return
+
+            time.sleep(wait)
@@ -1,10 +1,19 @@
 import os
 import json
-from typing import Optional
-import google.generativeai as genai
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
 from pydantic import BaseModel, ValidationError
 
+from .. import metrics
+from .cache import DigestCache
+from .chunking import split_into_chunks, truncate_to_tokens
+from .rate_limiter import RateLimiter
+from .tokens import estimate_tokens
+
 load_dotenv()
 
 class DigestOutput(BaseModel):
@@ -24,34 +33,137 @@ Hướng dẫn bắt buộc:
 5. Định dạng: Trả về kết quả dưới dạng JSON object với đúng 2 key là "title" và "summary".
 """
 
+# Request gộp dùng system instruction riêng: PROMPT bắt trả về 1 object, mâu thuẫn với array
+BATCH_PROMPT = PROMPT.replace(
+    '5. Định dạng: Trả về kết quả dưới dạng JSON object với đúng 2 key là "title" và "summary".',
+    '5. Định dạng: Mỗi request có nhiều bài, đánh dấu "### id: <số>". Trả về một JSON array, '
+    'mỗi bài một object với đúng 3 key là "id" (giữ nguyên id của bài), "title" và "summary".',
+)
+# Ép đúng dạng array ở phía API (structured output), không chỉ dựa vào lời dặn trong prompt
+BATCH_RESPONSE_SCHEMA = {
+    "type": "array",
+    "items": {
+        "type": "object",
+        "properties": {
+            "id": {"type": "integer"},
+            "title": {"type": "string"},
+            "summary": {"type": "string"},
+        },
+        "required": ["id", "title", "summary"],
+    },
+}
+
+# Mã HTTP đáng thử lại: quá hạn mức (429) và lỗi phía server (5xx)
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+# Số token dự trù cho phần trả lời (title + summary) khi tính hạn mức token/phút
+OUTPUT_TOKEN_ESTIMATE = 300
+# --- CHUẨN BỊ NỘI DUNG THEO NGÂN SÁCH TOKEN ---
+# Nội dung không vượt ngưỡng này được gửi nguyên vẹn
+CONTENT_TOKEN_BUDGET = 2500
+# Nội dung dài hơn: chia thành các đoạn ~CHUNK_TOKENS token, tóm tắt từng đoạn (map)
+# rồi tóm tắt lại từ các ghi chú (reduce)
+CHUNK_TOKENS = 2000
+# Số đoạn tối đa; transcript rất dài thì tăng kích thước đoạn thay vì tăng số request
+MAX_CHUNKS = 8
+# Số đoạn được tóm tắt song song cho một bài
+CHUNK_WORKERS = 4
+
+# --- CHẾ ĐỘ GỘP NHIỀU BÀI TRONG 1 REQUEST ---
+# Tổng token đầu vào tối đa của một request gộp
+BATCH_TOKEN_BUDGET = 6000
+# Số bài tối đa trong một request gộp
+BATCH_MAX_ITEMS = 10
+# Bài dài hơn ngưỡng này đi đường đơn lẻ (gộp không còn lợi)
+BATCH_ITEM_MAX_TOKENS = 1500
+
 class DigestAgent:
-    def __init__(self):
+    def __init__(
+        self,
+        rate_limiter: Optional[RateLimiter] = None,
+        cache: Optional[DigestCache] = None,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+    ):
+        # SDK Gemini nặng (~1s import): chỉ nạp khi thật sự tạo agent, không nạp khi import module
+        import google.generativeai as genai
+
         # 1. Cấu hình API Key (Bắt buộc cho thư viện cũ)
         api_key = os.getenv("GOOGLE_API_KEY")
         if not api_key:
             raise ValueError("GOOGLE_API_KEY not found in environment variables")
         
-        genai.configure(api_key=api_key)
+        # GEMINI_API_ENDPOINT cho phép trỏ tới một endpoint giả lập (vd: http://127.0.0.1:8080) khi test
+        api_endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        if api_endpoint:
+            genai.configure(api_key=api_key, transport="rest", client_options={"api_endpoint": api_endpoint})
+        else:
+            genai.configure(api_key=api_key)
         
-        self.model = genai.GenerativeModel("gemini-2.5-flash", system_instruction=PROMPT)
+        self.model_name = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+        self.model = genai.GenerativeModel(self.model_name, system_instruction=PROMPT)
+        self.batch_model = genai.GenerativeModel(self.model_name, system_instruction=BATCH_PROMPT)
 
-    def generate_digest(
-        self, title: str, content: str, article_type: str
-    ) -> Optional[DigestOutput]:
+        self.rate_limiter = rate_limiter
+        self.cache = cache
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+
+    def _generate_content(self, user_prompt: str, output_tokens: int = OUTPUT_TOKEN_ESTIMATE, batch: bool = False):
+        """
+        Gọi model, chờ hạn mức của rate limiter và thử lại với jittered backoff khi gặp 429/5xx.
+        batch=True: dùng batch_model (BATCH_PROMPT) và schema JSON array.
+        """
+        from google.api_core import exceptions as google_exceptions
+
+        model = self.batch_model if batch else self.model
+        generation_config = {"response_mime_type": "application/json"}
+        if batch:
+            generation_config["response_schema"] = BATCH_RESPONSE_SCHEMA
+        prompt_tokens = estimate_tokens((BATCH_PROMPT if batch else PROMPT) + user_prompt)
+        for attempt in range(self.max_retries + 1):
+            if self.rate_limiter:
+                with metrics.track("llm_rate_limit_wait"):
+                    self.rate_limiter.acquire(prompt_tokens + output_tokens)
+            try:
+                with metrics.track("llm_request", model=self.model_name) as tracked:
+                    try:
+                        response = model.generate_content(user_prompt, generation_config=generation_config)
+                    except google_exceptions.GoogleAPICallError as e:
+                        tracked.set(outcome=str(e.code))
+                        raise
+                metrics.counter("llm_prompt_tokens_total").inc(prompt_tokens, model=self.model_name)
+                return response
+            except google_exceptions.GoogleAPICallError as e:
+                if e.code not in RETRYABLE_STATUS_CODES or attempt == self.max_retries:
+                    raise
+                metrics.counter("llm_retries_total").inc(code=e.code)
+                # Full jitter: chờ ngẫu nhiên trong [0, min(cap, base * 2^attempt)]
+                delay = random.uniform(0, min(self.backoff_cap, self.backoff_base * 2 ** attempt))
+                print(f"Gemini trả lỗi {e.code}, thử lại sau {delay:.1f}s (lần {attempt + 1}/{self.max_retries})")
+                time.sleep(delay)
+
+    def _cache_key(self, content: str, article_type: str, batch: bool = False) -> Optional[str]:
+        """Khóa gắn với prompt thật sự tạo ra kết quả: PROMPT (đơn lẻ) hoặc BATCH_PROMPT (gộp)."""
+        if not self.cache:
+            return None
+        return DigestCache.make_key(self.model_name, BATCH_PROMPT if batch else PROMPT, content, article_type)
+
+    def _cached(self, content: str, article_type: str) -> Optional[DigestOutput]:
+        """Kết quả đã có trong cache, tạo bởi request đơn lẻ hoặc request gộp."""
+        if not self.cache:
+            return None
+        for batch in (False, True):
+            cached = self.cache.get(self._cache_key(content, article_type, batch=batch))
+            if cached is not None:
+                return DigestOutput(**cached)
+        return None
+
+    def _request_digest(self, user_prompt: str) -> Optional[DigestOutput]:
         try:
-            # Nhắc lại yêu cầu tiếng Việt trong user prompt để chắc chắn
-            user_prompt = (
-                f"Hãy tóm tắt nội dung sau bằng Tiếng Việt.\n"
-                f"Loại bài: {article_type}\n"
-                f"Tiêu đề gốc: {title}\n"
-                f"Nội dung: {content[:8000]}"
-            )
-            
-            # 3. Gọi hàm generate
-            response = self.model.generate_content(
-                user_prompt,
-                generation_config={"response_mime_type": "application/json"}
-            )
+            # 3. Gọi hàm generate (có rate limit + retry)
+            response = self._generate_content(user_prompt)
             
             if response.text:
                 response_data = json.loads(response.text)
@@ -63,4 +175,166 @@ class DigestAgent:
             return None
         except Exception as e:
             print(f"Lỗi hệ thống: {e}")
-            return
\ No newline at end of file
+            return None
+
+    def _summarize_chunk(self, title: str, chunk: str, index: int, total: int, article_type: str) -> Optional[DigestOutput]:
+        # Bước map: ghi chú chi tiết hơn bản tóm tắt cuối để bước reduce không mất ý
+        user_prompt = (
+            f"Đây là phần {index}/{total} của một nội dung dài. "
+            f"Hãy tóm tắt riêng phần này bằng Tiếng Việt, phần summary viết 4-6 câu, "
+            f"giữ lại các số liệu, tên riêng và ý chính.\n"
+            f"Loại bài: {article_type}\n"
+            f"Tiêu đề gốc: {title}\n"
+            f"Nội dung phần {index}: {chunk}"
+        )
+        return self._request_digest(user_prompt)
+
+    def prepare_content(self, title: str, content: str, article_type: str) -> str:
+        """
+        Đưa nội dung về trong CONTENT_TOKEN_BUDGET token.
+        Nội dung ngắn giữ nguyên; nội dung dài được chia đoạn, tóm tắt song song
+        từng đoạn và ghép các ghi chú lại làm đầu vào cho bản tóm tắt cuối.
+        """
+        tokens = estimate_tokens(content)
+        if tokens <= CONTENT_TOKEN_BUDGET:
+            return content
+
+        chunk_tokens = max(CHUNK_TOKENS, math.ceil(tokens / MAX_CHUNKS))
+        chunks = split_into_chunks(content, chunk_tokens)
+        with ThreadPoolExecutor(max_workers=min(CHUNK_WORKERS, len(chunks))) as pool:
+            partials = list(pool.map(
+                lambda item: self._summarize_chunk(title, item[1], item[0], len(chunks), article_type),
+                enumerate(chunks, 1),
+            ))
+
+        notes = [f"Phần {idx}: {partial.summary}" for idx, partial in enumerate(partials, 1) if partial]
+        if not notes:
+            # Không tóm tắt được đoạn nào: quay về cắt theo ngân sách token
+            return truncate_to_tokens(content, CONTENT_TOKEN_BUDGET)
+        return truncate_to_tokens("\n".join(notes), CONTENT_TOKEN_BUDGET)
+
+    def _summarize_one(self, title: str, content: str, article_type: str) -> Optional[DigestOutput]:
+        content = self.prepare_content(title, content, article_type)
+        # Nhắc lại yêu cầu tiếng Việt trong user prompt để chắc chắn
+        user_prompt = (
+            f"Hãy tóm tắt nội dung sau bằng Tiếng Việt.\n"
+            f"Loại bài: {article_type}\n"
+            f"Tiêu đề gốc: {title}\n"
+            f"Nội dung: {content}"
+        )
+        return self._request_digest(user_prompt)
+
+    def generate_digest(
+        self, title: str, content: str, article_type: str
+    ) -> Optional[DigestOutput]:
+        # Cùng model + prompt + nội dung + loại bài => dùng lại kết quả, không gọi API
+        cached = self._cached(content, article_type)
+        if cached is not None:
+            return cached
+
+        digest = self._summarize_one(title, content, article_type)
+        if digest and self.cache:
+            self.cache.put(self._cache_key(content, article_type), digest.model_dump())
+        return digest
+
+    def _summarize_batch(self, items: List[Dict[str, Any]]) -> Dict[str, DigestOutput]:
+        """
+        Gửi nhiều bài trong 1 request, yêu cầu trả về JSON array {id, title, summary}.
+        Chỉ trả về các phần tử hợp lệ; bài nào thiếu/lỗi thì caller xử lý lại.
+        """
+        sections = []
+        for idx, item in enumerate(items, 1):
+            sections.append(
+                f"### id: {idx}\n"
+                f"Loại bài: {item['article_type']}\n"
+                f"Tiêu đề gốc: {item['title']}\n"
+                f"Nội dung: {item['content']}"
+            )
+        user_prompt = (
+            f"Hãy tóm tắt TỪNG bài trong {len(items)} bài sau bằng Tiếng Việt, mỗi bài độc lập.\n\n"
+            + "\n\n".join(sections)
+        )
+
+        try:
+            response = self._generate_content(
+                user_prompt, output_tokens=OUTPUT_TOKEN_ESTIMATE * len(items), batch=True
+            )
+            response_data = json.loads(response.text) if response.text else []
+        except json.JSONDecodeError as e:
+            print(f"Lỗi khi đọc JSON từ AI (batch): {e}")
+            return {}
+        except Exception as e:
+            print(f"Lỗi hệ thống (batch): {e}")
+            return {}
+
+        if not isinstance(response_data, list):
+            return {}
+
+        results = {}
+        for element in response_data:
+            if not isinstance(element, dict):
+                continue
+            try:
+                idx = int(element.get("id"))
+                digest = DigestOutput(title=element.get("title"), summary=element.get("summary"))
+            except (TypeError, ValueError, ValidationError):
+                continue
+            if 1 <= idx <= len(items):
+                results[items[idx - 1]["key"]] = digest
+        return results
+
+    def _pack_batches(self, items: List[Dict[str, Any]]) -> List[List[Dict[str, Any]]]:
+        """Gom các bài ngắn thành từng lô sao cho tổng token không vượt BATCH_TOKEN_BUDGET."""
+        batches: List[List[Dict[str, Any]]] = []
+        current: List[Dict[str, Any]] = []
+        current_tokens = 0
+        for item in items:
+            tokens = estimate_tokens(item["title"]) + estimate_tokens(item["content"])
+            if current and (current_tokens + tokens > BATCH_TOKEN_BUDGET or len(current) >= BATCH_MAX_ITEMS):
+                batches.append(current)
+                current, current_tokens = [], 0
+            current.append(item)
+            current_tokens += tokens
+        if current:
+            batches.append(current)
+        return batches
+
+    def generate_digests(self, items: List[Dict[str, Any]]) -> Dict[str, Optional[DigestOutput]]:
+        """
+        Tóm tắt nhiều bài. items: [{"key", "title", "content", "article_type"}].
+        Bài ngắn được gộp vào các request chung; bài dài hoặc bài mà request gộp
+        trả về không hợp lệ sẽ đi lại đường đơn lẻ. Trả về {key: DigestOutput | None}.
+        """
+        results: Dict[str, Optional[DigestOutput]] = {}
+        # Bài cần lưu cache -> (item, kết quả có từ request gộp không)
+        fresh: Dict[str, Tuple[Dict[str, Any], bool]] = {}
+        batchable = []
+
+        for item in items:
+            cached = self._cached(item["content"], item["article_type"])
+            if cached is not None:
+                results[item["key"]] = cached
+                continue
+            if estimate_tokens(item["content"]) > BATCH_ITEM_MAX_TOKENS:
+                results[item["key"]] = self._summarize_one(item["title"], item["content"], item["article_type"])
+                fresh[item["key"]] = (item, False)
+            else:
+                batchable.append(item)
+
+        for batch in self._pack_batches(batchable):
+            batch_results = self._summarize_batch(batch) if len(batch) > 1 else {}
+            for item in batch:
+                digest = batch_results.get(item["key"])
+                from_batch = digest is not None
+                if digest is None:
+                    digest = self._summarize_one(item["title"], item["content"], item["article_type"])
+                results[item["key"]] = digest
+                fresh[item["key"]] = (item, from_batch)
+
+        if self.cache:
+            for key, (item, from_batch) in fresh.items():
+                digest = results[key]
+                if digest:
+                    cache_key = self._cache_key(item["content"], item["article_type"], batch=from_batch)
+                    self.cache.put(cache_key, digest.model_dump())
+        return results
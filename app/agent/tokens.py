@@ -0,0 +1,12 @@
+import math
+
+# Ước lượng thô cho Gemini: văn bản tiếng Việt có dấu tốn token hơn tiếng Anh,
+# nên dùng hệ số thấp hơn mức ~4 ký tự/token thường gặp.
+CHARS_PER_TOKEN = 3.5
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng nhanh số token của một đoạn văn bản, không gọi API."""
+    if not text:
+        return 0
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
@@ -0,0 +1,180 @@
+"""
+Backfill một khoảng thời gian lớn theo từng lô nguồn, có checkpoint để chạy tiếp sau khi lỗi.
+
+- Nguồn (kênh YouTube, feed báo) được xử lý theo lô `batch_size` nguồn qua Pipeline;
+  Pipeline ghi DB theo lô nhỏ nên mọi thứ đã tải đều được commit ngay, không chờ tới cuối.
+- Sau mỗi lô, trạng thái từng nguồn được ghi vào backfill_checkpoints. Nguồn chỉ "done" khi
+  đọc được feed và mọi mục mới của nó đã ghi vào DB. Chạy lại cùng `--name` thì bỏ qua nguồn
+  đã xong; nguồn đang dở chỉ tải lại những mục chưa có trong DB.
+- Request không điều kiện (không qua cache HTTP): feed không đổi từ lần chạy trước vẫn
+  phải được đọc đầy đủ cho khoảng thời gian của backfill.
+- Bộ nhớ và phần việc mất khi lỗi chỉ phụ thuộc kích thước lô, không phụ thuộc khoảng thời gian.
+
+    python app/backfill.py --name 2024-q1 --hours 2160
+    python app/backfill.py --name 2024-q1 --hours 2160 --summarize --batch-size 5
+"""
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import YOUTUBE_CHANNELS, NEWS_RSS_FEEDS
+from app.database.repository import Repository
+from app.pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BATCH_SIZE = 10
+
+
+def _format_duration(seconds: float) -> str:
+    minutes, seconds = divmod(int(seconds), 60)
+    hours, minutes = divmod(minutes, 60)
+    return f"{hours}h{minutes:02d}m{seconds:02d}s" if hours else f"{minutes}m{seconds:02d}s"
+
+
+class Backfill:
+    def __init__(
+        self,
+        name: str,
+        hours: int,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        summarize: bool = False,
+        retry_failed: bool = True,
+        repo: Optional[Repository] = None,
+        channels: Optional[List[str]] = None,
+        feeds: Optional[List[str]] = None,
+        **pipeline_options,
+    ):
+        """
+        name: tên lượt backfill (khóa của checkpoint); chạy lại cùng tên để tiếp tục.
+        summarize=False: chỉ cào và lưu, tóm tắt để process_digests / worker làm sau.
+        """
+        self.name = name
+        self.hours = hours
+        self.batch_size = batch_size
+        self.summarize = summarize
+        self.retry_failed = retry_failed
+        self.repo = repo or Repository()
+        self.channels = YOUTUBE_CHANNELS if channels is None else channels
+        self.feeds = NEWS_RSS_FEEDS if feeds is None else feeds
+        self.pipeline_options = pipeline_options
+
+    def _checkpoint_id(self, kind: str, key: str) -> str:
+        return f"{self.name}:{kind}:{key}"
+
+    def pending_sources(self) -> Tuple[List[Tuple[str, str]], int]:
+        """Các nguồn còn phải chạy và tổng số nguồn của lượt backfill."""
+        sources = [("youtube", c) for c in self.channels] + [("news", u) for u in self.feeds]
+        checkpoints = self.repo.get_backfill_checkpoints(self.name)
+        skip = {"done", "failed"} if not self.retry_failed else {"done"}
+        pending = [
+            (kind, key) for kind, key in sources
+            if checkpoints.get(self._checkpoint_id(kind, key), {}).get("status") not in skip
+        ]
+        return pending, len(sources)
+
+    def _run_batch(self, batch: List[Tuple[str, str]]) -> Dict[str, Any]:
+        pipeline = Pipeline(
+            hours=self.hours,
+            channels=[key for kind, key in batch if kind == "youtube"],
+            feeds=[key for kind, key in batch if kind == "news"],
+            summarize=self.summarize,
+            http_cache=False,
+            **self.pipeline_options,
+        )
+        stats = asyncio.run(pipeline.run())
+
+        previous = self.repo.get_backfill_checkpoints(self.name)
+        now = datetime.now(timezone.utc)
+        checkpoints = []
+        for kind, key in batch:
+            checkpoint_id = self._checkpoint_id(kind, key)
+            # Nguồn có trong observed = đọc feed thành công; lost = số mục mới chưa ghi được DB
+            lost = pipeline.lost.get(key, 0)
+            ok = key in pipeline.observed and not lost
+            error = None
+            if key not in pipeline.observed:
+                error = "fetch failed"
+            elif lost:
+                error = f"{lost} items not persisted"
+            checkpoints.append({
+                "id": checkpoint_id,
+                "run": self.name,
+                "kind": kind,
+                "key": key,
+                "status": "done" if ok else "failed",
+                "entries": len(pipeline.observed.get(key, [])),
+                "attempts": previous.get(checkpoint_id, {}).get("attempts", 0) + 1,
+                "error": error,
+                "updated_at": now,
+            })
+        self.repo.save_backfill_checkpoints(checkpoints)
+        return {
+            "done": sum(1 for c in checkpoints if c["status"] == "done"),
+            "failed": sum(1 for c in checkpoints if c["status"] == "failed"),
+            "entries": sum(c["entries"] for c in checkpoints),
+            "persisted": stats["persist"].processed,
+        }
+
+    def run(self) -> Dict[str, int]:
+        pending, total = self.pending_sources()
+        already_done = total - len(pending)
+        logger.info(
+            f"Backfill '{self.name}' ({self.hours}h): {len(pending)} of {total} sources to go"
+            + (f", resuming after {already_done} done" if already_done else "")
+        )
+
+        totals = {"done": 0, "failed": 0, "entries": 0, "persisted": 0}
+        started = time.monotonic()
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            result = self._run_batch(batch)
+            for name in totals:
+                totals[name] += result[name]
+
+            processed = start + len(batch)
+            elapsed = time.monotonic() - started
+            eta = elapsed / processed * (len(pending) - processed)
+            logger.info(
+                f"[{already_done + processed}/{total}] +{result['persisted']} items "
+                f"({result['failed']} sources failed) | elapsed {_format_duration(elapsed)}, "
+                f"ETA {_format_duration(eta)}"
+            )
+
+        logger.info(
+            f"Backfill '{self.name}' finished: {totals['done']} sources done, {totals['failed']} failed, "
+            f"{totals['persisted']} items stored"
+        )
+        return totals
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Backfill có checkpoint cho khoảng thời gian lớn")
+    parser.add_argument("--name", required=True, help="Tên lượt backfill; chạy lại cùng tên để tiếp tục")
+    parser.add_argument("--hours", type=int, required=True, help="Lấy bài trong N giờ gần nhất")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Số nguồn mỗi lô")
+    parser.add_argument("--summarize", action="store_true", help="Tóm tắt luôn trong lúc backfill")
+    parser.add_argument("--skip-failed", action="store_true", help="Không thử lại nguồn đã lỗi ở lần trước")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    with Repository() as repo:
+        Backfill(
+            name=args.name,
+            hours=args.hours,
+            batch_size=args.batch_size,
+            summarize=args.summarize,
+            retry_failed=not args.skip_failed,
+            repo=repo,
+        ).run()
@@ -1,10 +1,31 @@
 import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
 from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
 from dotenv import load_dotenv
 load_dotenv()
 
+# Cấu hình pool (đọc từ env khi tạo engine lần đầu)
+DEFAULT_POOL_SIZE = 5
+DEFAULT_MAX_OVERFLOW = 10
+# Giây: đóng và mở lại kết nối cũ hơn ngưỡng này (tránh kết nối bị server/proxy cắt ngầm)
+DEFAULT_POOL_RECYCLE = 1800
+DEFAULT_POOL_TIMEOUT = 30
+
+_engine: Optional[Engine] = None
+_session_factory: Optional[sessionmaker] = None
+_lock = threading.Lock()
+
+
 def get_database_url() -> str:
+    # DATABASE_URL (vd: sqlite:///local.db) ghi đè các biến POSTGRES_*
+    url = os.getenv("DATABASE_URL")
+    if url:
+        return url
     user = os.getenv("POSTGRES_USER", "postgres")
     password = os.getenv("POSTGRES_PASSWORD", "postgres")
     host = os.getenv("POSTGRES_HOST", "localhost")
@@ -12,8 +33,64 @@ def get_database_url() -> str:
     db = os.getenv("POSTGRES_DB", "ai_news_aggregator")
     return f"postgresql://{user}:{password}@{host}:{port}/{db}"
 
-engine = create_engine(get_database_url())
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-def get_session():
-    return SessionLocal()
\ No newline at end of file
+def get_engine() -> Engine:
+    """
+    Tạo engine ở lần gọi đầu tiên (không phải lúc import), dùng chung cho cả tiến trình.
+    pool_pre_ping kiểm tra kết nối trước khi lấy ra khỏi pool, nên worker chạy lâu
+    không nhận phải kết nối đã chết sau khi DB restart.
+    """
+    global _engine
+    if _engine is None:
+        with _lock:
+            if _engine is None:
+                url = get_database_url()
+                options = {"pool_pre_ping": True}
+                if not url.startswith("sqlite"):
+                    options.update(
+                        pool_size=int(os.getenv("DB_POOL_SIZE", DEFAULT_POOL_SIZE)),
+                        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", DEFAULT_MAX_OVERFLOW)),
+                        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", DEFAULT_POOL_RECYCLE)),
+                        pool_timeout=int(os.getenv("DB_POOL_TIMEOUT", DEFAULT_POOL_TIMEOUT)),
+                    )
+                _engine = create_engine(url, **options)
+    return _engine
+
+
+def get_session() -> Session:
+    """Session mới gắn với engine chung; người gọi chịu trách nhiệm close()."""
+    global _session_factory
+    if _session_factory is None:
+        _session_factory = sessionmaker(autocommit=False, autoflush=False, bind=get_engine())
+    return _session_factory()
+
+
+@contextmanager
+def session_scope() -> Iterator[Session]:
+    """Một unit of work: commit khi thành công, rollback khi lỗi, luôn trả kết nối về pool."""
+    session = get_session()
+    try:
+        yield session
+        session.commit()
+    except Exception:
+        session.rollback()
+        raise
+    finally:
+        session.close()
+
+
+def dispose_engine() -> None:
+    """Đóng mọi kết nối trong pool (cuối tiến trình, hoặc sau fork trong worker)."""
+    global _engine, _session_factory
+    with _lock:
+        if _engine is not None:
+            _engine.dispose()
+        _engine = None
+        _session_factory = None
+
+
+def __getattr__(name: str):
+    # Tương thích ngược với `from app.database.connection import engine`
+    if name == "engine":
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
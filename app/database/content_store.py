@@ -0,0 +1,37 @@
+import hashlib
+import zlib
+from typing import Optional, Tuple
+
+# Codec mặc định khi ghi; cột codec cho phép đổi codec sau này mà vẫn đọc được dữ liệu cũ
+DEFAULT_CODEC = "zlib"
+ZLIB_LEVEL = 6
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def compress(text: str, codec: str = DEFAULT_CODEC) -> Tuple[bytes, int]:
+    """Nén văn bản, trả về (dữ liệu nén, kích thước gốc tính bằng byte)."""
+    raw = text.encode("utf-8")
+    if codec == "zlib":
+        return zlib.compress(raw, ZLIB_LEVEL), len(raw)
+    if codec == "none":
+        return raw, len(raw)
+    raise ValueError(f"Unknown content codec: {codec}")
+
+
+def decompress(data: bytes, codec: str) -> str:
+    if codec == "zlib":
+        return zlib.decompress(data).decode("utf-8")
+    if codec == "none":
+        return bytes(data).decode("utf-8")
+    raise ValueError(f"Unknown content codec: {codec}")
+
+
+def blob_row(text: Optional[str]) -> Optional[dict]:
+    """Dòng content_blobs cho một văn bản (None nếu văn bản rỗng)."""
+    if not text:
+        return None
+    data, size = compress(text)
+    return {"hash": content_hash(text), "codec": DEFAULT_CODEC, "size": size, "data": data}
@@ -1,8 +1,13 @@
-from models import Base
-from connection import engine
+import sys
+from pathlib import Path
 
-if __name__ == "__main__":
-    print("Creating all tables...")
-    Base.metadata.create_all(engine)
-    print("✅ Tables created successfully.")
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from app.database.connection import get_engine
+from app.database.migrations import current_version, upgrade
 
+if __name__ == "__main__":
+    print("Running schema migrations...")
+    engine = get_engine()
+    applied = upgrade(engine)
+    print(f"✅ Schema at version {current_version(engine)} ({len(applied)} migration(s) applied).")
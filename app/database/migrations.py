@@ -0,0 +1,413 @@
+"""
+Migration schema có đánh số phiên bản.
+
+Mỗi migration là một hàm nhận Connection, chạy trong transaction riêng và được ghi
+vào bảng schema_migrations sau khi thành công. Các bước viết theo kiểu idempotent
+(IF NOT EXISTS / kiểm tra cột) để chạy được cả trên DB tạo bằng create_all trước đây.
+
+Migration không được đọc schema từ models.py (model luôn là phiên bản mới nhất):
+bảng và index được khai báo cố định ngay trong file này, đúng như tại thời điểm viết.
+
+Thêm migration mới: viết hàm _NNNN_ten(conn) và thêm vào cuối MIGRATIONS.
+"""
+from datetime import datetime, timezone
+from typing import Callable, List, Optional, Set, Tuple
+
+from sqlalchemy import (
+    BigInteger, Column, DateTime, Float, ForeignKey, Integer, LargeBinary, MetaData, String, Table, Text, inspect, select, text,
+)
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+from .content_store import blob_row, decompress
+from .text_search import build_document
+
+# Khóa advisory của Postgres để hai tiến trình không chạy migration cùng lúc
+MIGRATION_LOCK_ID = 7_240_001
+
+schema_migrations = Table(
+    "schema_migrations",
+    MetaData(),
+    Column("version", Integer, primary_key=True),
+    Column("name", String, nullable=False),
+    Column("applied_at", DateTime, nullable=False),
+)
+
+
+# --- SCHEMA CỐ ĐỊNH CỦA CÁC MIGRATION (không sửa khi model thay đổi) ---
+_frozen = MetaData()
+
+_0001_tables = [
+    Table(
+        "youtube_videos", _frozen,
+        Column("video_id", String, primary_key=True),
+        Column("title", String, nullable=False),
+        Column("url", String, nullable=False),
+        Column("channel_id", String, nullable=False),
+        Column("published_at", DateTime, nullable=False),
+        Column("description", Text, nullable=True),
+        Column("transcript", Text, nullable=True),
+        Column("created_at", DateTime),
+    ),
+    Table(
+        "news_articles", _frozen,
+        Column("id", Integer, primary_key=True, autoincrement=True),
+        Column("title", String, nullable=False),
+        Column("url", String, nullable=False, unique=True),
+        Column("source", String, nullable=False),
+        Column("published_at", DateTime, nullable=False),
+        Column("content", Text, nullable=True),
+        Column("created_at", DateTime),
+    ),
+    Table(
+        "digests", _frozen,
+        Column("id", String, primary_key=True),
+        Column("article_type", String, nullable=False),
+        Column("article_id", String, nullable=False),
+        Column("url", String, nullable=False),
+        Column("title", String, nullable=False),
+        Column("summary", Text, nullable=False),
+        Column("created_at", DateTime),
+    ),
+]
+
+_0003_content_fingerprints_table = Table(
+    "content_fingerprints", _frozen,
+    Column("id", String, primary_key=True),
+    Column("article_type", String, nullable=False),
+    Column("article_id", String, nullable=False),
+    Column("simhash", BigInteger, nullable=False),
+    Column("band_0", Integer, nullable=False, index=True),
+    Column("band_1", Integer, nullable=False, index=True),
+    Column("band_2", Integer, nullable=False, index=True),
+    Column("band_3", Integer, nullable=False, index=True),
+    Column("duplicate_of", String, nullable=True),
+    Column("created_at", DateTime),
+)
+
+_0005_content_blobs_table = Table(
+    "content_blobs", _frozen,
+    Column("hash", String(64), primary_key=True),
+    Column("codec", String, nullable=False),
+    Column("size", Integer, nullable=False),
+    Column("data", LargeBinary, nullable=False),
+    Column("created_at", DateTime),
+)
+
+_0006_feed_states_table = Table(
+    "feed_states", _frozen,
+    Column("id", String, primary_key=True),
+    Column("kind", String, nullable=False),
+    Column("key", String, nullable=False),
+    Column("watermark", DateTime, nullable=True),
+    Column("avg_gap_seconds", Float, nullable=True),
+    Column("interval_seconds", Float, nullable=False),
+    Column("next_poll_at", DateTime, nullable=False, index=True),
+    Column("last_polled_at", DateTime, nullable=True),
+    Column("last_new_count", Integer, nullable=False),
+)
+
+_0007_jobs_table = Table(
+    "jobs", _frozen,
+    Column("id", String, primary_key=True),
+    Column("kind", String, nullable=False),
+    Column("key", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("run_after", DateTime, nullable=False),
+    Column("lease_owner", String, nullable=True),
+    Column("lease_expires_at", DateTime, nullable=True),
+    Column("last_error", Text, nullable=True),
+    Column("created_at", DateTime),
+    Column("finished_at", DateTime, nullable=True),
+)
+
+_0008_backfill_checkpoints_table = Table(
+    "backfill_checkpoints", _frozen,
+    Column("id", String, primary_key=True),
+    Column("run", String, nullable=False, index=True),
+    Column("kind", String, nullable=False),
+    Column("key", String, nullable=False),
+    Column("status", String, nullable=False),
+    Column("entries", Integer, nullable=False),
+    Column("attempts", Integer, nullable=False),
+    Column("error", Text, nullable=True),
+    Column("updated_at", DateTime, nullable=False),
+)
+
+_0009_search_documents_table = Table(
+    "search_documents", _frozen,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("key", String, nullable=False, unique=True),
+    Column("kind", String, nullable=False),
+    Column("ref", String, nullable=False),
+    Column("title", String, nullable=False),
+    Column("url", String, nullable=True),
+    Column("published_at", DateTime, nullable=True),
+    Column("document", Text, nullable=False),
+)
+
+_0010_digest_vectors_table = Table(
+    "digest_vectors", _frozen,
+    Column("digest_id", String, ForeignKey("digests.id"), primary_key=True),
+    Column("version", Integer, nullable=False),
+    Column("terms", LargeBinary, nullable=False),
+    Column("tf", LargeBinary, nullable=False),
+    Column("created_at", DateTime),
+)
+
+# Số dòng chuyển sang content_blobs trong mỗi lượt (giới hạn bộ nhớ khi migrate DB lớn)
+MIGRATION_BATCH_SIZE = 500
+
+
+def _columns(conn: Connection, table: str) -> Set[str]:
+    return {c["name"] for c in inspect(conn).get_columns(table)}
+
+
+def _add_column_if_missing(conn: Connection, table: str, column: str, ddl: str) -> None:
+    if column not in _columns(conn, table):
+        conn.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {ddl}"))
+
+
+def _create_index(conn: Connection, name: str, table: str, columns: str, where: Optional[str] = None) -> None:
+    """CREATE INDEX IF NOT EXISTS (partial nếu có where); cú pháp chung cho Postgres và SQLite."""
+    ddl = f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})"
+    if where:
+        ddl += f" WHERE {where}"
+    conn.execute(text(ddl))
+
+
+def _0001_initial_schema(conn: Connection) -> None:
+    _frozen.create_all(conn, tables=_0001_tables)
+
+
+def _0002_transcript_retry(conn: Connection) -> None:
+    _add_column_if_missing(conn, "youtube_videos", "transcript_attempts", "INTEGER NOT NULL DEFAULT 0")
+    _add_column_if_missing(conn, "youtube_videos", "transcript_retry_at", "TIMESTAMP")
+    # Bỏ marker vĩnh viễn cũ: các video này sẽ được thử lại theo backoff
+    if "transcript" in _columns(conn, "youtube_videos"):
+        conn.execute(text("UPDATE youtube_videos SET transcript = NULL WHERE transcript = '__UNAVAILABLE__'"))
+
+
+def _0003_content_fingerprints(conn: Connection) -> None:
+    _frozen.create_all(conn, tables=[_0003_content_fingerprints_table])
+
+
+def _0004_hot_path_indexes(conn: Connection) -> None:
+    _create_index(conn, "ix_youtube_videos_published_at", "youtube_videos", "published_at")
+    _create_index(conn, "ix_youtube_videos_channel_id", "youtube_videos", "channel_id")
+    if "transcript" in _columns(conn, "youtube_videos"):
+        _create_index(conn, "ix_youtube_videos_with_transcript", "youtube_videos", "published_at",
+                      where="transcript IS NOT NULL")
+        _create_index(conn, "ix_youtube_videos_transcript_due", "youtube_videos", "transcript_retry_at",
+                      where="transcript IS NULL")
+    _create_index(conn, "ix_news_articles_published_at", "news_articles", "published_at")
+    _create_index(conn, "ix_digests_created_at", "digests", "created_at")
+    _create_index(conn, "ix_digests_article", "digests", "article_type, article_id")
+
+
+def _move_bodies(conn: Connection, table: str, key: str, body_column: str, hash_column: str) -> None:
+    """Nén nội dung cột body_column sang content_blobs theo từng lô, ghi hash vào hash_column."""
+    insert = sqlite.insert if conn.dialect.name == "sqlite" else postgresql.insert
+    while True:
+        rows = conn.execute(text(
+            f"SELECT {key}, {body_column} FROM {table} "
+            f"WHERE {body_column} IS NOT NULL AND {body_column} != '' AND {hash_column} IS NULL "
+            f"ORDER BY {key} LIMIT :batch_size"
+        ), {"batch_size": MIGRATION_BATCH_SIZE}).all()
+        if not rows:
+            return
+
+        blobs = {}
+        updates = []
+        for row_key, body in rows:
+            blob = blob_row(body)
+            blobs[blob["hash"]] = {**blob, "created_at": datetime.now(timezone.utc)}
+            updates.append({"row_key": row_key, "hash": blob["hash"]})
+
+        conn.execute(
+            insert(_0005_content_blobs_table).on_conflict_do_nothing(index_elements=["hash"]),
+            list(blobs.values()),
+        )
+        conn.execute(text(f"UPDATE {table} SET {hash_column} = :hash WHERE {key} = :row_key"), updates)
+
+
+def _0005_content_blobs(conn: Connection) -> None:
+    """
+    Chuyển transcript / nội dung bài báo sang bảng content_blobs (nén zlib, khóa sha256).
+    Bảng chính chỉ còn cột hash nên các query liệt kê không phải đọc thân bài.
+    Trên Postgres, dung lượng cũ được thu hồi sau VACUUM (FULL) youtube_videos / news_articles.
+    """
+    _frozen.create_all(conn, tables=[_0005_content_blobs_table])
+    _add_column_if_missing(conn, "youtube_videos", "transcript_hash",
+                           "VARCHAR(64) REFERENCES content_blobs (hash)")
+    _add_column_if_missing(conn, "news_articles", "content_hash",
+                           "VARCHAR(64) REFERENCES content_blobs (hash)")
+
+    # Partial index cũ tham chiếu cột transcript: phải bỏ trước khi xóa cột
+    conn.execute(text("DROP INDEX IF EXISTS ix_youtube_videos_with_transcript"))
+    conn.execute(text("DROP INDEX IF EXISTS ix_youtube_videos_transcript_due"))
+
+    if "transcript" in _columns(conn, "youtube_videos"):
+        _move_bodies(conn, "youtube_videos", "video_id", "transcript", "transcript_hash")
+        conn.execute(text("ALTER TABLE youtube_videos DROP COLUMN transcript"))
+    if "content" in _columns(conn, "news_articles"):
+        _move_bodies(conn, "news_articles", "id", "content", "content_hash")
+        conn.execute(text("ALTER TABLE news_articles DROP COLUMN content"))
+
+    _create_index(conn, "ix_youtube_videos_with_transcript", "youtube_videos", "published_at",
+                  where="transcript_hash IS NOT NULL")
+    _create_index(conn, "ix_youtube_videos_transcript_due", "youtube_videos", "transcript_retry_at",
+                  where="transcript_hash IS NULL")
+
+
+
+def _0006_feed_states(conn: Connection) -> None:
+    _frozen.create_all(conn, tables=[_0006_feed_states_table])
+
+
+def _0007_jobs(conn: Connection) -> None:
+    _frozen.create_all(conn, tables=[_0007_jobs_table])
+    # Worker lấy việc theo (kind, status) rồi theo thứ tự run_after
+    _create_index(conn, "ix_jobs_claim", "jobs", "kind, status, run_after")
+
+
+def _0008_backfill_checkpoints(conn: Connection) -> None:
+    _frozen.create_all(conn, tables=[_0008_backfill_checkpoints_table])
+
+
+def _index_existing(conn: Connection, kind: str, query: str, last_ref) -> None:
+    """
+    Đưa nội dung đã có vào search_documents theo từng lô (keyset theo ref).
+    query trả về các cột ref, title, url, published_at, extra, codec, data (thân bài nén).
+    """
+    insert = sqlite.insert if conn.dialect.name == "sqlite" else postgresql.insert
+    while True:
+        # Khai báo kiểu để SQLite trả về datetime thay vì chuỗi
+        stmt = text(query).columns(published_at=DateTime)
+        rows = conn.execute(stmt, {"last_ref": last_ref, "batch_size": MIGRATION_BATCH_SIZE}).mappings().all()
+        if not rows:
+            return
+        documents = []
+        for row in rows:
+            body = decompress(row["data"], row["codec"]) if row["data"] is not None else None
+            documents.append({
+                "key": f"{kind}:{row['ref']}",
+                "kind": kind,
+                "ref": str(row["ref"]),
+                "title": row["title"],
+                "url": row["url"],
+                "published_at": row["published_at"],
+                "document": build_document(row["title"], row["extra"], body),
+            })
+        conn.execute(
+            insert(_0009_search_documents_table).on_conflict_do_nothing(index_elements=["key"]),
+            documents,
+        )
+        last_ref = rows[-1]["ref"]
+
+
+def _0009_search_documents(conn: Connection) -> None:
+    """
+    Chỉ mục tìm kiếm toàn văn. Văn bản đã được chuẩn hóa (bỏ dấu) ở phía Python nên
+    cấu hình 'simple' của Postgres là đủ, không cần extension unaccent.
+    - Postgres: cột sinh tsv + index GIN.
+    - SQLite: bảng ảo FTS5 dạng external content, đồng bộ bằng trigger.
+    """
+    _frozen.create_all(conn, tables=[_0009_search_documents_table])
+    _create_index(conn, "ix_search_documents_published_at", "search_documents", "published_at")
+
+    if conn.dialect.name == "postgresql":
+        conn.execute(text(
+            "ALTER TABLE search_documents ADD COLUMN IF NOT EXISTS tsv tsvector "
+            "GENERATED ALWAYS AS (to_tsvector('simple', document)) STORED"
+        ))
+        conn.execute(text(
+            "CREATE INDEX IF NOT EXISTS ix_search_documents_tsv ON search_documents USING GIN (tsv)"
+        ))
+    else:
+        conn.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_documents_fts "
+            "USING fts5(document, content='search_documents', content_rowid='id')"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS search_documents_ai AFTER INSERT ON search_documents BEGIN "
+            "INSERT INTO search_documents_fts(rowid, document) VALUES (new.id, new.document); END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS search_documents_ad AFTER DELETE ON search_documents BEGIN "
+            "INSERT INTO search_documents_fts(search_documents_fts, rowid, document) "
+            "VALUES ('delete', old.id, old.document); END"
+        ))
+        conn.execute(text(
+            "CREATE TRIGGER IF NOT EXISTS search_documents_au AFTER UPDATE ON search_documents BEGIN "
+            "INSERT INTO search_documents_fts(search_documents_fts, rowid, document) "
+            "VALUES ('delete', old.id, old.document); "
+            "INSERT INTO search_documents_fts(rowid, document) VALUES (new.id, new.document); END"
+        ))
+
+    _index_existing(conn, "news", (
+        "SELECT n.id AS ref, n.title, n.url, n.published_at, NULL AS extra, b.codec, b.data "
+        "FROM news_articles n LEFT JOIN content_blobs b ON b.hash = n.content_hash "
+        "WHERE n.id > :last_ref ORDER BY n.id LIMIT :batch_size"
+    ), 0)
+    _index_existing(conn, "youtube", (
+        "SELECT v.video_id AS ref, v.title, v.url, v.published_at, v.description AS extra, b.codec, b.data "
+        "FROM youtube_videos v LEFT JOIN content_blobs b ON b.hash = v.transcript_hash "
+        "WHERE v.video_id > :last_ref ORDER BY v.video_id LIMIT :batch_size"
+    ), "")
+    _index_existing(conn, "digest", (
+        "SELECT d.id AS ref, d.title, d.url, d.created_at AS published_at, d.summary AS extra, "
+        "NULL AS codec, NULL AS data "
+        "FROM digests d WHERE d.id > :last_ref ORDER BY d.id LIMIT :batch_size"
+    ), "")
+
+
+def _0010_digest_vectors(conn: Connection) -> None:
+    # Không tính trước cho digest cũ: vector được tính (và cache) ở lần gom cụm đầu tiên
+    _frozen.create_all(conn, tables=[_0010_digest_vectors_table])
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "initial_schema", _0001_initial_schema),
+    (2, "transcript_retry", _0002_transcript_retry),
+    (3, "content_fingerprints", _0003_content_fingerprints),
+    (4, "hot_path_indexes", _0004_hot_path_indexes),
+    (5, "content_blobs", _0005_content_blobs),
+    (6, "feed_states", _0006_feed_states),
+    (7, "jobs", _0007_jobs),
+    (8, "backfill_checkpoints", _0008_backfill_checkpoints),
+    (9, "search_documents", _0009_search_documents),
+    (10, "digest_vectors", _0010_digest_vectors),
+]
+
+
+def _applied_versions(conn: Connection) -> Set[int]:
+    return set(conn.execute(select(schema_migrations.c.version)).scalars().all())
+
+
+def current_version(engine: Engine) -> int:
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+        return max(_applied_versions(conn), default=0)
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """Chạy các migration chưa áp dụng theo thứ tự. Trả về danh sách version vừa chạy."""
+    with engine.begin() as conn:
+        schema_migrations.create(conn, checkfirst=True)
+
+    applied_now = []
+    for version, name, step in MIGRATIONS:
+        with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                conn.execute(text("SELECT pg_advisory_xact_lock(:lock_id)"), {"lock_id": MIGRATION_LOCK_ID})
+            if version in _applied_versions(conn):
+                continue
+            step(conn)
+            conn.execute(schema_migrations.insert().values(
+                version=version, name=name, applied_at=datetime.now(timezone.utc)
+            ))
+        applied_now.append(version)
+        print(f"Applied migration {version:04d}_{name}")
+    return applied_now
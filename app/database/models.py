@@ -1,10 +1,22 @@
-from sqlalchemy import Column, String, DateTime, Text, Integer
+from sqlalchemy import Column, String, DateTime, Text, Integer, BigInteger, Float, Index, LargeBinary, ForeignKey
 from sqlalchemy.orm import declarative_base
 from datetime import datetime, timezone
 
 # Khởi tạo Base (Lớp cha cho mọi Model)
 Base = declarative_base()
 
+# --- 0. Bảng lưu nội dung lớn (transcript, thân bài báo) dạng nén ---
+class ContentBlob(Base):
+    __tablename__ = "content_blobs"
+
+    # sha256 của văn bản gốc (UTF-8): nội dung giống nhau chỉ lưu một lần
+    hash = Column(String(64), primary_key=True)
+    codec = Column(String, nullable=False)
+    # Kích thước văn bản gốc (byte)
+    size = Column(Integer, nullable=False)
+    data = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
 # --- 1. Bảng lưu Video YouTube ---
 class YoutubeVideo(Base):
     __tablename__ = "youtube_videos"
@@ -15,9 +27,32 @@ class YoutubeVideo(Base):
     channel_id = Column(String, nullable=False)
     published_at = Column(DateTime, nullable=False)
     description = Column(Text, nullable=True)
-    transcript = Column(Text, nullable=True)
+    # Transcript lưu nén ở bảng content_blobs; cột này chỉ giữ hash (NULL = chưa có transcript)
+    transcript_hash = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True)
+    # Số lần lấy transcript thất bại và thời điểm được thử lại (backoff lũy thừa)
+    transcript_attempts = Column(Integer, nullable=False, default=0)
+    transcript_retry_at = Column(DateTime, nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index("ix_youtube_videos_published_at", "published_at"),
+        Index("ix_youtube_videos_channel_id", "channel_id"),
+        # Partial index: video đã có transcript (ứng viên cần tóm tắt), duyệt theo published_at
+        Index(
+            "ix_youtube_videos_with_transcript",
+            "published_at",
+            postgresql_where=transcript_hash.isnot(None),
+            sqlite_where=transcript_hash.isnot(None),
+        ),
+        # Partial index: video chưa có transcript, chờ tới hạn thử lại
+        Index(
+            "ix_youtube_videos_transcript_due",
+            "transcript_retry_at",
+            postgresql_where=transcript_hash.is_(None),
+            sqlite_where=transcript_hash.is_(None),
+        ),
+    )
+
 # --- 2. Bảng lưu Bài viết (Báo, Blog...) ---
 class NewsArticle(Base):
     __tablename__ = "news_articles"
@@ -28,9 +63,14 @@ class NewsArticle(Base):
     url = Column(String, nullable=False, unique=True) 
     source = Column(String, nullable=False) 
     published_at = Column(DateTime, nullable=False)
-    content = Column(Text, nullable=True) 
+    # Nội dung lưu nén ở bảng content_blobs; cột này chỉ giữ hash
+    content_hash = Column(String(64), ForeignKey("content_blobs.hash"), nullable=True)
     created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        Index("ix_news_articles_published_at", "published_at"),
+    )
+
 # --- 3. Bảng lưu Nội dung tóm tắt (Digest) ---
 class Digest(Base):
     __tablename__ = "digests"
@@ -42,3 +82,117 @@ class Digest(Base):
     title = Column(String, nullable=False)
     summary = Column(Text, nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_digests_created_at", "created_at"),
+        # Anti-join "chưa có digest" tra theo (article_type, article_id)
+        Index("ix_digests_article", "article_type", "article_id"),
+    )
+
+# --- 4. Bảng lưu dấu vân tay nội dung (SimHash) để phát hiện tin gần trùng ---
+class ContentFingerprint(Base):
+    __tablename__ = "content_fingerprints"
+
+    # Cùng định dạng với Digest.id: "<article_type>:<article_id>"
+    id = Column(String, primary_key=True)
+    article_type = Column(String, nullable=False)
+    article_id = Column(String, nullable=False)
+    simhash = Column(BigInteger, nullable=False)
+    # 4 band 16 bit của simhash, mỗi band có index riêng để tra cứu ứng viên (LSH)
+    band_0 = Column(Integer, nullable=False, index=True)
+    band_1 = Column(Integer, nullable=False, index=True)
+    band_2 = Column(Integer, nullable=False, index=True)
+    band_3 = Column(Integer, nullable=False, index=True)
+    # id của bản đại diện nếu nội dung này là bản gần trùng (NULL nếu là bản gốc)
+    duplicate_of = Column(String, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+
+# --- 5. Trạng thái polling của từng nguồn (kênh YouTube / feed RSS) ---
+class FeedState(Base):
+    __tablename__ = "feed_states"
+
+    # "<kind>:<key>", vd "youtube:UC..." hoặc "news:https://.../rss"
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    # Mốc bài mới nhất đã thấy: lần sau chỉ lấy bài đăng sau mốc này
+    watermark = Column(DateTime, nullable=True)
+    # Khoảng cách trung bình (EWMA, giây) giữa hai bài đăng liên tiếp
+    avg_gap_seconds = Column(Float, nullable=True)
+    interval_seconds = Column(Float, nullable=False)
+    next_poll_at = Column(DateTime, nullable=False, index=True)
+    last_polled_at = Column(DateTime, nullable=True)
+    last_new_count = Column(Integer, nullable=False, default=0)
+
+# --- 6. Checkpoint của backfill theo từng nguồn (xem app/backfill.py) ---
+class BackfillCheckpoint(Base):
+    __tablename__ = "backfill_checkpoints"
+
+    # "<run>:<kind>:<key>", vd "2024-q1:news:https://.../rss"
+    id = Column(String, primary_key=True)
+    run = Column(String, nullable=False, index=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    # done: nguồn đã cào xong, lần chạy lại bỏ qua; failed: thử lại ở lần chạy sau
+    status = Column(String, nullable=False)
+    # Số mục đọc được từ feed trong khoảng thời gian backfill
+    entries = Column(Integer, nullable=False, default=0)
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    updated_at = Column(DateTime, nullable=False)
+
+# --- 7. Hàng đợi việc cho nhiều worker / nhiều máy (xem app/worker.py) ---
+class Job(Base):
+    __tablename__ = "jobs"
+
+    # "<kind>:<key>", vd "digest:news:42", "transcript:<video_id>", "news_feed:<rss_url>"
+    id = Column(String, primary_key=True)
+    kind = Column(String, nullable=False)
+    key = Column(String, nullable=False)
+    # pending -> running (đang có lease) -> done / failed; hết lease thì worker khác lấy lại
+    status = Column(String, nullable=False, default="pending")
+    attempts = Column(Integer, nullable=False, default=0)
+    run_after = Column(DateTime, nullable=False)
+    lease_owner = Column(String, nullable=True)
+    lease_expires_at = Column(DateTime, nullable=True)
+    last_error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
+    finished_at = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index("ix_jobs_claim", "kind", "status", "run_after"),
+    )
+
+# --- 8. Chỉ mục tìm kiếm toàn văn (bài báo, video, digest) ---
+class SearchDocument(Base):
+    __tablename__ = "search_documents"
+
+    # Khóa số ổn định: SQLite FTS5 (search_documents_fts) tham chiếu tới cột này làm rowid
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    # "<kind>:<ref>", vd "news:42", "youtube:<video_id>", "digest:news:42"
+    key = Column(String, nullable=False, unique=True)
+    kind = Column(String, nullable=False)
+    # Khóa của nội dung gốc: id bài báo, video_id hoặc Digest.id
+    ref = Column(String, nullable=False)
+    title = Column(String, nullable=False)
+    url = Column(String, nullable=True)
+    published_at = Column(DateTime, nullable=True)
+    # Văn bản đã chuẩn hóa (text_search.build_document). Trên Postgres cột sinh tsv
+    # (to_tsvector('simple', document), index GIN) được thêm bởi migration 0009
+    document = Column(Text, nullable=False)
+
+    __table_args__ = (
+        Index("ix_search_documents_published_at", "published_at"),
+    )
+
+# --- 9. Vector đặc trưng của digest, cache cho bước gom cụm câu chuyện (app/dedup/clustering.py) ---
+class DigestVector(Base):
+    __tablename__ = "digest_vectors"
+
+    digest_id = Column(String, ForeignKey("digests.id"), primary_key=True)
+    # clustering.FEATURE_VERSION lúc tính; khác version hiện tại thì được tính lại
+    version = Column(Integer, nullable=False)
+    # Vector thưa: id đặc trưng băm (uint32) và tần suất (float32), little-endian
+    terms = Column(LargeBinary, nullable=False)
+    tf = Column(LargeBinary, nullable=False)
+    created_at = Column(DateTime, default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,121 @@
+"""
+Kiểm tra hồi quy query plan: các query nóng phải dùng đúng index đã khai báo.
+
+    python -m app.database.query_plans
+
+Trên Postgres, enable_seqscan bị tắt trong transaction kiểm tra để bảng nhỏ
+(dev/CI) vẫn cho thấy index có dùng được hay không; trên SQLite dùng
+EXPLAIN QUERY PLAN. Thoát với mã 1 nếu có query không dùng index mong đợi.
+"""
+import sys
+from datetime import datetime, timedelta, timezone
+from typing import Callable, List, NamedTuple
+
+from sqlalchemy import and_, or_, select, text
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from .models import Digest, Job, NewsArticle, YoutubeVideo
+
+
+class PlanCheck(NamedTuple):
+    name: str
+    expected_index: str
+    build: Callable[[Session], object]
+
+
+def _pending_articles(session: Session):
+    from .repository import Repository
+
+    pending = Repository(session)._pending_articles()
+    return select(pending).order_by(pending.c.published_at.desc()).limit(200)
+
+
+PLAN_CHECKS: List[PlanCheck] = [
+    PlanCheck(
+        "get_recent_digests",
+        "ix_digests_created_at",
+        lambda session: select(Digest.id)
+        .where(Digest.created_at >= datetime.now(timezone.utc) - timedelta(hours=24))
+        .order_by(Digest.created_at.desc()),
+    ),
+    PlanCheck("pending articles anti-join", "ix_digests_article", _pending_articles),
+    PlanCheck(
+        "videos with transcript, newest first",
+        "ix_youtube_videos_with_transcript",
+        lambda session: select(YoutubeVideo.video_id)
+        .where(YoutubeVideo.transcript_hash.isnot(None))
+        .order_by(YoutubeVideo.published_at.desc())
+        .limit(200),
+    ),
+    PlanCheck(
+        "transcripts due for retry",
+        "ix_youtube_videos_transcript_due",
+        lambda session: select(YoutubeVideo.video_id)
+        .where(YoutubeVideo.transcript_hash.is_(None), YoutubeVideo.transcript_retry_at <= datetime.now(timezone.utc)),
+    ),
+    PlanCheck(
+        "videos by channel",
+        "ix_youtube_videos_channel_id",
+        lambda session: select(YoutubeVideo.video_id).where(YoutubeVideo.channel_id == "UC0000000000000000000000"),
+    ),
+    PlanCheck(
+        "claimable jobs",
+        "ix_jobs_claim",
+        lambda session: select(Job.id)
+        .where(
+            Job.kind.in_(["digest"]),
+            or_(
+                and_(Job.status == "pending", Job.run_after <= datetime.now(timezone.utc)),
+                and_(Job.status == "running", Job.lease_expires_at <= datetime.now(timezone.utc)),
+            ),
+        )
+        .order_by(Job.run_after)
+        .limit(8),
+    ),
+    PlanCheck(
+        "recent news articles",
+        "ix_news_articles_published_at",
+        lambda session: select(NewsArticle.id).order_by(NewsArticle.published_at.desc()).limit(200),
+    ),
+]
+
+
+def explain(conn: Connection, stmt) -> str:
+    sql = str(stmt.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "postgresql":
+        conn.execute(text("SET LOCAL enable_seqscan = off"))
+        return "\n".join(conn.execute(text(f"EXPLAIN {sql}")).scalars().all())
+    if conn.dialect.name == "sqlite":
+        return "\n".join(row[-1] for row in conn.execute(text(f"EXPLAIN QUERY PLAN {sql}")).all())
+    raise NotImplementedError(f"Unsupported dialect: {conn.dialect.name}")
+
+
+def check_query_plans(engine: Engine) -> List[dict]:
+    results = []
+    with engine.connect() as conn:
+        session = Session(bind=conn)
+        for check in PLAN_CHECKS:
+            with conn.begin():
+                plan = explain(conn, check.build(session))
+            results.append({
+                "name": check.name,
+                "expected_index": check.expected_index,
+                "ok": check.expected_index in plan,
+                "plan": plan,
+            })
+        session.close()
+    return results
+
+
+if __name__ == "__main__":
+    from .connection import get_engine
+
+    failures = 0
+    for result in check_query_plans(get_engine()):
+        status = "OK  " if result["ok"] else "FAIL"
+        print(f"[{status}] {result['name']} -> {result['expected_index']}")
+        if not result["ok"]:
+            failures += 1
+            print("       " + result["plan"].replace("\n", "\n       "))
+    sys.exit(1 if failures else 0)
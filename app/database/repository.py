@@ -1,14 +1,48 @@
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Set, Iterator, Tuple
+from sqlalchemy import select, update, union_all, literal, literal_column, cast, exists, tuple_, or_, and_, func, table, column, String
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from .models import YoutubeVideo, NewsArticle, Digest  # Import từ models của bạn
+from .models import YoutubeVideo, NewsArticle, Digest, ContentFingerprint, ContentBlob, FeedState, Job, BackfillCheckpoint, SearchDocument, DigestVector  # Import từ models của bạn
+from .content_store import blob_row, decompress
+from .text_search import build_document, query_terms
+from ..dedup.simhash import MAX_HAMMING_DISTANCE, bands, hamming_distance, to_signed, to_unsigned
 from .connection import get_session     # Import hàm lấy session
 
+# Số dòng tối đa mỗi câu INSERT ... ON CONFLICT (mỗi chunk là 1 round trip)
+BULK_CHUNK_SIZE = 1000
+
+# Backoff khi chưa lấy được transcript: 1h, 2h, 4h... tối đa 7 ngày
+TRANSCRIPT_RETRY_BASE = timedelta(hours=1)
+TRANSCRIPT_RETRY_MAX = timedelta(days=7)
+
+# Hàng đợi việc: số lần thử tối đa và backoff giữa các lần (1 phút, 2 phút... tối đa 1 giờ)
+JOB_MAX_ATTEMPTS = 5
+JOB_RETRY_BASE = timedelta(minutes=1)
+JOB_RETRY_MAX = timedelta(hours=1)
+
+# Bảng ảo FTS5 (chỉ có trên SQLite, tạo bởi migration 0009); rank là điểm bm25, càng nhỏ càng khớp
+_search_fts = table("search_documents_fts", column("rowid"), column("rank"))
+
 class Repository:
     def __init__(self, session: Optional[Session] = None):
-        # Nếu không truyền session vào thì tự tạo một cái mới
+        # Nếu không truyền session vào thì tự tạo một cái mới (và tự đóng khi close())
+        self._owns_session = session is None
         self.session = session or get_session()
 
+    def close(self) -> None:
+        """Trả kết nối về pool. Session do người gọi truyền vào thì người gọi tự đóng."""
+        if self._owns_session:
+            self.session.close()
+
+    def __enter__(self) -> "Repository":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.session.rollback()
+        self.close()
+
     # --- CHỨC NĂNG CHO YOUTUBE ---
     def create_youtube_video(self, video_data: Dict[str, Any]) -> Optional[YoutubeVideo]:
         """Lưu video YouTube mới, bỏ qua nếu đã tồn tại"""
@@ -23,9 +57,10 @@ class Repository:
             channel_id=video_data['channel_id'],
             published_at=video_data['published_at'],
             description=video_data.get('description', ""),
-            transcript=video_data.get('transcript')
+            transcript_hash=self.store_bodies([video_data.get('transcript')])[0]
         )
         self.session.add(video)
+        self._index_documents([self._video_search_row(video_data, video_data.get('transcript'))])
         self.session.commit()
         return video
 
@@ -41,89 +76,610 @@ class Repository:
             url=article_data['url'],
             source=article_data['source'],
             published_at=article_data['published_at'],
-            content=article_data.get('content')
+            content_hash=self.store_bodies([article_data.get('content')])[0]
         )
         self.session.add(article)
+        self.session.flush()
+        self._index_documents([self._search_row(
+            "news", article.id, article.title, article.url, article.published_at, article_data.get('content')
+        )])
         self.session.commit()
         return article
 
-    def bulk_create_youtube_videos(self, videos_data: List[Dict[str, Any]]):
-        videos_to_add = []
-        for video_data in videos_data:
-            existing = self.session.query(YoutubeVideo).filter_by(video_id=video_data['video_id']).first()
-            if not existing:
-                video = YoutubeVideo(
-                    video_id=video_data['video_id'],
-                    title=video_data['title'],
-                    url=video_data['url'],
-                    channel_id=video_data['channel_id'],
-                    published_at=video_data['published_at'],
-                    description=video_data.get('description', ""),
-                    transcript=video_data.get('transcript')
-                )
-                videos_to_add.append(video)
-        
-        if videos_to_add:
-            self.session.add_all(videos_to_add)
+    # --- NỘI DUNG LỚN (LƯU NÉN, ĐỊNH DANH THEO HASH) ---
+    def store_bodies(self, texts: List[Optional[str]]) -> List[Optional[str]]:
+        """
+        Lưu các văn bản lớn (transcript, thân bài báo) vào content_blobs dạng nén.
+        Trả về hash theo đúng thứ tự đầu vào (None với văn bản rỗng).
+        Nội dung trùng nhau chỉ được lưu một lần. Chưa commit: commit cùng dòng tham chiếu.
+        """
+        hashes = []
+        rows = []
+        for text in texts:
+            row = blob_row(text)
+            hashes.append(row["hash"] if row else None)
+            if row:
+                rows.append(row)
+
+        unique_rows = list({row["hash"]: row for row in rows}.values())
+        for start in range(0, len(unique_rows), BULK_CHUNK_SIZE):
+            chunk = unique_rows[start:start + BULK_CHUNK_SIZE]
+            stmt = self._insert(ContentBlob).on_conflict_do_nothing(index_elements=["hash"])
+            self.session.execute(stmt, chunk)
+        return hashes
+
+    def load_bodies(self, hashes: List[str]) -> Dict[str, str]:
+        """Đọc và giải nén nhiều nội dung trong 1 query. Trả về {hash: văn bản}."""
+        unique_hashes = {h for h in hashes if h}
+        if not unique_hashes:
+            return {}
+        rows = self.session.execute(
+            select(ContentBlob.hash, ContentBlob.codec, ContentBlob.data)
+            .where(ContentBlob.hash.in_(unique_hashes))
+        ).all()
+        return {row.hash: decompress(row.data, row.codec) for row in rows}
+
+    def load_body(self, content_hash: Optional[str]) -> Optional[str]:
+        if not content_hash:
+            return None
+        return self.load_bodies([content_hash]).get(content_hash)
+
+    # --- KIỂM TRA TRÙNG TRƯỚC KHI CÀO (1 QUERY CHO CẢ LÔ) ---
+    def get_existing_video_ids(self, video_ids: List[str]) -> Set[str]:
+        """Trả về các video_id trong danh sách đã có trong DB"""
+        if not video_ids:
+            return set()
+        rows = self.session.query(YoutubeVideo.video_id).filter(
+            YoutubeVideo.video_id.in_(set(video_ids))
+        ).all()
+        return {row.video_id for row in rows}
+
+    def get_existing_news_urls(self, urls: List[str]) -> Set[str]:
+        """Trả về các URL bài báo trong danh sách đã có trong DB"""
+        if not urls:
+            return set()
+        rows = self.session.query(NewsArticle.url).filter(
+            NewsArticle.url.in_(set(urls))
+        ).all()
+        return {row.url for row in rows}
+
+    # --- GHI HÀNG LOẠT (INSERT ... ON CONFLICT DO NOTHING) ---
+    def _insert(self, model):
+        # on_conflict_do_nothing chỉ có ở dialect cụ thể (Postgres, hoặc SQLite khi chạy local)
+        if self.session.get_bind().dialect.name == "sqlite":
+            return sqlite.insert(model)
+        return postgresql.insert(model)
+
+    def _bulk_insert_ignore(self, model, rows: List[Dict[str, Any]], key: str, *returning, commit: bool = True) -> List[Any]:
+        """
+        Chèn theo chunk bằng Core (không tạo ORM object), bỏ qua dòng trùng `key`.
+        Trả về giá trị các cột `returning` của những dòng thực sự được chèn
+        (giá trị đơn nếu chỉ có 1 cột, tuple nếu nhiều cột).
+        commit=False: để người gọi ghi thêm (vd chỉ mục tìm kiếm) trong cùng transaction.
+        """
+        # Bỏ trùng ngay trong input để mỗi key chỉ xuất hiện 1 lần
+        unique_rows = list({row[key]: row for row in rows}.values())
+        inserted = []
+        for start in range(0, len(unique_rows), BULK_CHUNK_SIZE):
+            chunk = unique_rows[start:start + BULK_CHUNK_SIZE]
+            stmt = (
+                self._insert(model)
+                .on_conflict_do_nothing(index_elements=[key])
+                .returning(*returning)
+            )
+            result = self.session.execute(stmt, chunk)
+            if len(returning) == 1:
+                inserted.extend(result.scalars().all())
+            else:
+                inserted.extend(tuple(row) for row in result.all())
+        if commit:
             self.session.commit()
+        return inserted
+
+    def bulk_create_youtube_videos(self, videos_data: List[Dict[str, Any]]) -> List[str]:
+        """Lưu nhiều video, bỏ qua video đã tồn tại. Trả về video_id các video mới."""
+        transcript_hashes = self.store_bodies([video_data.get('transcript') for video_data in videos_data])
+        rows = [
+            {
+                "video_id": video_data['video_id'],
+                "title": video_data['title'],
+                "url": video_data['url'],
+                "channel_id": video_data['channel_id'],
+                "published_at": video_data['published_at'],
+                "description": video_data.get('description', ""),
+                "transcript_hash": transcript_hash,
+            }
+            for video_data, transcript_hash in zip(videos_data, transcript_hashes)
+        ]
+        if not rows:
+            return []
+        inserted = self._bulk_insert_ignore(YoutubeVideo, rows, "video_id", YoutubeVideo.video_id, commit=False)
+        new_ids = set(inserted)
+        self._index_documents([
+            self._video_search_row(video_data, video_data.get('transcript'))
+            for video_data in videos_data if video_data['video_id'] in new_ids
+        ])
+        self.session.commit()
+        return inserted
+
+    def bulk_create_news_articles(self, articles_data: List[Dict[str, Any]]) -> Dict[str, int]:
+        """Lưu nhiều bài báo, bỏ qua bài trùng URL. Trả về {url: id} của các bài mới."""
+        content_hashes = self.store_bodies([article_data.get('content') for article_data in articles_data])
+        rows = [
+            {
+                "title": article_data['title'],
+                "url": article_data['url'],
+                "source": article_data['source'],
+                "published_at": article_data['published_at'],
+                "content_hash": content_hash,
+            }
+            for article_data, content_hash in zip(articles_data, content_hashes)
+        ]
+        if not rows:
+            return {}
+        inserted = dict(self._bulk_insert_ignore(NewsArticle, rows, "url", NewsArticle.url, NewsArticle.id, commit=False))
+        self._index_documents([
+            self._search_row(
+                "news", inserted[article_data['url']], article_data['title'], article_data['url'],
+                article_data['published_at'], article_data.get('content'),
+            )
+            for article_data in {a['url']: a for a in articles_data}.values() if article_data['url'] in inserted
+        ])
+        self.session.commit()
+        return inserted
+
+    # --- TRANSCRIPT (LẤY BÙ + THỬ LẠI THEO BACKOFF) ---
+    def get_youtube_videos_without_transcript(self, limit: Optional[int] = None) -> List[Any]:
+        """
+        Các video chưa có transcript và đã tới hạn thử lại, mới nhất trước.
+        Chỉ lấy video_id và published_at.
+        """
+        now = datetime.now(timezone.utc)
+        stmt = (
+            select(YoutubeVideo.video_id, YoutubeVideo.published_at)
+            .where(
+                YoutubeVideo.transcript_hash.is_(None),
+                or_(YoutubeVideo.transcript_retry_at.is_(None), YoutubeVideo.transcript_retry_at <= now),
+            )
+            .order_by(YoutubeVideo.published_at.desc())
+            .limit(limit)
+        )
+        return self.session.execute(stmt).all()
+
+    def bulk_update_youtube_transcripts(self, transcripts: Dict[str, str]) -> None:
+        """Ghi transcript cho nhiều video trong 1 lệnh UPDATE theo khóa chính (executemany)."""
+        if not transcripts:
+            return
+        video_ids = list(transcripts)
+        transcript_hashes = self.store_bodies([transcripts[video_id] for video_id in video_ids])
+        self.session.execute(update(YoutubeVideo), [
+            {"video_id": video_id, "transcript_hash": transcript_hash, "transcript_retry_at": None}
+            for video_id, transcript_hash in zip(video_ids, transcript_hashes)
+        ])
+        # Index lại video kèm transcript vừa có
+        videos = self.session.execute(
+            select(YoutubeVideo.video_id, YoutubeVideo.title, YoutubeVideo.url,
+                   YoutubeVideo.published_at, YoutubeVideo.description)
+            .where(YoutubeVideo.video_id.in_(video_ids))
+        ).mappings().all()
+        self._index_documents([self._video_search_row(video, transcripts[video["video_id"]]) for video in videos])
+        self.session.commit()
+
+    def update_youtube_video_transcript(self, video_id: str, transcript: str) -> None:
+        self.bulk_update_youtube_transcripts({video_id: transcript})
 
-    def bulk_create_news_articles(self, articles_data: List[Dict[str, Any]]):
-        articles_to_add = []
-        for article_data in articles_data:
-            existing = self.session.query(NewsArticle).filter_by(url=article_data['url']).first()
-            if not existing:
-                article = NewsArticle(
-                    title=article_data['title'],
-                    url=article_data['url'],
-                    source=article_data['source'],
-                    published_at=article_data['published_at'],
-                    content=article_data.get('content')
-                )
-                articles_to_add.append(article)
-
-        if articles_to_add:
-            self.session.add_all(articles_to_add)
+    def mark_transcripts_unavailable(self, video_ids: List[str]) -> None:
+        """
+        Ghi nhận lần lấy transcript thất bại: tăng số lần thử và hẹn giờ thử lại
+        theo backoff lũy thừa, thay vì đánh dấu vĩnh viễn.
+        """
+        if not video_ids:
+            return
+        attempts = dict(self.session.execute(
+            select(YoutubeVideo.video_id, YoutubeVideo.transcript_attempts)
+            .where(YoutubeVideo.video_id.in_(set(video_ids)))
+        ).all())
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for video_id, previous_attempts in attempts.items():
+            previous_attempts = previous_attempts or 0
+            delay = min(TRANSCRIPT_RETRY_MAX, TRANSCRIPT_RETRY_BASE * 2 ** min(previous_attempts, 16))
+            rows.append({
+                "video_id": video_id,
+                "transcript_hash": None,
+                "transcript_attempts": previous_attempts + 1,
+                "transcript_retry_at": now + delay,
+            })
+        if rows:
+            self.session.execute(update(YoutubeVideo), rows)
             self.session.commit()
 
+    # --- PHÁT HIỆN TIN GẦN TRÙNG (SIMHASH + LSH THEO BAND) ---
+    def register_fingerprints(self, fingerprints: List[Tuple[str, str, int]]) -> Dict[str, str]:
+        """
+        Lưu simhash của các nội dung mới: [(article_type, article_id, simhash)].
+        Mỗi nội dung được so với các bản đã lưu (và các bản trước nó trong cùng lô);
+        ứng viên chỉ lấy từ các dòng trùng ít nhất 1 band nên chi phí không tăng
+        tuyến tính theo kho dữ liệu. Trả về {id: id bản đại diện} cho các bản gần trùng.
+        """
+        if not fingerprints:
+            return {}
+
+        band_columns = [ContentFingerprint.band_0, ContentFingerprint.band_1,
+                        ContentFingerprint.band_2, ContentFingerprint.band_3]
+        band_values = [set() for _ in band_columns]
+        for _, _, fingerprint in fingerprints:
+            for i, value in enumerate(bands(fingerprint)):
+                band_values[i].add(value)
+
+        candidates = self.session.execute(
+            select(ContentFingerprint.id, ContentFingerprint.simhash, ContentFingerprint.duplicate_of)
+            .where(or_(*(column.in_(values) for column, values in zip(band_columns, band_values))))
+        ).all()
+        # (id, simhash không dấu, id bản đại diện)
+        known = [(c.id, to_unsigned(c.simhash), c.duplicate_of or c.id) for c in candidates]
+
+        duplicates: Dict[str, str] = {}
+        rows = []
+        for article_type, article_id, fingerprint in fingerprints:
+            key = f"{article_type}:{article_id}"
+            representative = None
+            for other_id, other_fingerprint, other_representative in known:
+                if other_id != key and hamming_distance(fingerprint, other_fingerprint) <= MAX_HAMMING_DISTANCE:
+                    representative = other_representative
+                    break
+            if representative:
+                duplicates[key] = representative
+            known.append((key, fingerprint, representative or key))
+
+            band_0, band_1, band_2, band_3 = bands(fingerprint)
+            rows.append({
+                "id": key,
+                "article_type": article_type,
+                "article_id": article_id,
+                "simhash": to_signed(fingerprint),
+                "band_0": band_0,
+                "band_1": band_1,
+                "band_2": band_2,
+                "band_3": band_3,
+                "duplicate_of": representative,
+            })
+
+        self._bulk_insert_ignore(ContentFingerprint, rows, "id", ContentFingerprint.id)
+        return duplicates
+
+    # --- TRẠNG THÁI POLLING THEO NGUỒN (SCHEDULER) ---
+    def get_feed_states(self, state_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Trả về {id: trạng thái} của các nguồn đã có trong DB."""
+        if not state_ids:
+            return {}
+        rows = self.session.execute(
+            select(FeedState.__table__).where(FeedState.id.in_(set(state_ids)))
+        ).mappings().all()
+        return {row["id"]: dict(row) for row in rows}
+
+    def save_feed_states(self, states: List[Dict[str, Any]]) -> None:
+        """Ghi (insert hoặc cập nhật) trạng thái polling của nhiều nguồn trong 1 lệnh."""
+        if not states:
+            return
+        columns = [column.name for column in FeedState.__table__.columns]
+        rows = [{name: state.get(name) for name in columns} for state in states]
+        for row in rows:
+            row["last_new_count"] = row["last_new_count"] or 0
+        stmt = self._insert(FeedState)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={name: stmt.excluded[name] for name in columns if name != "id"},
+        )
+        self.session.execute(stmt, rows)
+        self.session.commit()
+
+    # --- CHECKPOINT CỦA BACKFILL ---
+    def get_backfill_checkpoints(self, run: str) -> Dict[str, Dict[str, Any]]:
+        """Trả về {id: checkpoint} của một lượt backfill."""
+        rows = self.session.execute(
+            select(BackfillCheckpoint.__table__).where(BackfillCheckpoint.run == run)
+        ).mappings().all()
+        return {row["id"]: dict(row) for row in rows}
+
+    def save_backfill_checkpoints(self, checkpoints: List[Dict[str, Any]]) -> None:
+        """Ghi (insert hoặc cập nhật) checkpoint của nhiều nguồn trong 1 lệnh, commit ngay."""
+        if not checkpoints:
+            return
+        columns = [column.name for column in BackfillCheckpoint.__table__.columns]
+        rows = [{name: checkpoint.get(name) for name in columns} for checkpoint in checkpoints]
+        stmt = self._insert(BackfillCheckpoint)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["id"],
+            set_={name: stmt.excluded[name] for name in columns if name != "id"},
+        )
+        self.session.execute(stmt, rows)
+        self.session.commit()
+
+    # --- HÀNG ĐỢI VIỆC (NHIỀU WORKER, LEASE + SKIP LOCKED) ---
+    def enqueue_jobs(self, kind: str, keys: List[str], run_after: Optional[datetime] = None) -> int:
+        """
+        Thêm việc vào hàng đợi, idempotent theo (kind, key): việc đang chờ / đang chạy
+        giữ nguyên, việc đã xong được đưa về pending (dùng cho việc lặp lại như cào feed).
+        Việc đã failed (hết lượt thử) không tự chạy lại. Trả về số việc mới / được kích hoạt lại.
+        """
+        if not keys:
+            return 0
+        now = datetime.now(timezone.utc)
+        rows = [
+            {
+                "id": f"{kind}:{key}",
+                "kind": kind,
+                "key": key,
+                "status": "pending",
+                "attempts": 0,
+                "run_after": run_after or now,
+                "created_at": now,
+            }
+            for key in dict.fromkeys(keys)
+        ]
+        enqueued = 0
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            stmt = self._insert(Job)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["id"],
+                set_={
+                    "status": stmt.excluded.status,
+                    "attempts": 0,
+                    "run_after": stmt.excluded.run_after,
+                    "last_error": None,
+                    "finished_at": None,
+                },
+                where=Job.status == "done",
+            ).returning(Job.id)
+            enqueued += len(self.session.execute(stmt, rows[start:start + BULK_CHUNK_SIZE]).all())
+        self.session.commit()
+        return enqueued
+
+    def claim_jobs(
+        self,
+        kinds: List[str],
+        owner: str,
+        limit: int,
+        lease: timedelta,
+        max_attempts: int = JOB_MAX_ATTEMPTS,
+    ) -> List[Dict[str, Any]]:
+        """
+        Nhận tối đa `limit` việc và giữ lease tới now + lease.
+        Trên Postgres, SELECT ... FOR UPDATE SKIP LOCKED cho phép nhiều worker (nhiều máy)
+        nhận việc cùng lúc mà không chờ nhau và không nhận trùng. Việc có lease hết hạn
+        (worker chết giữa chừng) được nhận lại; việc đã dùng hết lượt thử chuyển sang failed.
+        """
+        now = datetime.now(timezone.utc)
+        expired = and_(Job.status == "running", Job.lease_expires_at <= now)
+        self.session.execute(
+            update(Job)
+            .where(Job.kind.in_(kinds), expired, Job.attempts >= max_attempts)
+            .values(status="failed", lease_owner=None, lease_expires_at=None,
+                    last_error="lease expired", finished_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        candidates = (
+            select(Job.id)
+            .where(
+                Job.kind.in_(kinds),
+                or_(and_(Job.status == "pending", Job.run_after <= now), expired),
+            )
+            .order_by(Job.run_after)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        rows = self.session.execute(
+            update(Job)
+            .where(Job.id.in_(candidates.scalar_subquery()))
+            .values(status="running", lease_owner=owner, lease_expires_at=now + lease, attempts=Job.attempts + 1)
+            .returning(Job.id, Job.kind, Job.key, Job.attempts)
+            .execution_options(synchronize_session=False)
+        ).mappings().all()
+        self.session.commit()
+        return [dict(row) for row in rows]
+
+    def extend_job_leases(self, job_ids: List[str], owner: str, lease: timedelta) -> int:
+        """Gia hạn lease cho các việc còn đang chạy (heartbeat của worker)."""
+        if not job_ids:
+            return 0
+        result = self.session.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids), Job.lease_owner == owner, Job.status == "running")
+            .values(lease_expires_at=datetime.now(timezone.utc) + lease)
+            .execution_options(synchronize_session=False)
+        )
+        self.session.commit()
+        return result.rowcount
+
+    def complete_jobs(self, job_ids: List[str], owner: str) -> int:
+        """
+        Đánh dấu xong. Chỉ áp dụng khi worker vẫn giữ lease: nếu lease đã hết và việc
+        bị worker khác nhận lại thì lần ghi này bị bỏ qua (kết quả ghi DB vốn idempotent).
+        """
+        if not job_ids:
+            return 0
+        result = self.session.execute(
+            update(Job)
+            .where(Job.id.in_(job_ids), Job.lease_owner == owner, Job.status == "running")
+            .values(status="done", lease_owner=None, lease_expires_at=None,
+                    last_error=None, finished_at=datetime.now(timezone.utc))
+            .execution_options(synchronize_session=False)
+        )
+        self.session.commit()
+        return result.rowcount
+
+    def fail_jobs(self, errors: Dict[str, str], owner: str, max_attempts: int = JOB_MAX_ATTEMPTS) -> None:
+        """Ghi lỗi; còn lượt thì hẹn chạy lại theo backoff lũy thừa, hết lượt thì failed."""
+        if not errors:
+            return
+        attempts = dict(self.session.execute(
+            select(Job.id, Job.attempts)
+            .where(Job.id.in_(list(errors)), Job.lease_owner == owner, Job.status == "running")
+        ).all())
+
+        now = datetime.now(timezone.utc)
+        rows = []
+        for job_id, job_attempts in attempts.items():
+            exhausted = job_attempts >= max_attempts
+            delay = min(JOB_RETRY_MAX, JOB_RETRY_BASE * 2 ** min(job_attempts - 1, 16))
+            rows.append({
+                "id": job_id,
+                "status": "failed" if exhausted else "pending",
+                "run_after": now if exhausted else now + delay,
+                "lease_owner": None,
+                "lease_expires_at": None,
+                "last_error": errors[job_id][:2000],
+                "finished_at": now if exhausted else None,
+            })
+        if rows:
+            self.session.execute(update(Job), rows)
+            self.session.commit()
+
+    def job_counts(self) -> Dict[str, Dict[str, int]]:
+        """Số việc theo {kind: {status: n}} (theo dõi hàng đợi)."""
+        counts: Dict[str, Dict[str, int]] = {}
+        rows = self.session.execute(
+            select(Job.kind, Job.status, func.count()).group_by(Job.kind, Job.status)
+        ).all()
+        for kind, status, count in rows:
+            counts.setdefault(kind, {})[status] = count
+        return counts
+
+    def get_articles_for_digest(self, keys: List[str]) -> List[Dict[str, Any]]:
+        """
+        Nạp nội dung cần tóm tắt theo khóa "<type>:<id>" (cùng định dạng Digest.id).
+        Bỏ qua mục đã có digest, nên chạy lại cùng một việc không tóm tắt lại lần nữa.
+        """
+        done = set(self.session.execute(select(Digest.id).where(Digest.id.in_(keys))).scalars().all())
+        video_ids = [key.split(":", 1)[1] for key in keys if key.startswith("youtube:") and key not in done]
+        news_ids = [int(key.split(":", 1)[1]) for key in keys if key.startswith("news:") and key not in done]
+
+        rows = []
+        if video_ids:
+            rows.extend(self.session.execute(
+                select(
+                    literal("youtube").label("type"),
+                    YoutubeVideo.video_id.label("id"),
+                    YoutubeVideo.title,
+                    YoutubeVideo.url,
+                    YoutubeVideo.transcript_hash.label("content_hash"),
+                    YoutubeVideo.published_at,
+                ).where(YoutubeVideo.video_id.in_(video_ids), YoutubeVideo.transcript_hash.isnot(None))
+            ).mappings().all())
+        if news_ids:
+            rows.extend(self.session.execute(
+                select(
+                    literal("news").label("type"),
+                    cast(NewsArticle.id, String).label("id"),
+                    NewsArticle.title,
+                    NewsArticle.url,
+                    NewsArticle.content_hash,
+                    NewsArticle.published_at,
+                ).where(NewsArticle.id.in_(news_ids), NewsArticle.content_hash.isnot(None))
+            ).mappings().all())
+
+        bodies = self.load_bodies([row["content_hash"] for row in rows])
+        return [{**row, "content": bodies.get(row["content_hash"], "")} for row in rows]
+
     # --- CHỨC NĂNG CHO BẢNG TÓM TẮT (DIGESTS) ---
     # --- CHỨC NĂNG TÌM NỘI DUNG ĐỂ TÓM TẮT ---
+    def _is_near_duplicate(self, article_type: str, article_id):
+        # Bản gần trùng không cần tóm tắt riêng: đã liên kết tới bản đại diện qua duplicate_of
+        return exists().where(
+            ContentFingerprint.id == literal(f"{article_type}:", String) + article_id,
+            ContentFingerprint.duplicate_of.isnot(None),
+        )
+
+    def _pending_articles(self):
+        """
+        Subquery các nội dung chưa có digest (video có transcript + bài báo có nội dung),
+        chỉ lấy một bản đại diện cho mỗi cụm tin gần trùng.
+        Anti-join (NOT EXISTS) chạy trong DB; chỉ lấy hash nội dung, không đọc thân bài.
+        """
+        video_has_digest = exists().where(
+            Digest.article_type == "youtube",
+            Digest.article_id == YoutubeVideo.video_id,
+        )
+        videos = select(
+            literal("youtube").label("type"),
+            YoutubeVideo.video_id.label("id"),
+            YoutubeVideo.title,
+            YoutubeVideo.url,
+            YoutubeVideo.transcript_hash.label("content_hash"),
+            YoutubeVideo.published_at,
+        ).where(
+            YoutubeVideo.transcript_hash.isnot(None),
+            ~video_has_digest,
+            ~self._is_near_duplicate("youtube", YoutubeVideo.video_id),
+        )
+
+        news_id = cast(NewsArticle.id, String)
+        news_has_digest = exists().where(
+            Digest.article_type == "news",
+            Digest.article_id == news_id,
+        )
+        news = select(
+            literal("news").label("type"),
+            news_id.label("id"),
+            NewsArticle.title,
+            NewsArticle.url,
+            NewsArticle.content_hash,
+            NewsArticle.published_at,
+        ).where(
+            NewsArticle.content_hash.isnot(None),
+            ~news_has_digest,
+            ~self._is_near_duplicate("news", news_id),
+        )
+
+        return union_all(videos, news).subquery("pending")
+
+    def iter_articles_without_digest(self, limit: Optional[int] = None, batch_size: int = 200, with_content: bool = True) -> Iterator[Dict[str, Any]]:
+        """
+        Duyệt (stream) các nội dung chưa có digest, mới nhất trước.
+        Phân trang keyset theo (published_at, type, id) nên mỗi trang là một query
+        có LIMIT, bộ nhớ chỉ phụ thuộc batch_size chứ không phụ thuộc tổng lịch sử.
+        with_content=True: nạp thân bài của cả trang trong 1 query vào khóa "content";
+        False: chỉ liệt kê (có content_hash để nạp sau bằng load_bodies).
+        """
+        pending = self._pending_articles()
+        sort_key = (pending.c.published_at, pending.c.type, pending.c.id)
+        last_key = None
+        remaining = limit
+
+        while remaining is None or remaining > 0:
+            page_size = batch_size if remaining is None else min(batch_size, remaining)
+            stmt = select(pending).order_by(*(col.desc() for col in sort_key)).limit(page_size)
+            if last_key is not None:
+                stmt = stmt.where(tuple_(*sort_key) < tuple_(*last_key))
+
+            rows = self.session.execute(stmt).mappings().all()
+            if not rows:
+                return
+
+            bodies = self.load_bodies([row["content_hash"] for row in rows]) if with_content else {}
+            for row in rows:
+                item = dict(row)
+                if with_content:
+                    item["content"] = bodies.get(item["content_hash"], "")
+                yield item
+
+            last = rows[-1]
+            last_key = (last["published_at"], last["type"], last["id"])
+            if remaining is not None:
+                remaining -= len(rows)
+            if len(rows) < page_size:
+                return
+
     def get_articles_without_digest(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
-        articles = []
-        seen_ids = set()
-        
-        digests = self.session.query(Digest).all()
-        for d in digests:
-            seen_ids.add(f"{d.article_type}:{d.article_id}")
-        
-        youtube_videos = self.session.query(YoutubeVideo).filter(
-            YoutubeVideo.transcript.isnot(None),
-            YoutubeVideo.transcript != "__UNAVAILABLE__"
-        ).all()
-        for video in youtube_videos:
-            key = f"youtube:{video.video_id}"
-            if key not in seen_ids:
-                articles.append({
-                    "type": "youtube",
-                    "id": video.video_id,
-                    "title": video.title,
-                    "url": video.url,
-                    "content": video.transcript or video.description or "",
-                    "published_at": video.published_at
-                })      
-        if limit:
-            articles = articles[:limit]
-        
-        return articles
+        return list(self.iter_articles_without_digest(limit=limit))
 
     def get_videos_without_digest(self, limit: Optional[int] = 10) -> List[YoutubeVideo]:
         """
         Lấy các video YouTube chưa có trong bảng tóm tắt (digests).
         Sử dụng LEFT JOIN để tìm các video không có digest tương ứng.
         """
-        # NOTE: This marker is also defined in services/process_youtube.py
-        # It should ideally be moved to a central constants file.
-        TRANSCRIPT_UNAVAILABLE_MARKER = "__UNAVAILABLE__"
-
         return (
             self.session.query(YoutubeVideo)
             .outerjoin(
@@ -132,38 +688,63 @@ class Repository:
                 & (Digest.article_type == "youtube"),
             )
             .filter(Digest.id.is_(None))
-            .filter(YoutubeVideo.transcript.isnot(None))
-            .filter(YoutubeVideo.transcript != TRANSCRIPT_UNAVAILABLE_MARKER)
+            .filter(YoutubeVideo.transcript_hash.isnot(None))
             .limit(limit)
             .all()
         )
 
     
-    def create_digest(self, article_type: str, article_id: str, url: str, title: str, summary: str, published_at: Optional[datetime] = None) -> Optional[Digest]:
-        digest_id = f"{article_type}:{article_id}"
-        existing = self.session.query(Digest).filter_by(id=digest_id).first()
-        if existing:
-            return None
-        
+    def _digest_row(self, article_type: str, article_id: str, url: str, title: str, summary: str, published_at: Optional[datetime] = None) -> Dict[str, Any]:
         if published_at:
             if published_at.tzinfo is None:
                 published_at = published_at.replace(tzinfo=timezone.utc)
             created_at = published_at
         else:
             created_at = datetime.now(timezone.utc)
-        
-        digest = Digest(
-            id=digest_id,
-            article_type=article_type,
-            article_id=article_id,
-            url=url,
-            title=title,
-            summary=summary,
-            created_at=created_at
-        )
-        self.session.add(digest)
+
+        return {
+            "id": f"{article_type}:{article_id}",
+            "article_type": article_type,
+            "article_id": article_id,
+            "url": url,
+            "title": title,
+            "summary": summary,
+            "created_at": created_at,
+        }
+
+    def _create_digests(self, rows: List[Dict[str, Any]]) -> List[str]:
+        inserted = self._bulk_insert_ignore(Digest, rows, "id", Digest.id, commit=False)
+        new_ids = set(inserted)
+        self._index_documents([
+            self._search_row("digest", row["id"], row["title"], row["url"], row["created_at"], row["summary"])
+            for row in {row["id"]: row for row in rows}.values() if row["id"] in new_ids
+        ])
         self.session.commit()
-        return digest
+        return inserted
+
+    def create_digest(self, article_type: str, article_id: str, url: str, title: str, summary: str, published_at: Optional[datetime] = None) -> Optional[Digest]:
+        row = self._digest_row(article_type, article_id, url, title, summary, published_at)
+        inserted = self._create_digests([row])
+        if not inserted:
+            return None
+        return Digest(**row)
+
+    def bulk_create_digests(self, digests_data: List[Dict[str, Any]]) -> List[str]:
+        """Lưu nhiều digest (cùng khóa với create_digest). Trả về id các digest mới."""
+        rows = [
+            self._digest_row(
+                article_type=d['article_type'],
+                article_id=d['article_id'],
+                url=d['url'],
+                title=d['title'],
+                summary=d['summary'],
+                published_at=d.get('published_at'),
+            )
+            for d in digests_data
+        ]
+        if not rows:
+            return []
+        return self._create_digests(rows)
     
     def get_recent_digests(self, hours: int = 24) -> List[Dict[str, Any]]:
         cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
@@ -184,3 +765,123 @@ class Repository:
             for d in digests
         ]
 
+    # --- VECTOR ĐẶC TRƯNG CỦA DIGEST (GOM CỤM CÂU CHUYỆN) ---
+    def get_recent_digest_vectors(self, hours: int, version: int) -> List[Dict[str, Any]]:
+        """
+        Digest trong `hours` giờ gần nhất (không đọc summary) kèm vector đặc trưng đã cache
+        (terms / tf là None nếu chưa có vector đúng `version`).
+        """
+        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
+        rows = self.session.execute(
+            select(Digest.id, Digest.article_type, Digest.article_id, Digest.url, Digest.title,
+                   Digest.created_at, DigestVector.terms, DigestVector.tf)
+            .outerjoin(DigestVector, and_(DigestVector.digest_id == Digest.id, DigestVector.version == version))
+            .where(Digest.created_at >= cutoff_time)
+            .order_by(Digest.created_at.desc())
+        ).mappings().all()
+        return [dict(row) for row in rows]
+
+    def get_digest_summaries(self, digest_ids: List[str]) -> Dict[str, str]:
+        """Trả về {id: summary} của các digest, đọc theo chunk."""
+        summaries = {}
+        for start in range(0, len(digest_ids), BULK_CHUNK_SIZE):
+            rows = self.session.execute(
+                select(Digest.id, Digest.summary).where(Digest.id.in_(digest_ids[start:start + BULK_CHUNK_SIZE]))
+            ).all()
+            summaries.update(dict(rows))
+        return summaries
+
+    def save_digest_vectors(self, vectors: List[Dict[str, Any]]) -> None:
+        """Ghi (insert hoặc thay thế) vector đặc trưng: [{digest_id, version, terms, tf}]."""
+        if not vectors:
+            return
+        now = datetime.now(timezone.utc)
+        rows = [{**vector, "created_at": now} for vector in vectors]
+        for start in range(0, len(rows), BULK_CHUNK_SIZE):
+            stmt = self._insert(DigestVector)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["digest_id"],
+                set_={name: stmt.excluded[name] for name in ("version", "terms", "tf", "created_at")},
+            )
+            self.session.execute(stmt, rows[start:start + BULK_CHUNK_SIZE])
+        self.session.commit()
+
+    # --- TÌM KIẾM TOÀN VĂN (POSTGRES TSVECTOR + GIN / SQLITE FTS5) ---
+    def _search_row(self, kind: str, ref, title: str, url: Optional[str], published_at: Optional[datetime], *parts: Optional[str]) -> Dict[str, Any]:
+        return {
+            "key": f"{kind}:{ref}",
+            "kind": kind,
+            "ref": str(ref),
+            "title": title,
+            "url": url,
+            "published_at": published_at,
+            "document": build_document(title, *parts),
+        }
+
+    def _video_search_row(self, video: Dict[str, Any], transcript: Optional[str]) -> Dict[str, Any]:
+        return self._search_row(
+            "youtube", video["video_id"], video["title"], video["url"], video["published_at"],
+            video.get("description"), transcript,
+        )
+
+    def _index_documents(self, rows: List[Dict[str, Any]]) -> None:
+        """
+        Ghi (insert hoặc thay thế) tài liệu vào chỉ mục tìm kiếm theo khóa "<kind>:<ref>".
+        Chưa commit: commit cùng dòng dữ liệu gốc. tsv (Postgres) / FTS5 (SQLite, qua trigger)
+        được DB cập nhật theo cột document.
+        """
+        unique_rows = list({row["key"]: row for row in rows}.values())
+        for start in range(0, len(unique_rows), BULK_CHUNK_SIZE):
+            stmt = self._insert(SearchDocument)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=["key"],
+                set_={name: stmt.excluded[name] for name in ("title", "url", "published_at", "document")},
+            )
+            self.session.execute(stmt, unique_rows[start:start + BULK_CHUNK_SIZE])
+
+    def search(
+        self,
+        query: str,
+        limit: int = 20,
+        offset: int = 0,
+        kinds: Optional[List[str]] = None,
+        since: Optional[datetime] = None,
+    ) -> List[Dict[str, Any]]:
+        """
+        Tìm bài báo / video / digest chứa mọi từ trong query (không phân biệt dấu tiếng Việt:
+        "tri tue" khớp "Trí tuệ"). Xếp theo độ liên quan rồi mới nhất trước, phân trang limit/offset.
+        kinds: lọc theo loại ("news", "youtube", "digest"); since: chỉ lấy nội dung đăng sau mốc này.
+        Mỗi kết quả gồm key, kind, ref, title, url, published_at và rank (càng lớn càng khớp).
+        """
+        terms = query_terms(query)
+        if not terms:
+            return []
+
+        if self.session.get_bind().dialect.name == "sqlite":
+            # Mỗi từ đặt trong ngoặc kép (không bị hiểu là cú pháp FTS5), các từ nối bằng AND
+            match = " ".join(f'"{term}"' for term in terms)
+            rank = (-_search_fts.c.rank).label("rank")
+            stmt = (
+                select(SearchDocument.key, SearchDocument.kind, SearchDocument.ref, SearchDocument.title,
+                       SearchDocument.url, SearchDocument.published_at, rank)
+                .join(_search_fts, _search_fts.c.rowid == SearchDocument.id)
+                .where(literal_column("search_documents_fts").op("MATCH")(match))
+                .order_by(_search_fts.c.rank, SearchDocument.published_at.desc())
+            )
+        else:
+            tsquery = func.plainto_tsquery(literal("simple"), " ".join(terms))
+            tsv = literal_column("search_documents.tsv")
+            rank = func.ts_rank_cd(tsv, tsquery).label("rank")
+            stmt = (
+                select(SearchDocument.key, SearchDocument.kind, SearchDocument.ref, SearchDocument.title,
+                       SearchDocument.url, SearchDocument.published_at, rank)
+                .where(tsv.op("@@")(tsquery))
+                .order_by(rank.desc(), SearchDocument.published_at.desc())
+            )
+
+        if kinds:
+            stmt = stmt.where(SearchDocument.kind.in_(kinds))
+        if since:
+            stmt = stmt.where(SearchDocument.published_at >= since)
+        rows = self.session.execute(stmt.limit(limit).offset(offset)).mappings().all()
+        return [dict(row) for row in rows]
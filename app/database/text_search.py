@@ -0,0 +1,73 @@
+"""
+Chuẩn hóa văn bản cho tìm kiếm toàn văn (search_documents).
+
+Văn bản được chuẩn hóa ngay trong Python trước khi đưa vào index, và query cũng được
+chuẩn hóa y như vậy, nên Postgres (tsvector 'simple') và SQLite (FTS5) cho cùng kết quả:
+- bỏ dấu tiếng Việt (bảng chuyển đổi dựng sẵn từ NFD), đ/Đ -> d: "Trí tuệ" khớp cả "tri tue";
+- chữ thường, mọi ký tự không phải chữ/số thành khoảng trắng.
+"""
+import functools
+import itertools
+import re
+import unicodedata
+from typing import Dict, List, Optional
+
+# Giới hạn độ dài văn bản đưa vào index (transcript dài chỉ index phần đầu)
+MAX_INDEXED_CHARS = 20_000
+# Số từ tối đa trong một query
+MAX_QUERY_TERMS = 16
+# Số từ (đã chuẩn hóa) giữ trong cache
+TOKEN_CACHE_SIZE = 65_536
+
+_COMBINING_MARKS = re.compile(r"[\u0300-\u036f]")
+_NON_WORD = re.compile(r"[^\w]+|_")
+
+
+def _build_fold_table() -> Dict[int, str]:
+    """
+    Bảng str.translate: chữ Latin có dấu (gồm toàn bộ chữ tiếng Việt) -> chữ cơ sở,
+    ký tự ASCII không phải chữ/số và dấu câu Unicode -> khoảng trắng.
+    """
+    table = {ord("đ"): "d", ord("Đ"): "d", 0xA0: " "}
+    for code in itertools.chain(range(0xC0, 0x250), range(0x1E00, 0x1F00)):
+        base = _COMBINING_MARKS.sub("", unicodedata.normalize("NFD", chr(code))).lower()
+        if base.isascii() and base.isalnum():
+            table[code] = base
+    for code in range(0x80):
+        if not chr(code).isalnum():
+            table[code] = " "
+    # Dấu câu Unicode: ngoặc kép cong, gạch ngang, dấu ba chấm...
+    for code in range(0x2000, 0x2070):
+        table[code] = " "
+    return table
+
+
+_FOLD = _build_fold_table()
+
+
+@functools.lru_cache(maxsize=TOKEN_CACHE_SIZE)
+def _fold(token: str) -> str:
+    folded = token.translate(_FOLD).lower()
+    if not folded.isascii():
+        # Ký tự ngoài bảng (chữ viết khác, emoji...): NFD, bỏ dấu kết hợp, bỏ ký tự không phải chữ/số
+        folded = unicodedata.normalize("NFD", folded)
+        folded = _NON_WORD.sub(" ", _COMBINING_MARKS.sub("", folded).lower())
+    return " ".join(folded.split())
+
+
+def normalize(text: Optional[str]) -> str:
+    if not text:
+        return ""
+    # Chuẩn hóa theo từ, có cache: văn bản thật lặp lại rất nhiều từ (phân phối Zipf)
+    return " ".join(filter(None, map(_fold, text.split())))
+
+
+def build_document(*parts: Optional[str]) -> str:
+    """Văn bản được index của một tài liệu: ghép các phần (tiêu đề, mô tả, thân bài) đã chuẩn hóa."""
+    document = " ".join(normalize(part[:MAX_INDEXED_CHARS]) for part in parts if part)
+    return document[:MAX_INDEXED_CHARS]
+
+
+def query_terms(query: str) -> List[str]:
+    """Các từ của query sau chuẩn hóa (bỏ trùng, giữ thứ tự)."""
+    return list(dict.fromkeys(normalize(query).split()))[:MAX_QUERY_TERMS]
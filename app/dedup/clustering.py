@@ -0,0 +1,202 @@
+"""
+Gom các digest cùng một câu chuyện (nhiều nguồn đưa cùng một tin) và xếp hạng theo độ nóng.
+
+1. Mỗi digest có một vector đặc trưng băm (hashed features): unigram + bigram của văn bản
+   đã chuẩn hóa (bỏ dấu), băm crc32 vào không gian 2^FEATURE_BITS, lưu (term, tf).
+   Vector chỉ phụ thuộc văn bản nên được cache trong DB (digest_vectors).
+2. Mỗi lần gom: trọng số TF-IDF theo IDF của chính cửa sổ thời gian, rồi chiếu (feature
+   hashing có dấu) xuống PROJECTION_DIM chiều và chuẩn hóa L2 -> ma trận dày n x d.
+3. Ứng viên: hai digest chỉ có thể cùng câu chuyện nếu chung ít nhất một "từ đặc trưng"
+   (SIGNATURE_TERMS từ có trọng số cao nhất của mỗi digest). Cosine được tính bằng nhân
+   ma trận theo từng nhóm digest chung một từ đặc trưng, không so từng cặp trên toàn bộ n^2.
+4. Cạnh có cosine >= ngưỡng được gom bằng union-find (vector hóa: lan truyền nhãn nhỏ nhất
+   + nhảy con trỏ), cụm được xếp theo kích thước và độ mới.
+"""
+import zlib
+from typing import List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ..database.text_search import normalize
+
+# Đổi cách tách / băm đặc trưng thì tăng version: vector cache cũ sẽ được tính lại
+FEATURE_VERSION = 1
+FEATURE_BITS = 20
+PROJECTION_DIM = 512
+SIGNATURE_TERMS = 8
+# Từ đặc trưng xuất hiện ở quá nhiều digest không phân biệt được câu chuyện: bỏ qua nhóm đó
+MAX_GROUP_SIZE = 5000
+# Nhóm ứng viên lớn hơn ngưỡng này được so bằng nhân ma trận theo khối thay vì liệt kê cặp
+BLOCK_GROUP_SIZE = 64
+PAIR_BATCH_SIZE = 65_536
+SIMILARITY_THRESHOLD = 0.3
+# Điểm của cụm giảm một nửa sau mỗi RECENCY_HALF_LIFE_HOURS kể từ bài mới nhất trong cụm
+RECENCY_HALF_LIFE_HOURS = 12.0
+
+_FEATURE_MASK = (1 << FEATURE_BITS) - 1
+
+
+def hashed_features(text: Optional[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """(term, tf) của văn bản: term là id băm uint32 (tăng dần, không trùng), tf là float32."""
+    tokens = normalize(text).split()
+    features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+    if not features:
+        return np.empty(0, dtype=np.uint32), np.empty(0, dtype=np.float32)
+    hashed = np.fromiter(
+        (zlib.crc32(feature.encode("utf-8")) & _FEATURE_MASK for feature in features),
+        dtype=np.uint32, count=len(features),
+    )
+    terms, counts = np.unique(hashed, return_counts=True)
+    return terms, counts.astype(np.float32)
+
+
+def encode_features(terms: np.ndarray, tf: np.ndarray) -> Tuple[bytes, bytes]:
+    """Dạng lưu DB (digest_vectors): mảng little-endian uint32 / float32."""
+    return terms.astype("<u4").tobytes(), tf.astype("<f4").tobytes()
+
+
+def decode_features(terms: bytes, tf: bytes) -> Tuple[np.ndarray, np.ndarray]:
+    return np.frombuffer(terms, dtype="<u4"), np.frombuffer(tf, dtype="<f4")
+
+
+class FeatureMatrix:
+    """Ma trận thưa dạng CSR của n vector đặc trưng: dòng i gồm terms/tf[indptr[i]:indptr[i + 1]]."""
+
+    def __init__(self, vectors: Sequence[Tuple[np.ndarray, np.ndarray]]):
+        lengths = np.fromiter((len(terms) for terms, _ in vectors), dtype=np.int64, count=len(vectors))
+        self.n = len(vectors)
+        self.indptr = np.concatenate(([0], np.cumsum(lengths)))
+        self.rows = np.repeat(np.arange(self.n), lengths)
+        self.terms = np.concatenate([terms for terms, _ in vectors]) if vectors else np.empty(0, np.uint32)
+        self.tf = np.concatenate([tf for _, tf in vectors]) if vectors else np.empty(0, np.float32)
+
+    def tfidf(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Trọng số TF-IDF (tf log, IDF của chính tập này, chuẩn hóa L2 theo dòng) và df của từng phần tử."""
+        _, inverse, df = np.unique(self.terms, return_inverse=True, return_counts=True)
+        idf = np.log((1 + self.n) / (1 + df)) + 1
+        # Từ chỉ có ở một digest không góp vào tích vô hướng nào, chỉ làm loãng chuẩn: bỏ đi
+        weights = np.where(df[inverse] > 1, (1 + np.log(self.tf)) * idf[inverse], 0.0)
+        norms = np.sqrt(np.bincount(self.rows, weights=weights * weights, minlength=self.n))
+        weights = weights / np.maximum(norms, 1e-12)[self.rows]
+        return weights.astype(np.float32), df[inverse]
+
+    def project(self, weights: np.ndarray, dim: int = PROJECTION_DIM) -> np.ndarray:
+        """Chiếu vector thưa xuống dim chiều (cột = bit thấp của term, dấu = bit cao), chuẩn hóa L2."""
+        columns = (self.terms & (dim - 1)).astype(np.int64)
+        signs = np.where(self.terms >> (FEATURE_BITS - 1) & 1, -1.0, 1.0).astype(np.float32)
+        dense = np.zeros((self.n, dim), dtype=np.float32)
+        np.add.at(dense, (self.rows, columns), signs * weights)
+        dense /= np.maximum(np.linalg.norm(dense, axis=1, keepdims=True), 1e-12)
+        return dense
+
+    def signature_groups(self, weights: np.ndarray, df: np.ndarray) -> "CandidateGroups":
+        """Các nhóm dòng chung một từ đặc trưng (mỗi dòng lấy SIGNATURE_TERMS từ nặng nhất)."""
+        # Từ chỉ có ở 1 digest không nối được với ai; từ quá phổ biến không phân biệt được
+        usable = np.flatnonzero((df > 1) & (df <= MAX_GROUP_SIZE))
+        # Theo dòng, trong dòng nặng nhất trước (weights đã chuẩn hóa nên nằm trong [0, 1]);
+        # một khóa float sắp xếp nhanh hơn nhiều so với lexsort hai khóa
+        order = usable[np.argsort(self.rows[usable] * 2.0 - weights[usable], kind="stable")]
+        row_starts = np.searchsorted(self.rows[order], np.arange(self.n))
+        rank = np.arange(len(order)) - row_starts[self.rows[order]]
+        chosen = order[rank < SIGNATURE_TERMS]
+
+        by_term = chosen[np.argsort(self.terms[chosen], kind="stable")]
+        _, starts, sizes = np.unique(self.terms[by_term], return_index=True, return_counts=True)
+        shared = sizes > 1
+        return CandidateGroups(self.rows[by_term], starts[shared], sizes[shared])
+
+
+class CandidateGroups(NamedTuple):
+    # Chỉ số dòng, các nhóm nằm liền nhau: nhóm k là members[starts[k]:starts[k] + sizes[k]]
+    members: np.ndarray
+    starts: np.ndarray
+    sizes: np.ndarray
+
+
+def _ranges(lengths: np.ndarray) -> np.ndarray:
+    """0..lengths[0]-1, 0..lengths[1]-1, ... nối liền (không vòng lặp Python)."""
+    return np.arange(lengths.sum()) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+
+
+def _pairs_within(groups: CandidateGroups, selected: np.ndarray) -> np.ndarray:
+    """Mọi cặp (i, j), i < j, cùng thuộc một trong các nhóm được chọn, đã bỏ trùng."""
+    starts, sizes = groups.starts[selected], groups.sizes[selected]
+    positions = np.repeat(starts, sizes) + _ranges(sizes)
+    following = np.repeat(starts + sizes, sizes) - positions - 1
+    left = np.repeat(positions, following)
+    right = left + 1 + _ranges(following)
+    a, b = groups.members[left], groups.members[right]
+    n = int(groups.members.max()) + 1
+    codes = np.unique(np.minimum(a, b) * n + np.maximum(a, b))
+    return np.stack((codes // n, codes % n), axis=1)
+
+
+def similar_pairs(vectors: np.ndarray, groups: CandidateGroups, threshold: float = SIMILARITY_THRESHOLD) -> np.ndarray:
+    """
+    Các cặp (i, j), i < j, có cosine >= threshold, chỉ xét cặp cùng nhóm ứng viên.
+    Nhóm nhỏ: sinh mọi cặp rồi tính tích vô hướng theo lô; nhóm lớn: nhân ma trận theo khối.
+    """
+    edges = [np.empty((0, 2), dtype=np.int64)]
+    small = groups.sizes <= BLOCK_GROUP_SIZE
+    if small.any():
+        pairs = _pairs_within(groups, small)
+        for start in range(0, len(pairs), PAIR_BATCH_SIZE):
+            batch = pairs[start:start + PAIR_BATCH_SIZE]
+            similarity = np.einsum("ij,ij->i", vectors[batch[:, 0]], vectors[batch[:, 1]])
+            edges.append(batch[similarity >= threshold])
+
+    for start, size in zip(groups.starts[~small], groups.sizes[~small]):
+        group = groups.members[start:start + size]
+        block = vectors[group]
+        left, right = np.nonzero(np.triu(block @ block.T >= threshold, k=1))
+        edges.append(np.stack((group[left], group[right]), axis=1))
+
+    pairs = np.concatenate(edges)
+    pairs.sort(axis=1)
+    return np.unique(pairs, axis=0)
+
+
+def connected_components(n: int, pairs: np.ndarray) -> np.ndarray:
+    """Nhãn cụm của n đỉnh (nhãn = chỉ số nhỏ nhất trong cụm), union-find vector hóa."""
+    labels = np.arange(n)
+    if not len(pairs):
+        return labels
+    left, right = pairs[:, 0], pairs[:, 1]
+    while True:
+        smallest = np.minimum(labels[left], labels[right])
+        previous = labels.copy()
+        np.minimum.at(labels, left, smallest)
+        np.minimum.at(labels, right, smallest)
+        # Nhảy con trỏ: nhãn trỏ tới nhãn của nhãn cho tới khi ổn định
+        while True:
+            jumped = labels[labels]
+            if np.array_equal(jumped, labels):
+                break
+            labels = jumped
+        if np.array_equal(labels, previous):
+            return labels
+
+
+def rank_clusters(labels: np.ndarray, vectors: np.ndarray, age_hours: np.ndarray) -> List[Tuple[np.ndarray, float]]:
+    """
+    Xếp hạng cụm theo size * 0.5^(tuổi bài mới nhất / half-life), cao nhất trước.
+    Trả về [(chỉ số các thành viên, điểm)]; thành viên xếp gần tâm cụm nhất trước,
+    nên thành viên đầu tiên là bản đại diện.
+    """
+    clusters, inverse, sizes = np.unique(labels, return_inverse=True, return_counts=True)
+    newest = np.full(len(clusters), np.inf)
+    np.minimum.at(newest, inverse, age_hours)
+    scores = sizes * 0.5 ** (newest / RECENCY_HALF_LIFE_HOURS)
+
+    centroids = np.zeros((len(clusters), vectors.shape[1]), dtype=np.float32)
+    np.add.at(centroids, inverse, vectors)
+    closeness = np.einsum("ij,ij->i", vectors, centroids[inverse])
+
+    # Thành viên của mỗi cụm liền nhau, trong cụm xếp gần tâm nhất trước
+    order = np.lexsort((-closeness, inverse))
+    bounds = np.concatenate(([0], np.cumsum(sizes)))
+    ranked = []
+    for cluster in np.argsort(-scores, kind="stable"):
+        members = order[bounds[cluster]:bounds[cluster + 1]]
+        ranked.append((members, float(scores[cluster])))
+    return ranked
@@ -0,0 +1,67 @@
+import hashlib
+import re
+from collections import Counter
+from typing import List, Optional
+
+# Fingerprint 64 bit, chia thành 4 band 16 bit để tra cứu theo LSH:
+# hai văn bản lệch nhau <= 3 bit chắc chắn trùng khớp ít nhất 1 band (nguyên lý Dirichlet).
+FINGERPRINT_BITS = 64
+BAND_COUNT = 4
+BAND_BITS = FINGERPRINT_BITS // BAND_COUNT
+MAX_HAMMING_DISTANCE = 3
+
+# Shingle gồm 3 từ liên tiếp; văn bản quá ngắn không đủ tin cậy để so trùng
+SHINGLE_SIZE = 3
+MIN_TOKENS = 20
+
+_TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _feature_hash(feature: str) -> int:
+    return int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def simhash(text: str) -> Optional[int]:
+    """
+    Tính SimHash 64 bit (không dấu) của văn bản, dựa trên shingle 3 từ.
+    Trả về None nếu văn bản quá ngắn.
+    """
+    tokens = _TOKEN_PATTERN.findall(text.lower())
+    if len(tokens) < MIN_TOKENS:
+        return None
+
+    shingles = Counter(
+        " ".join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    )
+    weights = [0] * FINGERPRINT_BITS
+    for shingle, count in shingles.items():
+        h = _feature_hash(shingle)
+        for bit in range(FINGERPRINT_BITS):
+            if h >> bit & 1:
+                weights[bit] += count
+            else:
+                weights[bit] -= count
+
+    fingerprint = 0
+    for bit, weight in enumerate(weights):
+        if weight > 0:
+            fingerprint |= 1 << bit
+    return fingerprint
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin((a ^ b) & ((1 << FINGERPRINT_BITS) - 1)).count("1")
+
+
+def bands(fingerprint: int) -> List[int]:
+    mask = (1 << BAND_BITS) - 1
+    return [(fingerprint >> (i * BAND_BITS)) & mask for i in range(BAND_COUNT)]
+
+
+def to_signed(fingerprint: int) -> int:
+    """Đổi sang số có dấu để lưu vào cột BIGINT."""
+    return fingerprint - (1 << FINGERPRINT_BITS) if fingerprint >= 1 << (FINGERPRINT_BITS - 1) else fingerprint
+
+
+def to_unsigned(value: int) -> int:
+    return value & ((1 << FINGERPRINT_BITS) - 1)
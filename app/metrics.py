@@ -0,0 +1,476 @@
+"""
+Đo đạc (metrics + tracing) cho scraper, Repository, DigestAgent và các runner.
+
+- Counter / Gauge / Histogram có label, xuất dạng text Prometheus (render_prometheus)
+  hoặc báo cáo JSON cho một lượt chạy (run_report / write_report).
+- track(name, **labels): đo một lời gọi ra ngoài (HTTP, DB, LLM...): đếm theo outcome,
+  histogram độ trễ <name>_seconds và gauge <name>_in_flight.
+- span(name, trace_id=..., **attrs): span theo từng mục (bài báo, video) để xem một mục
+  tốn thời gian ở stage nào.
+
+Bật bằng METRICS_ENABLED=1 (hoặc enable()). Khi tắt, track/span trả về một context
+manager no-op dùng chung nên chi phí gần như bằng 0.
+METRICS_REPORT_PATH: ghi báo cáo JSON khi runner kết thúc; METRICS_PORT: mở endpoint /metrics.
+"""
+import bisect
+import contextvars
+import json
+import os
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Bucket (giây) cho histogram độ trễ: từ 1ms tới 2 phút
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+# Số span tối đa giữ trong bộ nhớ (span cũ bị bỏ)
+MAX_SPANS = 10_000
+
+_enabled = os.getenv("METRICS_ENABLED", "0").lower() in ("1", "true", "yes")
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+def enable() -> None:
+    global _enabled
+    _enabled = True
+    _instrument_sqlalchemy()
+
+
+def disable() -> None:
+    global _enabled
+    _enabled = False
+
+
+def _label_key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def _format_labels(key: LabelKey, extra: Optional[Dict[str, str]] = None) -> str:
+    pairs = list(key) + sorted((extra or {}).items())
+    if not pairs:
+        return ""
+    escaped = (f'{k}="{v.replace(chr(92), chr(92) * 2).replace(chr(34), chr(92) + chr(34))}"' for k, v in pairs)
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str = ""):
+        self.name = name
+        self.help = help
+        self._values: Dict[LabelKey, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels) -> None:
+        if not _enabled:
+            return
+        key = _label_key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self) -> List[Tuple[str, LabelKey, Optional[Dict[str, str]], float]]:
+        with self._lock:
+            return [(self.name, key, None, value) for key, value in self._values.items()]
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {_format_labels(key) or "total": value for key, value in self._values.items()}
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, amount: float = 1.0, **labels) -> None:
+        self.inc(-amount, **labels)
+
+    def set(self, value: float, **labels) -> None:
+        if not _enabled:
+            return
+        with self._lock:
+            self._values[_label_key(labels)] = value
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(sorted(buckets))
+        # label -> [số lượng theo bucket (không cộng dồn) + bucket +Inf, tổng, số mẫu]
+        self._values: Dict[LabelKey, List[Any]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        if not _enabled:
+            return
+        key = _label_key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _quantile(self, counts: List[int], total: int, q: float) -> float:
+        """Ước lượng phân vị từ bucket (cận trên của bucket chứa phân vị)."""
+        target = q * total
+        running = 0
+        for bound, count in zip(self.buckets + (float("inf"),), counts):
+            running += count
+            if running >= target:
+                return bound
+        return float("inf")
+
+    def samples(self) -> List[Tuple[str, LabelKey, Optional[Dict[str, str]], float]]:
+        result = []
+        with self._lock:
+            for key, (counts, total_sum, count) in self._values.items():
+                running = 0
+                for bound, bucket_count in zip(self.buckets + (float("inf"),), counts):
+                    running += bucket_count
+                    le = "+Inf" if bound == float("inf") else repr(bound)
+                    result.append((f"{self.name}_bucket", key, {"le": le}, running))
+                result.append((f"{self.name}_sum", key, None, total_sum))
+                result.append((f"{self.name}_count", key, None, count))
+        return result
+
+    def snapshot(self) -> Dict[str, Dict[str, float]]:
+        with self._lock:
+            return {
+                _format_labels(key) or "total": {
+                    "count": count,
+                    "sum": round(total_sum, 6),
+                    "mean": round(total_sum / count, 6) if count else 0.0,
+                    "p50": self._quantile(counts, count, 0.50),
+                    "p99": self._quantile(counts, count, 0.99),
+                }
+                for key, (counts, total_sum, count) in self._values.items()
+            }
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name: str, help: str, **kwargs):
+        metric = self._metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self._metrics.get(name)
+                if metric is None:
+                    metric = self._metrics[name] = cls(name, help, **kwargs)
+        return metric
+
+    def counter(self, name: str, help: str = "") -> Counter:
+        return self._get(Counter, name, help)
+
+    def gauge(self, name: str, help: str = "") -> Gauge:
+        return self._get(Gauge, name, help)
+
+    def histogram(self, name: str, help: str = "", buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, buckets=buckets)
+
+    def metrics(self) -> List[Any]:
+        with self._lock:
+            return list(self._metrics.values())
+
+    def clear(self) -> None:
+        with self._lock:
+            self._metrics.clear()
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+# --- ĐO MỘT LỜI GỌI RA NGOÀI ---
+class _Noop:
+    """Context manager rỗng dùng chung khi metrics tắt."""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+    def set(self, **attrs) -> None:
+        pass
+
+
+_NOOP = _Noop()
+
+
+class _Tracked:
+    __slots__ = ("name", "labels", "start", "outcome", "in_flight_labels")
+
+    def __init__(self, name: str, labels: Dict[str, Any]):
+        self.name = name
+        self.labels = labels
+        self.outcome: Optional[str] = None
+
+    def set(self, outcome: Optional[str] = None, **labels) -> None:
+        """Ghi đè outcome (vd: "not_modified", "http_503") hoặc thêm label sau khi đã biết kết quả."""
+        if outcome is not None:
+            self.outcome = outcome
+        self.labels.update(labels)
+
+    def __enter__(self):
+        # Giữ label lúc vào: set() có thể thêm label, in_flight phải giảm đúng series đã tăng
+        self.in_flight_labels = dict(self.labels)
+        gauge(f"{self.name}_in_flight").inc(**self.in_flight_labels)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self.start
+        gauge(f"{self.name}_in_flight").dec(**self.in_flight_labels)
+        outcome = self.outcome or ("error" if exc_type else "ok")
+        histogram(f"{self.name}_seconds").observe(elapsed, **self.labels)
+        counter(f"{self.name}_total").inc(outcome=outcome, **self.labels)
+        return False
+
+
+def track(name: str, **labels):
+    if not _enabled:
+        return _NOOP
+    return _Tracked(name, labels)
+
+
+# --- TRACE SPAN THEO TỪNG MỤC ---
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+_spans: Deque[Dict[str, Any]] = deque(maxlen=MAX_SPANS)
+
+
+class Span:
+    __slots__ = ("name", "trace_id", "span_id", "parent_id", "attrs", "start", "_token")
+
+    def __init__(self, name: str, trace_id: Optional[str], attrs: Dict[str, Any]):
+        parent = _current_span.get()
+        self.name = name
+        self.trace_id = trace_id or (parent.trace_id if parent else uuid.uuid4().hex[:16])
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent.span_id if parent and parent.trace_id == self.trace_id else None
+        self.attrs = attrs
+
+    def set(self, **attrs) -> None:
+        self.attrs.update(attrs)
+
+    def __enter__(self):
+        self.start = time.time()
+        self._token = _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        _current_span.reset(self._token)
+        duration = time.time() - self.start
+        if exc_type:
+            self.attrs["error"] = f"{exc_type.__name__}: {exc}"
+        _spans.append({
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": self.start,
+            "duration": duration,
+            "attrs": self.attrs,
+        })
+        histogram("span_seconds").observe(duration, span=self.name)
+        return False
+
+
+def span(name: str, trace_id: Optional[str] = None, **attrs):
+    if not _enabled:
+        return _NOOP
+    return Span(name, trace_id, attrs)
+
+
+def spans() -> List[Dict[str, Any]]:
+    return list(_spans)
+
+
+# --- HTTP: TÁCH THỜI GIAN THEO PHA (connect gồm cả DNS, tls, gửi, chờ phản hồi, nhận body) ---
+_HTTP_PHASES = {
+    "connection.connect_tcp": "connect",
+    "connection.start_tls": "tls",
+    "http11.send_request_headers": "send",
+    "http11.send_request_body": "send",
+    "http11.receive_response_headers": "wait",
+    "http11.receive_response_body": "receive",
+    "http2.send_request_headers": "send",
+    "http2.send_request_body": "send",
+    "http2.receive_response_headers": "wait",
+    "http2.receive_response_body": "receive",
+}
+
+
+def http_trace(host: str):
+    """
+    Callback cho extension "trace" của httpx (AsyncClient): ghi histogram
+    http_phase_seconds{host, phase}. Trả về None khi metrics tắt.
+    """
+    if not _enabled:
+        return None
+    started: Dict[str, float] = {}
+
+    async def trace(event_name: str, info: Dict[str, Any]) -> None:
+        prefix, _, stage = event_name.rpartition(".")
+        phase = _HTTP_PHASES.get(prefix)
+        if phase is None:
+            return
+        if stage == "started":
+            started[prefix] = time.perf_counter()
+        elif prefix in started:
+            histogram("http_phase_seconds").observe(time.perf_counter() - started.pop(prefix), host=host, phase=phase)
+
+    return trace
+
+
+# --- DB: ĐO MỖI ROUND TRIP QUA EVENT CỦA SQLALCHEMY ---
+_sqlalchemy_instrumented = False
+
+
+def _instrument_sqlalchemy() -> None:
+    global _sqlalchemy_instrumented
+    if _sqlalchemy_instrumented:
+        return
+    try:
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+    except ImportError:
+        return
+
+    @event.listens_for(Engine, "before_cursor_execute")
+    def _before(conn, cursor, statement, parameters, context, executemany):
+        if _enabled:
+            conn.info.setdefault("metrics_start", []).append(time.perf_counter())
+            gauge("db_query_in_flight").inc()
+
+    @event.listens_for(Engine, "after_cursor_execute")
+    def _after(conn, cursor, statement, parameters, context, executemany):
+        starts = conn.info.get("metrics_start")
+        if not _enabled or not starts:
+            return
+        elapsed = time.perf_counter() - starts.pop()
+        gauge("db_query_in_flight").dec()
+        verb = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "OTHER"
+        histogram("db_query_seconds").observe(elapsed, statement=verb)
+        counter("db_query_total").inc(statement=verb)
+
+    @event.listens_for(Engine, "handle_error")
+    def _error(context):
+        starts = context.connection.info.get("metrics_start") if context.connection is not None else None
+        if _enabled and starts:
+            starts.pop()
+            gauge("db_query_in_flight").dec()
+            counter("db_query_errors_total").inc()
+
+    _sqlalchemy_instrumented = True
+
+
+if _enabled:
+    _instrument_sqlalchemy()
+
+
+# --- XUẤT DỮ LIỆU ---
+def _format_value(value: float) -> str:
+    """Giá trị đầy đủ độ chính xác (không dùng :g, vốn chỉ giữ 6 chữ số: 1234567 -> 1.23457e+06)."""
+    value = float(value)
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def render_prometheus() -> str:
+    lines = []
+    for metric in sorted(REGISTRY.metrics(), key=lambda m: m.name):
+        if metric.help:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        for sample_name, key, extra, value in metric.samples():
+            lines.append(f"{sample_name}{_format_labels(key, extra)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _span_summary() -> Dict[str, Dict[str, float]]:
+    durations: Dict[str, List[float]] = {}
+    for record in _spans:
+        durations.setdefault(record["name"], []).append(record["duration"])
+    summary = {}
+    for name, values in durations.items():
+        values.sort()
+        summary[name] = {
+            "count": len(values),
+            "total": round(sum(values), 6),
+            "p50": round(values[len(values) // 2], 6),
+            "p99": round(values[min(len(values) - 1, int(len(values) * 0.99))], 6),
+        }
+    return summary
+
+
+def run_report(include_spans: bool = False) -> Dict[str, Any]:
+    report: Dict[str, Any] = {"counters": {}, "gauges": {}, "histograms": {}, "spans": _span_summary()}
+    for metric in REGISTRY.metrics():
+        section = {"counter": "counters", "gauge": "gauges", "histogram": "histograms"}[metric.kind]
+        report[section][metric.name] = metric.snapshot()
+    if include_spans:
+        report["trace"] = spans()
+    return report
+
+
+def write_report(path: Optional[str] = None, include_spans: bool = True) -> Optional[Path]:
+    """Ghi báo cáo JSON (mặc định theo METRICS_REPORT_PATH). Không làm gì nếu metrics tắt."""
+    path = path or os.getenv("METRICS_REPORT_PATH")
+    if not _enabled or not path:
+        return None
+    output = Path(path)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(run_report(include_spans), indent=2, ensure_ascii=False, default=str), encoding="utf-8")
+    return output
+
+
+def reset() -> None:
+    REGISTRY.clear()
+    _spans.clear()
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path.rstrip("/") == "/metrics":
+            body, content_type = render_prometheus().encode("utf-8"), "text/plain; version=0.0.4"
+        elif self.path.rstrip("/") == "/report":
+            body, content_type = json.dumps(run_report(), default=str).encode("utf-8"), "application/json"
+        else:
+            self.send_error(404)
+            return
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args) -> None:
+        pass
+
+
+def start_http_server(port: Optional[int] = None, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+    """Mở endpoint /metrics (Prometheus) và /report (JSON) trên thread nền; port mặc định từ METRICS_PORT."""
+    port = port if port is not None else int(os.getenv("METRICS_PORT", "0") or 0)
+    if not _enabled or not port:
+        return None
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics-http").start()
+    return server
@@ -0,0 +1,493 @@
+"""
+Pipeline chạy liền mạch: fetch → extract → persist → transcript → summarize.
+
+Các stage nối với nhau bằng asyncio.Queue có giới hạn kích thước, nên:
+- mục nào sẵn sàng thì đi tiếp ngay, các stage chạy chồng lên nhau;
+- bộ nhớ đỉnh phụ thuộc kích thước queue chứ không phụ thuộc khoảng thời gian cào;
+- stage phía sau chậm thì stage phía trước tự chờ (backpressure).
+
+Mọi thao tác DB chạy trên một thread riêng (Session không an toàn khi dùng đồng thời),
+gọi LLM chạy trên thread pool riêng, transcript dùng thread pool của TranscriptFetcher.
+"""
+import asyncio
+import logging
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import metrics
+from app.agent.cache import DigestCache
+from app.agent.rate_limiter import RateLimiter
+from app.agent.summarizer import DigestAgent
+from app.config import YOUTUBE_CHANNELS, NEWS_RSS_FEEDS
+from app.database.repository import Repository
+from app.dedup.simhash import simhash
+from app.scrapers import host_health
+from app.scrapers.fetcher import AsyncFetcher
+from app.scrapers.http_cache import HttpCache
+from app.scrapers.news import Article, WebScraper
+from app.scrapers.transcripts import TranscriptFetcher
+from app.scrapers.youtube import ChannelVideo, YoutubeScraper
+
+logger = logging.getLogger(__name__)
+
+# Đánh dấu hết dữ liệu: mỗi worker của stage nhận một bản rồi dừng
+_DONE = object()
+
+
+class StageStats(BaseModel):
+    name: str
+    processed: int = 0
+    failed: int = 0
+    # Số mục đang chờ trong queue đầu vào (hiện tại và cao nhất)
+    backlog: int = 0
+    peak_backlog: int = 0
+
+
+class Stage:
+    """Một stage của pipeline: queue đầu vào có giới hạn + số liệu thống kê."""
+
+    def __init__(self, name: str, workers: int, queue_size: int):
+        self.name = name
+        self.workers = workers
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self.stats = StageStats(name=name)
+
+    async def put(self, item: Any) -> None:
+        await self.queue.put(item)
+        self.stats.peak_backlog = max(self.stats.peak_backlog, self.queue.qsize())
+        metrics.gauge("pipeline_backlog").set(self.queue.qsize(), stage=self.name)
+
+    async def close(self) -> None:
+        for _ in range(self.workers):
+            await self.queue.put(_DONE)
+
+    async def take_batch(self, max_items: int, linger: float) -> Tuple[List[Any], bool]:
+        """
+        Lấy tối đa max_items mục: chờ mục đầu tiên, sau đó gom thêm trong tối đa
+        `linger` giây. Trả về (lô, done); done=True khi worker đã nhận tín hiệu dừng
+        (lô cuối vẫn phải được xử lý).
+        """
+        batch: List[Any] = []
+        deadline = None
+        while len(batch) < max_items:
+            if deadline is None:
+                item = await self.queue.get()
+                deadline = time.monotonic() + linger
+            else:
+                timeout = deadline - time.monotonic()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+            if item is _DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def snapshot(self) -> StageStats:
+        self.stats.backlog = self.queue.qsize()
+        return self.stats.model_copy()
+
+
+class Pipeline:
+    def __init__(
+        self,
+        hours: int = 24,
+        queue_size: Optional[int] = None,
+        extract_workers: Optional[int] = None,
+        transcript_workers: int = 4,
+        summarize_workers: Optional[int] = None,
+        persist_batch_size: int = 50,
+        summarize_batch_size: int = 8,
+        linger: float = 1.0,
+        report_interval: float = 10.0,
+        summarize: bool = True,
+        channels: Optional[List[str]] = None,
+        feeds: Optional[List[str]] = None,
+        since: Optional[Dict[str, datetime]] = None,
+        http_cache: bool = True,
+    ):
+        """
+        channels / feeds: nguồn cần cào (mặc định lấy từ config).
+        since: watermark theo nguồn {channel_id hoặc rss_url: mốc}; nguồn không có
+        watermark dùng khoảng `hours` như trước.
+        http_cache=False: request không điều kiện, không đọc / ghi cache HTTP (dùng cho backfill).
+        """
+        self.hours = hours
+        self.channels = YOUTUBE_CHANNELS if channels is None else channels
+        self.feeds = NEWS_RSS_FEEDS if feeds is None else feeds
+        self.since = since or {}
+        # Thời điểm đăng của mọi mục trong feed sau mốc, theo nguồn (kể cả mục đã có trong DB).
+        # Scheduler dùng để ước lượng tần suất đăng bài của từng nguồn.
+        self.observed: Dict[str, List[datetime]] = {}
+        # Số mục mới của từng nguồn không tới được DB (bóc nội dung lỗi / ghi lô lỗi)
+        self.lost: Dict[str, int] = {}
+        # summarize=False: khóa "<type>:<id>" của các mục mới lưu cần tóm tắt sau (worker đưa vào hàng đợi)
+        self.unsummarized: List[str] = []
+        self._feed_of: Dict[str, str] = {}
+        self.http_cache = http_cache
+        self.queue_size = queue_size or int(os.getenv("PIPELINE_QUEUE_SIZE", "100"))
+        self.extract_workers = extract_workers or int(os.getenv("FETCH_MAX_CONCURRENCY", "32"))
+        self.transcript_workers = transcript_workers
+        self.summarize_workers = summarize_workers or int(os.getenv("DIGEST_WORKERS", "4"))
+        self.persist_batch_size = persist_batch_size
+        self.summarize_batch_size = summarize_batch_size
+        self.linger = linger
+        self.report_interval = report_interval
+        self.summarize = summarize
+
+    # --- TIỆN ÍCH ---
+    async def _db(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._db_executor, fn, *args)
+
+    async def _llm(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._llm_executor, fn, *args)
+
+    def report(self) -> Dict[str, StageStats]:
+        stats = {"fetch": self._fetch_stats.model_copy()}
+        for stage in self._stages:
+            stats[stage.name] = stage.snapshot()
+        return stats
+
+    async def _reporter(self) -> None:
+        while True:
+            await asyncio.sleep(self.report_interval)
+            logger.info(" | ".join(
+                f"{s.name}: {s.processed} done, {s.failed} failed, backlog {s.backlog}"
+                for s in self.report().values()
+            ))
+
+    # --- STAGE 1: FETCH (đọc RSS kênh YouTube + feed báo) ---
+    async def _fetch_channel(self, channel_id: str) -> None:
+        try:
+            with metrics.span("fetch", trace_id=channel_id, kind="youtube"):
+                videos = await self._youtube.aget_latest_videos(
+                    channel_id, hours=self.hours, since=self.since.get(channel_id), strict=True
+                )
+                existing = await self._db(self._repo.get_existing_video_ids, [v.video_id for v in videos])
+        except Exception as e:
+            self._fetch_stats.failed += 1
+            logger.error(f"Fetch failed for channel {channel_id}: {e}")
+            return
+        self._fetch_stats.processed += 1
+        self.observed[channel_id] = [video.published_at for video in videos]
+        for video in videos:
+            if video.video_id not in existing:
+                # Video đi thẳng tới persist; transcript lấy sau khi đã lưu
+                await self._persist.put(video)
+
+    async def _fetch_feed(self, rss_url: str) -> None:
+        try:
+            with metrics.span("fetch", trace_id=rss_url, kind="news"):
+                entries = await self._news.alist_rss_entries(
+                    rss_url, hours=self.hours, since=self.since.get(rss_url), strict=True
+                )
+                existing = await self._db(self._repo.get_existing_news_urls, [a.url for a in entries])
+        except Exception as e:
+            self._fetch_stats.failed += 1
+            logger.error(f"Fetch failed for feed {rss_url}: {e}")
+            return
+        self._fetch_stats.processed += 1
+        self.observed[rss_url] = [article.published_at for article in entries]
+        for article in entries:
+            if article.url not in existing:
+                self._feed_of[article.url] = rss_url
+                await self._extract.put(article)
+
+    def _mark_lost(self, item: Any) -> None:
+        key = item.channel_id if isinstance(item, ChannelVideo) else self._feed_of.get(item.url)
+        if key is not None:
+            self.lost[key] = self.lost.get(key, 0) + 1
+
+    # --- STAGE 2: EXTRACT (tải trang bài viết + bóc nội dung) ---
+    async def _extract_worker(self) -> None:
+        while True:
+            article = await self._extract.queue.get()
+            if article is _DONE:
+                return
+            with metrics.span("extract", trace_id=article.url) as span:
+                article = await self._news.afetch_article(article)
+                span.set(chars=len(article.content))
+            if article.content:
+                self._extract.stats.processed += 1
+                await self._persist.put(article)
+            else:
+                self._extract.stats.failed += 1
+                self._mark_lost(article)
+
+    # --- STAGE 3: PERSIST (ghi DB theo lô + đánh dấu tin gần trùng) ---
+    def _persist_batch(self, batch: List[Any]) -> Dict[str, List[Any]]:
+        videos = [item for item in batch if isinstance(item, ChannelVideo)]
+        articles = [item for item in batch if isinstance(item, Article)]
+
+        new_video_ids = set(self._repo.bulk_create_youtube_videos([
+            {
+                "video_id": v.video_id,
+                "title": v.title,
+                "url": v.url,
+                "channel_id": v.channel_id,
+                "published_at": v.published_at,
+                "description": v.description,
+            }
+            for v in videos
+        ]))
+        new_article_ids = self._repo.bulk_create_news_articles([
+            {
+                "title": a.title,
+                "url": a.url,
+                "source": a.source,
+                "published_at": a.published_at,
+                "content": a.content,
+            }
+            for a in articles
+        ])
+
+        pending = [
+            {
+                "type": "news",
+                "id": str(new_article_ids[a.url]),
+                "title": a.title,
+                "url": a.url,
+                "content": a.content,
+                "published_at": a.published_at,
+            }
+            for a in articles if a.url in new_article_ids
+        ]
+        return {
+            "videos": [v for v in videos if v.video_id in new_video_ids],
+            "digest": self._drop_near_duplicates(pending),
+        }
+
+    def _drop_near_duplicates(self, pending: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        fingerprints = [(item["type"], item["id"], simhash(item["content"])) for item in pending]
+        duplicates = self._repo.register_fingerprints([f for f in fingerprints if f[2] is not None])
+        return [item for item in pending if f"{item['type']}:{item['id']}" not in duplicates]
+
+    async def _persist_worker(self) -> None:
+        while True:
+            batch, done = await self._persist.take_batch(self.persist_batch_size, self.linger)
+            if batch:
+                await self._persist_one_batch(batch)
+            if done:
+                return
+
+    async def _persist_one_batch(self, batch: List[Any]) -> None:
+        try:
+            with metrics.span("persist", items=len(batch)):
+                result = await self._db(self._persist_batch, batch)
+        except Exception as e:
+            self._persist.stats.failed += len(batch)
+            for item in batch:
+                self._mark_lost(item)
+            logger.error(f"Persist failed for batch of {len(batch)} items: {e}")
+            return
+        self._persist.stats.processed += len(batch)
+        for video in result["videos"]:
+            await self._transcript.put(video)
+        for item in result["digest"]:
+            await self._summarize.put(item)
+
+    # --- STAGE 4: TRANSCRIPT (lấy phụ đề cho video mới lưu) ---
+    def _store_transcripts(self, videos: List[ChannelVideo], results) -> List[Dict[str, Any]]:
+        found = {r.video_id: r.text for r in results if r.text}
+        self._repo.bulk_update_youtube_transcripts(found)
+        # Chưa có phụ đề: hẹn giờ để process_youtube thử lại theo backoff
+        self._repo.mark_transcripts_unavailable([r.video_id for r in results if not r.text])
+        pending = [
+            {
+                "type": "youtube",
+                "id": v.video_id,
+                "title": v.title,
+                "url": v.url,
+                "content": found[v.video_id],
+                "published_at": v.published_at,
+            }
+            for v in videos if v.video_id in found
+        ]
+        return self._drop_near_duplicates(pending)
+
+    async def _transcript_worker(self) -> None:
+        batch_size = self._transcript_fetcher.max_workers
+        while True:
+            videos, done = await self._transcript.take_batch(batch_size, self.linger)
+            if videos:
+                await self._transcribe_batch(videos)
+            if done:
+                return
+
+    async def _transcribe_one(self, video: ChannelVideo):
+        with metrics.span("transcript", trace_id=video.url) as span:
+            result = await self._transcript_fetcher.afetch(video.video_id)
+            span.set(found=bool(result.text))
+        return result
+
+    async def _transcribe_batch(self, videos: List[ChannelVideo]) -> None:
+        results = await asyncio.gather(*(self._transcribe_one(v) for v in videos))
+        try:
+            pending = await self._db(self._store_transcripts, videos, results)
+        except Exception as e:
+            self._transcript.stats.failed += len(videos)
+            logger.error(f"Storing transcripts failed for {len(videos)} videos: {e}")
+            return
+        self._transcript.stats.processed += sum(1 for r in results if r.text)
+        self._transcript.stats.failed += sum(1 for r in results if not r.text)
+        for item in pending:
+            await self._summarize.put(item)
+
+    # --- STAGE 5: SUMMARIZE (gọi LLM theo lô + ghi digest) ---
+    async def _summarize_worker(self) -> None:
+        while True:
+            batch, done = await self._summarize.take_batch(self.summarize_batch_size, self.linger)
+            # summarize=False: vẫn rút queue để các stage trước không bị chặn;
+            # process_digests / worker digest sẽ tóm tắt các bài này sau
+            if batch and self.summarize:
+                await self._summarize_batch(batch)
+            elif batch:
+                self.unsummarized.extend(f"{item['type']}:{item['id']}" for item in batch)
+            if done:
+                return
+
+    async def _summarize_batch(self, batch: List[Dict[str, Any]]) -> None:
+        try:
+            with metrics.span("summarize", items=len(batch)):
+                digests = await self._llm(self._agent.generate_digests, [
+                    {
+                        "key": f"{item['type']}:{item['id']}",
+                        "title": item["title"],
+                        "content": item["content"],
+                        "article_type": item["type"],
+                    }
+                    for item in batch
+                ])
+        except Exception as e:
+            self._summarize.stats.failed += len(batch)
+            logger.error(f"Summarizing failed for batch of {len(batch)} items: {e}")
+            return
+
+        rows = []
+        for item in batch:
+            digest = digests.get(f"{item['type']}:{item['id']}")
+            if digest is None:
+                self._summarize.stats.failed += 1
+                continue
+            rows.append({
+                "article_type": item["type"],
+                "article_id": item["id"],
+                "url": item["url"],
+                "title": digest.title,
+                "summary": digest.summary,
+                "published_at": item["published_at"],
+            })
+        try:
+            await self._db(self._repo.bulk_create_digests, rows)
+        except Exception as e:
+            self._summarize.stats.failed += len(rows)
+            logger.error(f"Storing digests failed for {len(rows)} items: {e}")
+            return
+        self._summarize.stats.processed += len(rows)
+
+    # --- ĐIỀU PHỐI ---
+    async def run(self) -> Dict[str, StageStats]:
+        self._fetch_stats = StageStats(name="fetch")
+        self._extract = Stage("extract", self.extract_workers, self.queue_size)
+        self._persist = Stage("persist", 1, self.queue_size)
+        self._transcript = Stage("transcript", self.transcript_workers, self.queue_size)
+        self._summarize = Stage("summarize", self.summarize_workers, self.queue_size)
+        self._stages = [self._extract, self._persist, self._transcript, self._summarize]
+
+        if self.summarize and not os.getenv("GOOGLE_API_KEY"):
+            # Không có API key vẫn cào và lưu được; tóm tắt để process_digests / worker làm sau
+            logger.warning("GOOGLE_API_KEY not set: running without summarization")
+            self.summarize = False
+
+        self._db_executor = self._llm_executor = self._repo = self._transcript_fetcher = None
+        reporter = None
+        try:
+            self._db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pipeline-db")
+            self._llm_executor = ThreadPoolExecutor(max_workers=self.summarize_workers, thread_name_prefix="pipeline-llm")
+            self._repo = await self._db(Repository)
+            self._transcript_fetcher = TranscriptFetcher()
+            if self.summarize:
+                self._agent = DigestAgent(
+                    rate_limiter=RateLimiter(
+                        requests_per_minute=int(os.getenv("GEMINI_RPM", "60")),
+                        tokens_per_minute=int(os.getenv("GEMINI_TPM", "250000")),
+                    ),
+                    cache=DigestCache(),
+                )
+
+            reporter = asyncio.create_task(self._reporter())
+            async with AsyncFetcher(cache=HttpCache() if self.http_cache else None) as fetcher:
+                self._youtube = YoutubeScraper(fetcher=fetcher, transcript_fetcher=self._transcript_fetcher)
+                self._news = WebScraper(fetcher=fetcher)
+
+                workers = {
+                    stage.name: [asyncio.create_task(worker()) for _ in range(stage.workers)]
+                    for stage, worker in (
+                        (self._extract, self._extract_worker),
+                        (self._persist, self._persist_worker),
+                        (self._transcript, self._transcript_worker),
+                        (self._summarize, self._summarize_worker),
+                    )
+                }
+
+                await asyncio.gather(
+                    *(self._fetch_channel(c) for c in self.channels),
+                    *(self._fetch_feed(u) for u in self.feeds),
+                )
+                # Đóng từng stage khi mọi stage phía trước đã xong
+                for stage in self._stages:
+                    await stage.close()
+                    await asyncio.gather(*workers[stage.name])
+        finally:
+            # Dọn cả khi khởi tạo lỗi giữa chừng (vd: DigestAgent thiếu cấu hình)
+            if reporter is not None:
+                reporter.cancel()
+            if self._transcript_fetcher is not None:
+                self._transcript_fetcher.close()
+            if self._llm_executor is not None:
+                self._llm_executor.shutdown(wait=True)
+            if self._db_executor is not None:
+                # Session phải đóng trên chính thread DB đã dùng nó
+                if self._repo is not None:
+                    await self._db(self._repo.close)
+                self._db_executor.shutdown(wait=True)
+
+        stats = self.report()
+        for s in stats.values():
+            logger.info(f"{s.name}: {s.processed} processed, {s.failed} failed, peak backlog {s.peak_backlog}")
+            metrics.counter("pipeline_items_total").inc(s.processed, stage=s.name, outcome="ok")
+            metrics.counter("pipeline_items_total").inc(s.failed, stage=s.name, outcome="failed")
+        for host in host_health.shared().tripped():
+            logger.warning(
+                f"Host {host.host} {host.state}: {host.failures}/{host.requests} requests failed "
+                f"({host.last_error}), retry in {host.retry_in_seconds:.0f}s"
+            )
+        report_path = metrics.write_report()
+        if report_path:
+            logger.info(f"Metrics report written to {report_path}")
+        return stats
+
+
+def run_pipeline(hours: int = 24, **kwargs) -> Dict[str, StageStats]:
+    return asyncio.run(Pipeline(hours=hours, **kwargs).run())
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    run_pipeline(hours=24)
@@ -1,19 +1,60 @@
-from typing import List
-from config import YOUTUBE_CHANNELS, NEWS_RSS_FEEDS
-from scrapers.youtube import YoutubeScraper, ChannelVideo
-from scrapers.news import WebScraper, Article
-from database.repository import Repository
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
 
-def run_scrapers(hours: int = 24) -> dict:
-    youtube_scraper = YoutubeScraper()
-    news_scraper = WebScraper()
-    repo = Repository()
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.config import YOUTUBE_CHANNELS, NEWS_RSS_FEEDS
+from app.scrapers.fetcher import AsyncFetcher
+from app.scrapers.http_cache import HttpCache
+from app.scrapers.transcripts import TranscriptFetcher
+from app.scrapers.youtube import YoutubeScraper, ChannelVideo
+from app.scrapers.news import WebScraper, Article
+from app.database.repository import Repository
+from app.dedup.simhash import simhash
+
+async def arun_scrapers(hours: int = 24) -> dict:
+    # Trả kết nối về pool khi xong (tránh rò kết nối khi chạy bằng cron)
+    with Repository() as repo:
+        return await _arun_scrapers(repo, hours)
+
+async def _arun_scrapers(repo: Repository, hours: int) -> dict:
+    # Một fetcher dùng chung: chung connection pool, chung giới hạn toàn cục và theo host,
+    # chung cache HTTP trên đĩa (conditional GET giữa các lần chạy)
+    transcript_fetcher = TranscriptFetcher()
+    # Truy vấn DB chạy trên một thread riêng (Session không thread-safe nên chỉ 1 thread),
+    # không chặn các request đang chạy trên event loop
+    db_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="runner-db")
+    loop = asyncio.get_running_loop()
+
+    def on_db(fn):
+        return lambda keys: loop.run_in_executor(db_executor, fn, keys)
+
+    try:
+        async with AsyncFetcher(cache=HttpCache()) as fetcher:
+            youtube_scraper = YoutubeScraper(fetcher=fetcher, transcript_fetcher=transcript_fetcher)
+            news_scraper = WebScraper(fetcher=fetcher)
+
+            # Chạy song song mọi kênh và mọi feed
+            channel_results, feed_results = await asyncio.gather(
+                # Chỉ tải nội dung / transcript cho những mục chưa có trong DB
+                asyncio.gather(*(
+                    youtube_scraper.ascrape_channel(c, hours=hours, exclude_existing=on_db(repo.get_existing_video_ids))
+                    for c in YOUTUBE_CHANNELS
+                )),
+                asyncio.gather(*(
+                    news_scraper.ascrape_rss_feed(u, hours=hours, exclude_existing=on_db(repo.get_existing_news_urls))
+                    for u in NEWS_RSS_FEEDS
+                )),
+            )
+    finally:
+        transcript_fetcher.close()
+        db_executor.shutdown(wait=True)
     
-    youtube_videos = []
+    youtube_videos: list[ChannelVideo] = []
     video_dicts = []
-    for channel_id in YOUTUBE_CHANNELS:
-        # Gọi hàm scrape_channel để lấy cả transcript
-        videos = youtube_scraper.scrape_channel(channel_id, hours=hours)
+    for channel_id, videos in zip(YOUTUBE_CHANNELS, channel_results):
         youtube_videos.extend(videos)
         video_dicts.extend([
             {
@@ -28,13 +69,16 @@ def run_scrapers(hours: int = 24) -> dict:
             for v in videos
         ])
             
-    news_articles = []
-    for rss_url in NEWS_RSS_FEEDS:
-        articles = news_scraper.scrape_rss_feed(rss_url, hours=hours)
+    news_articles: list[Article] = []
+    for articles in feed_results:
         news_articles.extend(articles)
     
-    if video_dicts:
-        repo.bulk_create_youtube_videos(video_dicts)
+    new_video_ids = set(repo.bulk_create_youtube_videos(video_dicts)) if video_dicts else set()
+    # Video chưa có phụ đề: hẹn giờ để process_youtube thử lại sau
+    repo.mark_transcripts_unavailable([
+        v.video_id for v in youtube_videos if v.video_id in new_video_ids and not v.transcript
+    ])
+    new_article_ids = {}
     if news_articles:
         article_dicts = [
             {
@@ -46,13 +90,28 @@ def run_scrapers(hours: int = 24) -> dict:
             }
             for a in news_articles
         ]
-        repo.bulk_create_news_articles(article_dicts)
+        new_article_ids = repo.bulk_create_news_articles(article_dicts)
+
+    # Đánh dấu tin gần trùng ngay lúc ingest để process_digests chỉ tóm tắt bản đại diện
+    fingerprints = []
+    for v in youtube_videos:
+        if v.video_id in new_video_ids and v.transcript:
+            fingerprints.append(("youtube", v.video_id, simhash(v.transcript)))
+    for a in news_articles:
+        if a.url in new_article_ids:
+            fingerprints.append(("news", str(new_article_ids[a.url]), simhash(a.content)))
+    duplicates = repo.register_fingerprints([f for f in fingerprints if f[2] is not None])
+    if duplicates:
+        print(f"Found {len(duplicates)} near-duplicate items, linked to their representatives.")
             
     return {
         "youtube": youtube_videos,
         "news": news_articles,
     }
+
+def run_scrapers(hours: int = 24) -> dict:
+    return asyncio.run(arun_scrapers(hours=hours))
     
 if __name__ == "__main__":
     result = run_scrapers(hours=300)
-    print(f"Scraped {len(result['youtube'])} YouTube videos and {len(result['news'])} news articles.")
\ No newline at end of file
+    print(f"Scraped {len(result['youtube'])} YouTube videos and {len(result['news'])} news articles.")
@@ -0,0 +1,219 @@
+"""
+Scheduler chạy liên tục: mỗi nguồn (kênh YouTube / feed RSS) có chu kỳ poll riêng.
+
+- Chu kỳ bám theo tần suất đăng bài: khoảng cách trung bình giữa hai bài (EWMA)
+  nhân POLL_FRACTION, kẹp trong [MIN_INTERVAL, MAX_INTERVAL]. Nguồn đăng dày được
+  poll dày, nguồn lâu không có bài mới thì giãn dần (x BACKOFF_FACTOR mỗi lần rỗng).
+- Mỗi nguồn giữ watermark (thời điểm bài mới nhất đã thấy) thay cho `hours=`.
+- Thời điểm poll có jitter, và các nguồn cùng host được giãn cách tối thiểu
+  HOST_SPACING để không dồn request vào một host cùng lúc.
+"""
+import asyncio
+import logging
+import os
+import random
+import sys
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import metrics
+from app.config import YOUTUBE_CHANNELS, NEWS_RSS_FEEDS
+from app.database.repository import Repository
+from app.pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+MIN_INTERVAL = timedelta(minutes=5)
+MAX_INTERVAL = timedelta(hours=24)
+# Chu kỳ ban đầu khi chưa biết gì về nguồn
+DEFAULT_INTERVAL = timedelta(hours=1)
+# Poll mỗi khi đã trôi qua khoảng nửa khoảng cách trung bình giữa hai bài
+POLL_FRACTION = 0.5
+BACKOFF_FACTOR = 1.5
+# Trọng số của khoảng cách mới nhất trong EWMA
+GAP_SMOOTHING = 0.3
+# Jitter ±10% chu kỳ
+JITTER_RATIO = 0.1
+# Khoảng cách tối thiểu giữa hai lần poll vào cùng một host
+HOST_SPACING = timedelta(seconds=30)
+# Lùi watermark một chút khi poll: bắt cả bài có pubDate trễ (bài trùng bị loại ở DB)
+WATERMARK_OVERLAP = timedelta(hours=1)
+# Nguồn mới (chưa có watermark) lấy bài trong khoảng này
+INITIAL_LOOKBACK = timedelta(hours=24)
+# Thời gian ngủ tối đa giữa hai vòng (để nhận nguồn mới thêm vào config)
+MAX_SLEEP = timedelta(minutes=5)
+
+YOUTUBE_HOST = "www.youtube.com"
+
+
+def _as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # SQLite trả về datetime không có tzinfo
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def _clamp(interval: timedelta) -> timedelta:
+    return max(MIN_INTERVAL, min(MAX_INTERVAL, interval))
+
+
+def _jitter(interval: timedelta) -> timedelta:
+    return interval * (1 + random.uniform(-JITTER_RATIO, JITTER_RATIO))
+
+
+def source_host(state: Dict[str, Any]) -> str:
+    if state["kind"] == "youtube":
+        return YOUTUBE_HOST
+    return urlsplit(state["key"]).netloc
+
+
+def new_state(kind: str, key: str, now: datetime) -> Dict[str, Any]:
+    return {
+        "id": f"{kind}:{key}",
+        "kind": kind,
+        "key": key,
+        "watermark": None,
+        "avg_gap_seconds": None,
+        "interval_seconds": DEFAULT_INTERVAL.total_seconds(),
+        # Rải lần poll đầu của các nguồn mới trong vài phút
+        "next_poll_at": now + timedelta(seconds=random.uniform(0, MIN_INTERVAL.total_seconds())),
+        "last_polled_at": None,
+        "last_new_count": 0,
+    }
+
+
+def update_state(state: Dict[str, Any], published: Optional[List[datetime]], now: datetime) -> Dict[str, Any]:
+    """
+    Tính trạng thái sau một lần poll.
+    published: thời điểm đăng các mục đọc được từ feed (None nếu poll lỗi).
+    """
+    state = dict(state)
+    state["last_polled_at"] = now
+    interval = timedelta(seconds=state["interval_seconds"])
+
+    if published is None:
+        # Lỗi mạng / feed hỏng: giữ nguyên chu kỳ và watermark, thử lại ở chu kỳ sau
+        state["last_new_count"] = 0
+        state["next_poll_at"] = now + _jitter(interval)
+        return state
+
+    watermark = _as_utc(state["watermark"])
+    new_times = sorted(_as_utc(t) for t in published if watermark is None or _as_utc(t) > watermark)
+    state["last_new_count"] = len(new_times)
+
+    if new_times:
+        # Khoảng cách giữa các bài liên tiếp (tính cả bài cuối của lần trước)
+        previous = [watermark] + new_times if watermark else new_times
+        avg_gap = state["avg_gap_seconds"]
+        for earlier, later in zip(previous, previous[1:]):
+            gap = max((later - earlier).total_seconds(), 1.0)
+            avg_gap = gap if avg_gap is None else GAP_SMOOTHING * gap + (1 - GAP_SMOOTHING) * avg_gap
+        state["avg_gap_seconds"] = avg_gap
+        state["watermark"] = new_times[-1]
+        if avg_gap is not None:
+            interval = timedelta(seconds=avg_gap * POLL_FRACTION)
+    else:
+        # Không có bài mới: giãn chu kỳ
+        interval = interval * BACKOFF_FACTOR
+
+    interval = _clamp(interval)
+    state["interval_seconds"] = interval.total_seconds()
+    state["next_poll_at"] = now + _jitter(interval)
+    return state
+
+
+def spread_by_host(states: List[Dict[str, Any]]) -> None:
+    """Dời next_poll_at để các nguồn cùng host cách nhau ít nhất HOST_SPACING."""
+    by_host: Dict[str, List[Dict[str, Any]]] = {}
+    for state in states:
+        by_host.setdefault(source_host(state), []).append(state)
+    for host_states in by_host.values():
+        host_states.sort(key=lambda s: _as_utc(s["next_poll_at"]))
+        previous = None
+        for state in host_states:
+            next_poll_at = _as_utc(state["next_poll_at"])
+            if previous is not None and next_poll_at < previous + HOST_SPACING:
+                next_poll_at = previous + HOST_SPACING + timedelta(seconds=random.uniform(0, 5))
+            state["next_poll_at"] = next_poll_at
+            previous = next_poll_at
+
+
+class Scheduler:
+    def __init__(self, repo: Optional[Repository] = None, summarize: bool = True, **pipeline_options):
+        self.repo = repo or Repository()
+        self.summarize = summarize
+        self.pipeline_options = pipeline_options
+
+    def load_states(self, now: datetime) -> List[Dict[str, Any]]:
+        sources = [("youtube", c) for c in YOUTUBE_CHANNELS] + [("news", u) for u in NEWS_RSS_FEEDS]
+        known = self.repo.get_feed_states([f"{kind}:{key}" for kind, key in sources])
+        states = []
+        for kind, key in sources:
+            state = known.get(f"{kind}:{key}") or new_state(kind, key, now)
+            state["next_poll_at"] = _as_utc(state["next_poll_at"])
+            states.append(state)
+        return states
+
+    def _since(self, state: Dict[str, Any], now: datetime) -> datetime:
+        watermark = _as_utc(state["watermark"])
+        if watermark is None:
+            return now - INITIAL_LOOKBACK
+        return watermark - WATERMARK_OVERLAP
+
+    async def run_once(self) -> Optional[datetime]:
+        """Poll các nguồn đã tới hạn. Trả về thời điểm tới hạn sớm nhất tiếp theo."""
+        now = datetime.now(timezone.utc)
+        states = self.load_states(now)
+        due = [s for s in states if s["next_poll_at"] <= now]
+
+        if due:
+            pipeline = Pipeline(
+                channels=[s["key"] for s in due if s["kind"] == "youtube"],
+                feeds=[s["key"] for s in due if s["kind"] == "news"],
+                since={s["key"]: self._since(s, now) for s in due},
+                summarize=self.summarize,
+                **self.pipeline_options,
+            )
+            await pipeline.run()
+
+            polled_at = datetime.now(timezone.utc)
+            updated = {s["id"]: update_state(s, pipeline.observed.get(s["key"]), polled_at) for s in due}
+            states = [updated.get(s["id"], s) for s in states]
+            for state in updated.values():
+                logger.info(
+                    f"{state['id']}: {state['last_new_count']} new, "
+                    f"next poll in {state['interval_seconds'] / 60:.0f} min"
+                )
+
+        spread_by_host(states)
+        self.repo.save_feed_states(states)
+        return min((s["next_poll_at"] for s in states), default=None)
+
+    async def run_forever(self) -> None:
+        while True:
+            next_due = await self.run_once()
+            sleep_for = MAX_SLEEP.total_seconds()
+            if next_due is not None:
+                sleep_for = min(sleep_for, max(0.0, (next_due - datetime.now(timezone.utc)).total_seconds()))
+            logger.info(f"Sleeping {sleep_for:.0f}s")
+            await asyncio.sleep(sleep_for)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    summarize = os.getenv("SCHEDULER_SUMMARIZE", "1") != "0"
+    # METRICS_ENABLED=1 + METRICS_PORT: Prometheus scrape /metrics trong khi scheduler chạy
+    metrics.start_http_server()
+    scheduler = Scheduler(summarize=summarize)
+    try:
+        asyncio.run(scheduler.run_forever())
+    finally:
+        scheduler.repo.close()
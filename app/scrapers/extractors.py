@@ -0,0 +1,136 @@
+import re
+from collections import defaultdict
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+from lxml import etree, html as lxml_html
+from pydantic import BaseModel
+
+
+class SiteRule(BaseModel):
+    """
+    Cấu hình bóc tách cho một trang báo.
+    Selector dạng CSS đơn giản: "tag", ".class", "#id", "tag.class", "tag#id",
+    nối nhau bằng khoảng trắng (descendant).
+    """
+    content_selector: str
+    paragraph_selector: str = "p"
+    remove_selectors: List[str] = []
+
+
+# --- CẤU HÌNH THEO TỪNG TRANG (key là domain, khớp cả subdomain) ---
+SITE_RULES: Dict[str, SiteRule] = {
+    "congan.com.vn": SiteRule(content_selector="div.noi-dung"),
+}
+
+# Các thẻ không bao giờ chứa nội dung chính
+NOISE_TAGS = ("script", "style", "noscript", "nav", "header", "footer", "aside", "form", "iframe", "svg")
+# class/id gợi ý khối phụ (bình luận, tin liên quan, quảng cáo...)
+NOISE_HINTS = re.compile(r"comment|footer|sidebar|related|menu|share|social|banner|ads?\b|tag", re.I)
+# Đoạn văn ngắn hơn ngưỡng này không được tính điểm khi đoán khối nội dung
+MIN_PARAGRAPH_CHARS = 25
+
+_SELECTOR_PART = re.compile(r"^(?P<tag>[\w-]*)(?:\.(?P<cls>[\w-]+)|#(?P<id>[\w-]+))?$")
+
+
+def register_site(domain: str, rule: SiteRule) -> None:
+    SITE_RULES[domain.lower()] = rule
+
+
+def _selector_to_xpath(selector: str) -> str:
+    steps = []
+    for part in selector.split():
+        match = _SELECTOR_PART.match(part)
+        if not match:
+            raise ValueError(f"Unsupported selector: {selector!r}")
+        step = match.group("tag") or "*"
+        if match.group("cls"):
+            step += f"[contains(concat(' ', normalize-space(@class), ' '), ' {match.group('cls')} ')]"
+        elif match.group("id"):
+            step += f"[@id='{match.group('id')}']"
+        steps.append(step)
+    return "//" + "//".join(steps)
+
+
+def _rule_for(url: str) -> Optional[SiteRule]:
+    host = urlsplit(url).hostname or ""
+    parts = host.lower().split(".")
+    # www.congan.com.vn -> congan.com.vn -> com.vn ...
+    for i in range(len(parts) - 1):
+        rule = SITE_RULES.get(".".join(parts[i:]))
+        if rule:
+            return rule
+    return None
+
+
+def _paragraph_texts(root, paragraph_xpath: str) -> List[str]:
+    texts = []
+    for node in root.xpath("." + paragraph_xpath):
+        text = node.text_content().strip()
+        if text:
+            texts.append(text)
+    return texts
+
+
+def _extract_with_rule(tree, rule: SiteRule) -> str:
+    nodes = tree.xpath(_selector_to_xpath(rule.content_selector))
+    if not nodes:
+        return ""
+    content = nodes[0]
+    for selector in rule.remove_selectors:
+        for node in content.xpath("." + _selector_to_xpath(selector)):
+            node.drop_tree()
+    return " ".join(_paragraph_texts(content, _selector_to_xpath(rule.paragraph_selector)))
+
+
+def _extract_generic(tree) -> str:
+    """
+    Fallback kiểu readability cho trang chưa có cấu hình: chấm điểm các khối cha
+    theo số lượng và độ dài đoạn văn, lấy các đoạn <p> trong khối điểm cao nhất.
+    """
+    etree.strip_elements(tree, *NOISE_TAGS, with_tail=False)
+
+    scores: Dict[object, float] = defaultdict(float)
+    for paragraph in tree.iter("p"):
+        text_length = len(paragraph.text_content().strip())
+        if text_length < MIN_PARAGRAPH_CHARS:
+            continue
+        score = 1 + min(text_length // 100, 3)
+        parent = paragraph.getparent()
+        if parent is None:
+            continue
+        scores[parent] += score
+        grandparent = parent.getparent()
+        if grandparent is not None:
+            scores[grandparent] += score / 2
+
+    for node in list(scores):
+        if NOISE_HINTS.search(f"{node.get('class', '')} {node.get('id', '')}"):
+            scores[node] *= 0.2
+
+    if not scores:
+        return " ".join(_paragraph_texts(tree, "//p"))
+    best = max(scores, key=scores.get)
+    return " ".join(_paragraph_texts(best, "//p"))
+
+
+def extract_article_text(content: bytes, url: str, encoding: Optional[str] = None) -> str:
+    """
+    Bóc nội dung chính của một trang bài viết.
+    Dùng parser C của lxml (libxml2); trang có trong SITE_RULES dùng selector riêng,
+    các trang khác (hoặc khi selector không khớp) dùng fallback kiểu readability.
+    """
+    if not content:
+        return ""
+    parser = lxml_html.HTMLParser(encoding=encoding, remove_comments=True)
+    try:
+        tree = lxml_html.document_fromstring(content, parser=parser)
+    except (etree.ParserError, ValueError):
+        return ""
+
+    rule = _rule_for(url)
+    if rule:
+        text = _extract_with_rule(tree, rule)
+        if text:
+            return text
+    return _extract_generic(tree)
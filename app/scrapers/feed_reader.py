@@ -0,0 +1,157 @@
+"""
+Đọc feed RSS / Atom kiểu streaming (lxml.etree.iterparse) thay cho feedparser.parse.
+
+- Mục (item / entry) được đọc lần lượt; phần tử đã đọc bị giải phóng ngay nên bộ nhớ
+  không tăng theo độ dài feed.
+- Feed xếp mới nhất trước (báo, YouTube): dừng parse khi đã gặp EARLY_STOP_AFTER mục
+  liên tiếp cũ hơn mốc và ngày đăng giảm dần, phần còn lại của tài liệu không bị parse.
+  Feed xếp cũ nhất trước (ngày tăng dần) không bao giờ dừng sớm nên vẫn được đọc hết.
+- Feed lỗi cú pháp XML (hoặc định dạng lạ) thì dùng feedparser (chịu lỗi tốt hơn).
+"""
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+from typing import Iterator, List, Optional
+
+import feedparser
+from lxml import etree
+from pydantic import BaseModel
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+RSS1 = "{http://purl.org/rss/1.0/}"
+DC = "{http://purl.org/dc/elements/1.1/}"
+MEDIA = "{http://search.yahoo.com/mrss/}"
+CONTENT = "{http://purl.org/rss/1.0/modules/content/}"
+
+ENTRY_TAGS = ("item", f"{ATOM}entry", f"{RSS1}item")
+# Số mục cũ hơn mốc liên tiếp, ngày giảm dần, trước khi dừng (chịu được vài mục ghim / lệch thứ tự)
+EARLY_STOP_AFTER = 3
+
+
+class FeedEntry(BaseModel):
+    title: str = ""
+    link: str = ""
+    published: Optional[datetime] = None
+    summary: str = ""
+
+
+def parse_date(value: Optional[str]) -> Optional[datetime]:
+    """Ngày dạng RFC 822 (RSS) hoặc ISO 8601 (Atom, dc:date), trả về datetime UTC."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        parsed = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def _text(elem, *paths: str) -> str:
+    for path in paths:
+        child = elem.find(path)
+        if child is not None and child.text:
+            return child.text.strip()
+    return ""
+
+
+def _atom_link(elem) -> str:
+    links = elem.findall(f"{ATOM}link")
+    for link in links:
+        if link.get("rel", "alternate") == "alternate" and link.get("href"):
+            return link.get("href")
+    return links[0].get("href", "") if links else ""
+
+
+def _to_entry(elem) -> FeedEntry:
+    if elem.tag == f"{ATOM}entry":
+        return FeedEntry(
+            title=_text(elem, f"{ATOM}title"),
+            link=_atom_link(elem),
+            published=parse_date(_text(elem, f"{ATOM}published", f"{ATOM}updated")),
+            summary=_text(elem, f"{ATOM}summary", f"{MEDIA}group/{MEDIA}description", f"{ATOM}content"),
+        )
+    prefix = RSS1 if elem.tag == f"{RSS1}item" else ""
+    return FeedEntry(
+        title=_text(elem, f"{prefix}title"),
+        link=_text(elem, f"{prefix}link", "guid"),
+        published=parse_date(_text(elem, "pubDate", f"{DC}date")),
+        summary=_text(elem, f"{prefix}description", f"{CONTENT}encoded"),
+    )
+
+
+def iter_entries(content: bytes) -> Iterator[FeedEntry]:
+    """
+    Duyệt các mục của feed theo thứ tự trong tài liệu. Ném etree.XMLSyntaxError nếu XML lỗi.
+    Dừng duyệt giữa chừng (break) thì phần còn lại không bị parse.
+    """
+    context = etree.iterparse(
+        BytesIO(content), events=("end",), tag=ENTRY_TAGS, resolve_entities=False, no_network=True,
+    )
+    for _, elem in context:
+        yield _to_entry(elem)
+        # Giải phóng mục vừa đọc (và các mục trước nó) để bộ nhớ không tăng theo feed
+        elem.clear()
+        parent = elem.getparent()
+        if parent is not None:
+            while elem.getprevious() is not None:
+                del parent[0]
+
+
+def _feedparser_entries(content: bytes) -> Iterator[FeedEntry]:
+    for entry in feedparser.parse(content).entries:
+        parsed = entry.get("published_parsed") or entry.get("updated_parsed")
+        yield FeedEntry(
+            title=entry.get("title", ""),
+            link=entry.get("link", ""),
+            published=datetime(*parsed[:6], tzinfo=timezone.utc) if parsed else None,
+            summary=entry.get("summary", ""),
+        )
+
+
+def _select(entries: Iterator[FeedEntry], cutoff: Optional[datetime], newest_first: bool) -> List[FeedEntry]:
+    selected = []
+    older_in_a_row = 0
+    previous = None
+    for entry in entries:
+        if entry.published is None:
+            continue
+        if cutoff is None or entry.published >= cutoff:
+            selected.append(entry)
+            older_in_a_row = 0
+        elif previous is not None and entry.published <= previous:
+            # Chỉ đếm mục cũ khi ngày đang giảm: feed thật sự xếp mới nhất trước
+            older_in_a_row += 1
+        else:
+            # Mục đầu tiên đã cũ hơn mốc, hoặc ngày tăng lên: có thể là feed cũ nhất trước
+            older_in_a_row = 0
+        previous = entry.published
+        if newest_first and older_in_a_row >= EARLY_STOP_AFTER:
+            break
+    return selected
+
+
+def read_feed(content: bytes, cutoff: Optional[datetime] = None, newest_first: bool = True) -> List[FeedEntry]:
+    """
+    Các mục có ngày đăng >= cutoff (mục không có ngày bị bỏ qua).
+    newest_first=True: cho phép dừng sớm khi đã qua mốc, nếu ngày đăng thực sự giảm dần.
+    """
+    try:
+        entries = _select(iter_entries(content), cutoff, newest_first)
+        if entries or not _looks_unknown(content):
+            return entries
+    except etree.XMLSyntaxError:
+        pass
+    # XML lỗi hoặc không nhận ra item/entry nào: để feedparser xử lý
+    return _select(_feedparser_entries(content), cutoff, newest_first=False)
+
+
+def _looks_unknown(content: bytes) -> bool:
+    """True nếu tài liệu không có thẻ item/entry nào mà bộ đọc streaming nhận ra."""
+    head = content[:65536]
+    return b"<item" not in head and b"<entry" not in head and b":item" not in head and b":entry" not in head
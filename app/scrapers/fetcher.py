@@ -0,0 +1,193 @@
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from pydantic import BaseModel, Field
+
+from .. import metrics
+from .host_health import FAILURE_STATUSES, HostHealth, parse_retry_after, shared
+from .http_cache import HttpCache
+
+# Giả lập trình duyệt thật để không bị chặn (Anti-bot)
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
+}
+
+# Retry-After ngắn hơn ngưỡng này thì chờ rồi thử lại một lần; dài hơn thì bỏ qua host
+MAX_RETRY_WAIT = 5.0
+
+
+class FetchResult(BaseModel):
+    url: str
+    status_code: int = 0
+    content: bytes = b""
+    headers: Dict[str, str] = Field(default_factory=dict)
+    error: Optional[str] = None
+    # True khi server trả 304: content là bản lưu trong cache, không tải lại
+    not_modified: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None and (self.status_code == 200 or self.not_modified)
+
+
+class AsyncFetcher:
+    """
+    Bộ tải HTTP bất đồng bộ dùng chung cho mọi scraper.
+    - Một connection pool (httpx.AsyncClient) cho cả lượt chạy.
+    - Giới hạn tổng số request đồng thời và số request đồng thời trên mỗi host,
+      để thời gian chạy phụ thuộc vào host chậm nhất chứ không phải tổng số request.
+    - Circuit breaker + timeout thích ứng theo host (xem host_health): host đang lỗi
+      bị bỏ qua ngay thay vì tốn timeout cho từng request.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        per_host_limit: Optional[int] = None,
+        timeout: float = 10.0,
+        headers: Optional[Dict[str, str]] = None,
+        cache: Optional[HttpCache] = None,
+        health: Optional[HostHealth] = None,
+    ):
+        self.max_concurrency = max_concurrency or int(os.getenv("FETCH_MAX_CONCURRENCY", "32"))
+        self.per_host_limit = per_host_limit or int(os.getenv("FETCH_PER_HOST_LIMIT", "4"))
+        self.timeout = timeout
+        self.headers = {**DEFAULT_HEADERS, **(headers or {})}
+        self.cache = cache
+        # Mặc định dùng trạng thái chung của tiến trình để host hỏng vẫn bị nhớ qua các lượt chạy
+        self.health = health or shared()
+
+        # Client và semaphore gắn với event loop nên chỉ được tạo khi dùng lần đầu
+        self._client: Optional[httpx.AsyncClient] = None
+        self._global_semaphore: Optional[asyncio.Semaphore] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+
+    async def __aenter__(self) -> "AsyncFetcher":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.aclose()
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+        self._client = None
+        self._global_semaphore = None
+        self._host_semaphores = {}
+
+    def _get_client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                timeout=self.timeout,
+                follow_redirects=True,
+                limits=httpx.Limits(
+                    max_connections=self.max_concurrency,
+                    max_keepalive_connections=self.max_concurrency,
+                ),
+            )
+        return self._client
+
+    @asynccontextmanager
+    async def limit(self, host: str):
+        """Giữ một suất của host và một suất toàn cục (dùng cả cho tác vụ không qua HTTP client)."""
+        if self._global_semaphore is None:
+            self._global_semaphore = asyncio.Semaphore(self.max_concurrency)
+        host_semaphore = self._host_semaphores.get(host)
+        if host_semaphore is None:
+            host_semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_limit)
+
+        # Chờ suất của host trước để không chiếm suất toàn cục khi host đang bận
+        async with host_semaphore:
+            async with self._global_semaphore:
+                yield
+
+    async def fetch(self, url: str, headers: Optional[Dict[str, str]] = None) -> FetchResult:
+        request_headers = dict(headers or {})
+        conditional = self.cache.validators(url) if self.cache is not None else {}
+        request_headers.update(conditional)
+
+        host = urlsplit(url).netloc
+        result = await self._request(url, host, request_headers)
+        # 304 nhưng bản trong cache đã mất / hỏng: bỏ entry, tải lại một lần không kèm header điều kiện
+        if result.status_code == 304 and not result.not_modified and conditional:
+            self.cache.discard(url)
+            request_headers = dict(headers or {})
+            result = await self._request(url, host, request_headers)
+        # 429 / 503 kèm Retry-After ngắn: chờ đúng khoảng đó rồi thử lại một lần
+        if result.status_code in (429, 503):
+            retry_after = parse_retry_after(result.headers.get("retry-after"))
+            if retry_after is not None and retry_after <= MAX_RETRY_WAIT:
+                await asyncio.sleep(retry_after)
+                result = await self._request(url, host, request_headers)
+        return result
+
+    async def _request(self, url: str, host: str, request_headers: Dict[str, str]) -> FetchResult:
+        queued_at = time.perf_counter()
+        async with self.limit(host):
+            if metrics.enabled():
+                metrics.histogram("fetch_queue_wait_seconds").observe(time.perf_counter() - queued_at, host=host)
+            # Kiểm tra sau khi có suất: host có thể vừa bị ngắt trong lúc chờ
+            wait = self.health.acquire(host)
+            if wait > 0:
+                if metrics.enabled():
+                    metrics.counter("host_fast_fail_total").inc(host=host)
+                return FetchResult(url=url, error=f"CircuitOpen: {host} đang tạm ngưng, thử lại sau {wait:.0f}s")
+
+            timeout = self.health.timeout(host, self.timeout)
+            if metrics.enabled():
+                metrics.gauge("host_timeout_seconds").set(timeout, host=host)
+            trace = metrics.http_trace(host)
+            with metrics.track("http_request", host=host) as tracked:
+                started = time.perf_counter()
+                try:
+                    response = await self._get_client().get(
+                        url, headers=request_headers, timeout=timeout,
+                        extensions={"trace": trace} if trace else None,
+                    )
+                except httpx.HTTPError as e:
+                    tracked.set(outcome=type(e).__name__)
+                    # Chỉ lỗi mạng (timeout, kết nối, TLS...) mới tính là host hỏng
+                    if isinstance(e, httpx.TransportError):
+                        self.health.record_failure(host, f"{type(e).__name__}: {e}")
+                    return FetchResult(url=url, error=f"{type(e).__name__}: {e}")
+                tracked.set(outcome=str(response.status_code))
+                metrics.counter("http_response_bytes_total").inc(len(response.content), host=host)
+
+            if response.status_code in FAILURE_STATUSES:
+                retry_after = None
+                if response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get("retry-after"))
+                self.health.record_failure(host, f"HTTP {response.status_code}", retry_after=retry_after)
+            else:
+                self.health.record_success(host, time.perf_counter() - started)
+
+        response_headers = dict(response.headers)
+        if response.status_code == 304 and self.cache is not None:
+            cached = self.cache.load(url)
+            if cached is not None:
+                return FetchResult(
+                    url=url,
+                    status_code=304,
+                    content=cached,
+                    headers=response_headers,
+                    not_modified=True,
+                )
+
+        if response.status_code == 200 and self.cache is not None:
+            self.cache.store(url, response.content, response_headers)
+
+        return FetchResult(
+            url=url,
+            status_code=response.status_code,
+            content=response.content,
+            headers=response_headers,
+        )
+
+    async def fetch_many(self, urls: List[str]) -> List[FetchResult]:
+        return await asyncio.gather(*(self.fetch(url) for url in urls))
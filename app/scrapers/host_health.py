@@ -0,0 +1,231 @@
+"""
+Sức khỏe từng host: circuit breaker, timeout thích ứng và backoff theo Retry-After.
+Dùng chung cho AsyncFetcher (theo host) và TranscriptFetcher (theo đường proxy tới YouTube).
+
+- closed: request bình thường. FAILURE_THRESHOLD lỗi liên tiếp (timeout, lỗi kết nối,
+  403, 429, 5xx) -> open.
+- open: request tới host bị từ chối ngay, không tốn timeout, trong thời gian cooldown.
+  Cooldown bắt đầu từ OPEN_SECONDS và nhân đôi mỗi lần mở lại liên tiếp (tối đa
+  MAX_OPEN_SECONDS); Retry-After của server (429 / 503) được dùng làm cooldown nếu có.
+- half_open: hết cooldown, cho một request thăm dò; thành công -> closed, lỗi -> open lại.
+- Timeout theo host = TIMEOUT_MULTIPLIER x p95 độ trễ của các request thành công gần đây,
+  trong khoảng [MIN_TIMEOUT, timeout mặc định]. Host chưa đủ mẫu dùng timeout mặc định.
+
+Trạng thái nằm trong bộ nhớ tiến trình; shared() trả về instance dùng chung để scheduler /
+worker giữ trạng thái giữa các lượt chạy. Xem trạng thái qua snapshot() hoặc gauge
+host_circuit_state (0 closed, 1 half_open, 2 open) khi bật metrics.
+"""
+import math
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from typing import Callable, Deque, Dict, List, Optional
+
+from pydantic import BaseModel
+
+from .. import metrics
+
+FAILURE_THRESHOLD = 3
+OPEN_SECONDS = 30.0
+MAX_OPEN_SECONDS = 600.0
+MIN_TIMEOUT = 2.0
+TIMEOUT_MULTIPLIER = 4.0
+# Số mẫu độ trễ giữ cho mỗi host, và số mẫu tối thiểu trước khi thu hẹp timeout
+LATENCY_WINDOW = 50
+MIN_LATENCY_SAMPLES = 5
+
+# HTTP status coi là host đang lỗi / chặn mình (404... là lỗi của trang, không phải của host)
+FAILURE_STATUSES = {403, 429, 500, 502, 503, 504}
+
+_STATE_CODES = {"closed": 0, "half_open": 1, "open": 2}
+
+
+class HostState(BaseModel):
+    host: str
+    state: str
+    consecutive_failures: int
+    requests: int
+    failures: int
+    trips: int
+    timeout_seconds: float
+    p50_ms: Optional[float] = None
+    p95_ms: Optional[float] = None
+    # Còn bao lâu nữa host được thử lại (open), 0 nếu đang nhận request
+    retry_in_seconds: float = 0.0
+    last_error: Optional[str] = None
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Header Retry-After: số giây hoặc HTTP-date. Trả về số giây (>= 0) hoặc None."""
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class _Host:
+    __slots__ = ("latencies", "consecutive_failures", "requests", "failures", "trips",
+                 "consecutive_trips", "open_until", "probe_started", "last_error")
+
+    def __init__(self):
+        self.latencies: Deque[float] = deque(maxlen=LATENCY_WINDOW)
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.trips = 0
+        # Số lần mở liên tiếp chưa có thành công xen giữa (quyết định độ dài cooldown)
+        self.consecutive_trips = 0
+        self.open_until: Optional[float] = None
+        self.probe_started: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+
+class HostHealth:
+    """Thread-safe: AsyncFetcher gọi từ event loop, TranscriptFetcher từ thread pool."""
+
+    def __init__(self, default_timeout: float = 10.0, clock: Callable[[], float] = time.monotonic):
+        self.default_timeout = default_timeout
+        self._clock = clock
+        self._hosts: Dict[str, _Host] = {}
+        self._lock = threading.Lock()
+
+    def _host(self, host: str) -> _Host:
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = _Host()
+        return state
+
+    def _state(self, state: _Host, now: float) -> str:
+        if state.open_until is None:
+            return "closed"
+        return "open" if now < state.open_until else "half_open"
+
+    def _publish(self, host: str, state: _Host, now: float) -> None:
+        if metrics.enabled():
+            metrics.gauge("host_circuit_state").set(_STATE_CODES[self._state(state, now)], host=host)
+
+    def acquire(self, host: str) -> float:
+        """
+        0 nếu được gửi request tới host ngay; ngược lại là số giây còn phải chờ (host đang open,
+        hoặc request thăm dò của half_open đang chạy). Người gọi nên bỏ qua host thay vì chờ lâu.
+        """
+        now = self._clock()
+        with self._lock:
+            state = self._host(host)
+            current = self._state(state, now)
+            if current == "closed":
+                return 0.0
+            if current == "open":
+                return state.open_until - now
+            # half_open: chỉ một request thăm dò; thăm dò quá hạn timeout thì coi như đã bỏ
+            probe_deadline = (state.probe_started or -math.inf) + self.default_timeout
+            if now < probe_deadline:
+                return probe_deadline - now
+            state.probe_started = now
+            self._publish(host, state, now)
+            return 0.0
+
+    def timeout(self, host: str, default: Optional[float] = None) -> float:
+        """Timeout cho request tiếp theo tới host, theo p95 độ trễ đã quan sát."""
+        ceiling = default if default is not None else self.default_timeout
+        with self._lock:
+            state = self._hosts.get(host)
+            if state is None or len(state.latencies) < MIN_LATENCY_SAMPLES:
+                return ceiling
+            p95 = _percentile(sorted(state.latencies), 0.95)
+        return min(ceiling, max(MIN_TIMEOUT, p95 * TIMEOUT_MULTIPLIER))
+
+    def record_success(self, host: str, seconds: float) -> None:
+        now = self._clock()
+        with self._lock:
+            state = self._host(host)
+            state.requests += 1
+            state.latencies.append(seconds)
+            state.consecutive_failures = 0
+            state.consecutive_trips = 0
+            state.open_until = None
+            state.probe_started = None
+            self._publish(host, state, now)
+
+    def record_failure(self, host: str, error: str, retry_after: Optional[float] = None, trip: bool = False) -> None:
+        """
+        Ghi nhận một lần lỗi. retry_after (giây, từ header Retry-After) hoặc trip=True
+        (vd: bị chặn / throttle) mở circuit ngay, không chờ đủ FAILURE_THRESHOLD lần.
+        """
+        now = self._clock()
+        with self._lock:
+            state = self._host(host)
+            state.requests += 1
+            state.failures += 1
+            state.consecutive_failures += 1
+            state.last_error = error
+            was_half_open = self._state(state, now) == "half_open"
+            state.probe_started = None
+            if not (trip or retry_after is not None or was_half_open
+                    or state.consecutive_failures >= FAILURE_THRESHOLD):
+                return
+
+            cooldown = min(MAX_OPEN_SECONDS, OPEN_SECONDS * 2 ** min(state.consecutive_trips, 16))
+            if retry_after is not None:
+                cooldown = min(MAX_OPEN_SECONDS, retry_after)
+            state.open_until = now + cooldown
+            state.trips += 1
+            state.consecutive_trips += 1
+            self._publish(host, state, now)
+        if metrics.enabled():
+            metrics.counter("host_circuit_trips_total").inc(host=host)
+
+    def snapshot(self) -> List[HostState]:
+        """Trạng thái mọi host đã gặp, host đang open / half_open trước."""
+        now = self._clock()
+        with self._lock:
+            states = []
+            for host, state in self._hosts.items():
+                latencies = sorted(state.latencies)
+                current = self._state(state, now)
+                states.append(HostState(
+                    host=host,
+                    state=current,
+                    consecutive_failures=state.consecutive_failures,
+                    requests=state.requests,
+                    failures=state.failures,
+                    trips=state.trips,
+                    timeout_seconds=0.0,
+                    p50_ms=_percentile(latencies, 0.5) * 1000 if latencies else None,
+                    p95_ms=_percentile(latencies, 0.95) * 1000 if latencies else None,
+                    retry_in_seconds=max(0.0, state.open_until - now) if current == "open" else 0.0,
+                    last_error=state.last_error,
+                ))
+        for state in states:
+            state.timeout_seconds = self.timeout(state.host)
+        return sorted(states, key=lambda s: (-_STATE_CODES[s.state], s.host))
+
+    def tripped(self) -> List[HostState]:
+        return [state for state in self.snapshot() if state.state != "closed"]
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    return sorted_values[min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))]
+
+
+_shared: Optional[HostHealth] = None
+_shared_lock = threading.Lock()
+
+
+def shared() -> HostHealth:
+    """Instance dùng chung trong tiến trình (mặc định của AsyncFetcher và TranscriptFetcher)."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = HostHealth()
+        return _shared
@@ -0,0 +1,135 @@
+import hashlib
+import os
+import time
+from pathlib import Path
+from typing import Dict, Optional
+
+from pydantic import BaseModel
+
+
+class CacheEntry(BaseModel):
+    url: str
+    etag: Optional[str] = None
+    last_modified: Optional[str] = None
+    size: int = 0
+    accessed_at: float = 0.0
+
+
+class HttpCache:
+    """
+    Cache HTTP trên đĩa cho conditional GET (ETag / Last-Modified).
+    Mỗi URL gồm 2 file: <key>.json (validators) và <key>.body (nội dung).
+    Khi tổng dung lượng vượt max_bytes thì xóa các entry lâu không dùng nhất (LRU).
+    """
+
+    def __init__(self, directory: Optional[str] = None, max_bytes: Optional[int] = None):
+        self.directory = Path(directory or os.getenv("HTTP_CACHE_DIR", ".cache/http"))
+        self.max_bytes = max_bytes or int(os.getenv("HTTP_CACHE_MAX_MB", "256")) * 1024 * 1024
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+        self._entries: Dict[str, CacheEntry] = {}
+        self._total_bytes = 0
+        self._load_index()
+
+    @staticmethod
+    def _key(url: str) -> str:
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _meta_path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def _body_path(self, key: str) -> Path:
+        return self.directory / f"{key}.body"
+
+    def _load_index(self) -> None:
+        for meta_path in self.directory.glob("*.json"):
+            try:
+                entry = CacheEntry.model_validate_json(meta_path.read_text(encoding="utf-8"))
+            except (OSError, ValueError):
+                continue
+            self._entries[meta_path.stem] = entry
+            self._total_bytes += entry.size
+
+    def _write_atomic(self, path: Path, data: bytes) -> None:
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+
+    def validators(self, url: str) -> Dict[str, str]:
+        """Headers điều kiện để gửi kèm request (rỗng nếu URL chưa có trong cache)."""
+        entry = self._entries.get(self._key(url))
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+        if entry.last_modified:
+            headers["If-Modified-Since"] = entry.last_modified
+        return headers
+
+    def load(self, url: str) -> Optional[bytes]:
+        """Đọc nội dung đã lưu và đánh dấu entry vừa được dùng (cho LRU)."""
+        key = self._key(url)
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        try:
+            content = self._body_path(key).read_bytes()
+        except OSError:
+            self._remove(key)
+            return None
+        if len(content) != entry.size:
+            # File body bị ghi dở / hỏng: coi như không có trong cache
+            self._remove(key)
+            return None
+
+        entry.accessed_at = time.time()
+        self._write_atomic(self._meta_path(key), entry.model_dump_json().encode("utf-8"))
+        return content
+
+    def store(self, url: str, content: bytes, headers: Dict[str, str]) -> None:
+        """Lưu response nếu server trả về validator; bỏ qua nếu không thể revalidate."""
+        etag = headers.get("etag")
+        last_modified = headers.get("last-modified")
+        if not etag and not last_modified:
+            return
+        if len(content) > self.max_bytes:
+            return
+
+        key = self._key(url)
+        self._remove(key)
+
+        entry = CacheEntry(
+            url=url,
+            etag=etag,
+            last_modified=last_modified,
+            size=len(content),
+            accessed_at=time.time(),
+        )
+        self._write_atomic(self._body_path(key), content)
+        self._write_atomic(self._meta_path(key), entry.model_dump_json().encode("utf-8"))
+        self._entries[key] = entry
+        self._total_bytes += entry.size
+        self._evict()
+
+    def discard(self, url: str) -> None:
+        """Xóa entry của URL (vd: server trả 304 nhưng không còn nội dung để dùng lại)."""
+        self._remove(self._key(url))
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self._total_bytes -= entry.size
+        for path in (self._meta_path(key), self._body_path(key)):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+    def _evict(self) -> None:
+        if self._total_bytes <= self.max_bytes:
+            return
+        for key, _ in sorted(self._entries.items(), key=lambda item: item[1].accessed_at):
+            self._remove(key)
+            if self._total_bytes <= self.max_bytes:
+                break
@@ -1,8 +1,12 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+from typing import Awaitable, Callable, Optional, Set
 from pydantic import BaseModel
 from datetime import datetime, timedelta, timezone
-import feedparser
+
+from .. import metrics
+from .extractors import extract_article_text
+from .feed_reader import read_feed
+from .fetcher import AsyncFetcher
 
 class Article(BaseModel):
     title: str
@@ -12,74 +16,109 @@ class Article(BaseModel):
     source: str
 
 class WebScraper:
-    def __init__(self):
-        # Giả lập trình duyệt thật để không bị chặn (Anti-bot)
-        self.headers = {
-            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
-        }
+    def __init__(self, fetcher: Optional[AsyncFetcher] = None):
+        # Dùng chung fetcher (connection pool + giới hạn đồng thời) nếu được truyền vào
+        self.fetcher = fetcher or AsyncFetcher()
+        self.headers = self.fetcher.headers
 
-    def _get_article_content(self, url: str) -> str:
+    async def _get_article_content(self, url: str) -> str:
         """
         Hàm này truy cập vào link bài viết và bóc tách nội dung chính.
         Lưu ý: Mỗi báo có cấu trúc HTML khác nhau (tên class khác nhau).
         """
         try:
-            response = requests.get(url, headers=self.headers, timeout=10)
-            if response.status_code != 200:
+            response = await self.fetcher.fetch(url)
+            if not response.ok:
+                if response.error:
+                    print(f"Error scraping content from {url}: {response.error}")
                 return ""
 
-            soup = BeautifulSoup(response.text, 'html.parser')
-        
-            content_div = soup.find('div', class_='noi-dung') 
-            
-            if not content_div:
-                # Fallback: Thử tìm thẻ p (paragraph) nếu không tìm thấy div chính
-                paragraphs = soup.find_all('p')
-            else:
-                paragraphs = content_div.find_all('p')
-
-            # 2. Gom tất cả các đoạn văn lại
-            full_text = " ".join([p.get_text().strip() for p in paragraphs])
-            return full_text
+            # Bộ bóc tách chọn selector theo domain (xem extractors.SITE_RULES),
+            # trang chưa cấu hình dùng fallback kiểu readability
+            charset = None
+            content_type = response.headers.get("content-type", "")
+            if "charset=" in content_type:
+                charset = content_type.split("charset=")[-1].split(";")[0].strip()
+            with metrics.track("html_parse"):
+                return extract_article_text(response.content, url, encoding=charset)
 
         except Exception as e:
             print(f"Error scraping content from {url}: {e}")
             return ""
 
-    def scrape_rss_feed(self, rss_url: str, hours: int = 24) -> list[Article]:
-        try:
-            # Use requests with headers to avoid anti-bot blocking (403 Forbidden)
-            response = requests.get(rss_url, headers=self.headers, timeout=10)
-            feed = feedparser.parse(response.content)
-        except Exception as e:
-            print(f"Error fetching RSS: {e}")
+    async def alist_rss_entries(
+        self, rss_url: str, hours: int = 24, since: Optional[datetime] = None, strict: bool = False
+    ) -> list[Article]:
+        """
+        Đọc RSS và trả về các bài trong khoảng thời gian, chưa tải nội dung (content rỗng).
+        since: mốc (watermark) thay cho `hours`, chỉ lấy bài đăng sau mốc này.
+        strict=True: ném RuntimeError khi không tải được feed thay vì trả về danh sách rỗng
+        (để phân biệt "lỗi" với "không có bài mới").
+        """
+        # Use browser-like headers to avoid anti-bot blocking (403 Forbidden)
+        response = await self.fetcher.fetch(rss_url)
+        if strict and (response.error or not response.ok):
+            raise RuntimeError(response.error or f"HTTP {response.status_code}")
+        if response.error:
+            print(f"Error fetching RSS: {response.error}")
             return []
+        if response.not_modified:
+            # 304: feed không đổi, nhưng vẫn đọc lại bản trong cache (response.content):
+            # bài lần trước bóc / ghi lỗi chưa có trong DB và phải được thử lại,
+            # bài đã lưu bị exclude_existing / get_existing_news_urls loại ra
+            print(f"RSS not modified: {rss_url}")
+        # Thiết lập mốc thời gian chặn
+        cutoff_time = since or datetime.now(timezone.utc) - timedelta(hours=hours)
 
-        articles = []
-        
-        print(f"Found {len(feed.entries)} articles from RSS.")
+        # Đọc streaming, dừng khi đã qua mốc (feed báo xếp mới nhất trước)
+        with metrics.track("feed_parse"):
+            feed_entries = read_feed(response.content, cutoff=cutoff_time)
 
-        # Thiết lập mốc thời gian chặn
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-
-        for entry in feed.entries: 
-            
-
-            published_time = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-
-            if published_time >= cutoff_time:
-                full_content = self._get_article_content(entry.link)
-                
-                if full_content:
-                    articles.append(Article(
-                        title=entry.title,
-                        url=entry.link,
-                        published_at=published_time,
-                        content=full_content,
-                        source="Báo Công An"
-                    ))
-        
-        return articles
+        print(f"Found {len(feed_entries)} articles from RSS.")
+
+        return [
+            Article(
+                title=entry.title,
+                url=entry.link,
+                published_at=entry.published,
+                content="",
+                source="Báo Công An"
+            )
+            for entry in feed_entries
+        ]
+
+    async def afetch_article(self, article: Article) -> Article:
+        """Tải và bóc nội dung cho một bài lấy từ RSS (content rỗng nếu lỗi)."""
+        content = await self._get_article_content(article.url)
+        return article.model_copy(update={"content": content})
+
+    async def ascrape_rss_feed(
+        self,
+        rss_url: str,
+        hours: int = 24,
+        exclude_existing: Optional[Callable[[list[str]], Awaitable[Set[str]]]] = None,
+    ) -> list[Article]:
+        """
+        exclude_existing: hàm async nhận danh sách URL, trả về các URL đã lưu trong DB
+        (async để truy vấn DB không chặn event loop).
+        Những bài này được bỏ qua trước khi tải nội dung.
+        """
+        entries = await self.alist_rss_entries(rss_url, hours=hours)
+
+        if exclude_existing and entries:
+            existing_urls = await exclude_existing([entry.url for entry in entries])
+            entries = [entry for entry in entries if entry.url not in existing_urls]
+
+        # Tải nội dung các bài viết song song (fetcher tự giới hạn số request mỗi host)
+        articles = await asyncio.gather(*(self.afetch_article(entry) for entry in entries))
+        return [article for article in articles if article.content]
+
+    def scrape_rss_feed(self, rss_url: str, hours: int = 24) -> list[Article]:
+        async def _run():
+            async with self.fetcher:
+                return await self.ascrape_rss_feed(rss_url, hours=hours)
+
+        return asyncio.run(_run())
 
 # --- CHẠY THỬ ---
 if __name__ == "__main__":
@@ -91,4 +130,4 @@ if __name__ == "__main__":
     for article in data:
         print("-" * 50)
         print(f"Title: {article.title}")
-        print(f"Content (first 500 chars): {article.content[:500]}...")
\ No newline at end of file
+        print(f"Content (first 500 chars): {article.content[:500]}...")
@@ -0,0 +1,186 @@
+import asyncio
+import functools
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+from pydantic import BaseModel
+
+from .. import metrics
+from .host_health import HostHealth, parse_retry_after, shared
+
+# youtube_transcript_api (kéo theo requests) chỉ được nạp khi thật sự lấy transcript
+if TYPE_CHECKING:
+    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api.proxies import WebshareProxyConfig
+
+TRANSCRIPT_LANGUAGES = ['vi', 'en']
+
+
+class TranscriptResult(BaseModel):
+    video_id: str
+    text: Optional[str] = None
+    # True: video không có phụ đề (có thể xuất hiện sau); False + error: lỗi tạm thời
+    unavailable: bool = False
+    error: Optional[str] = None
+
+
+def load_proxy_configs() -> List["WebshareProxyConfig"]:
+    """
+    Đọc danh sách proxy Webshare từ env:
+    - PROXY_POOL="user1:pass1,user2:pass2" cho nhiều tài khoản
+    - PROXY_USERNAME / PROXY_PASSWORD cho một tài khoản (như trước)
+    """
+    from youtube_transcript_api.proxies import WebshareProxyConfig
+
+    credentials = []
+    for entry in os.getenv("PROXY_POOL", "").split(","):
+        username, _, password = entry.strip().partition(":")
+        if username and password:
+            credentials.append((username, password))
+
+    proxy_username = os.getenv('PROXY_USERNAME')
+    proxy_password = os.getenv('PROXY_PASSWORD')
+    if proxy_username and proxy_password and (proxy_username, proxy_password) not in credentials:
+        credentials.append((proxy_username, proxy_password))
+
+    return [
+        WebshareProxyConfig(proxy_username=username, proxy_password=password)
+        for username, password in credentials
+    ]
+
+
+@functools.lru_cache(maxsize=None)
+def _session_class():
+    """
+    requests.Session áp timeout thích ứng của route (thư viện mặc định không có timeout),
+    nhớ response cuối (để đọc Retry-After) và request chậm nhất của lần fetch.
+    """
+    import requests
+
+    class TimedSession(requests.Session):
+        def __init__(self, health: HostHealth, route: str):
+            super().__init__()
+            self.health = health
+            self.route = route
+            self.reset()
+
+        def reset(self) -> None:
+            self.slowest = 0.0
+            self.last_response = None
+
+        def request(self, method, url, **kwargs):
+            if kwargs.get("timeout") is None:
+                kwargs["timeout"] = self.health.timeout(self.route)
+            started = time.perf_counter()
+            response = super().request(method, url, **kwargs)
+            self.slowest = max(self.slowest, time.perf_counter() - started)
+            self.last_response = response
+            return response
+
+    return TimedSession
+
+
+class TranscriptFetcher:
+    """
+    Lấy transcript song song bằng một thread pool giới hạn kích thước.
+    Mỗi request lần lượt đi qua một proxy trong pool (round-robin); mỗi thread giữ
+    client riêng cho từng proxy vì YouTubeTranscriptApi dùng requests.Session bên trong.
+    Mỗi proxy (hoặc kết nối trực tiếp) có circuit breaker riêng: proxy bị YouTube chặn /
+    throttle được bỏ qua, hết proxy dùng được thì trả lỗi ngay thay vì chờ timeout.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        proxy_configs: Optional[List["WebshareProxyConfig"]] = None,
+        health: Optional[HostHealth] = None,
+    ):
+        self.max_workers = max_workers or int(os.getenv("TRANSCRIPT_WORKERS", "8"))
+        configs = proxy_configs if proxy_configs is not None else load_proxy_configs()
+        # None = gọi trực tiếp, không qua proxy
+        self._proxy_configs: List[Optional["WebshareProxyConfig"]] = list(configs) or [None]
+        self._rotation = itertools.cycle(range(len(self._proxy_configs)))
+        self._rotation_lock = threading.Lock()
+        self._local = threading.local()
+        self.health = health or shared()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="transcript")
+
+    def close(self) -> None:
+        self._executor.shutdown(wait=True)
+
+    def _route(self, index: int) -> str:
+        # Khóa sức khỏe theo đường đi, không ghi thông tin đăng nhập proxy vào metrics
+        return "youtube" if self._proxy_configs[index] is None else f"youtube@proxy{index}"
+
+    def _next_client(self) -> Optional[Tuple[str, "YouTubeTranscriptApi", object]]:
+        """Proxy kế tiếp (round-robin) đang nhận request; None nếu mọi proxy đều đang bị ngắt."""
+        from youtube_transcript_api import YouTubeTranscriptApi
+
+        for _ in range(len(self._proxy_configs)):
+            with self._rotation_lock:
+                index = next(self._rotation)
+            route = self._route(index)
+            if self.health.acquire(route) > 0:
+                continue
+            clients = getattr(self._local, "clients", None)
+            if clients is None:
+                clients = self._local.clients = {}
+            if index not in clients:
+                session = _session_class()(self.health, route)
+                api = YouTubeTranscriptApi(proxy_config=self._proxy_configs[index], http_client=session)
+                clients[index] = (api, session)
+            api, session = clients[index]
+            return route, api, session
+        return None
+
+    def fetch(self, video_id: str) -> TranscriptResult:
+        import requests
+        from youtube_transcript_api._errors import (
+            NoTranscriptFound, RequestBlocked, TranscriptsDisabled, VideoUnavailable, YouTubeRequestFailed,
+        )
+
+        client = self._next_client()
+        if client is None:
+            if metrics.enabled():
+                metrics.counter("host_fast_fail_total").inc(host="youtube")
+            return TranscriptResult(video_id=video_id, error="CircuitOpen: mọi đường tới YouTube đang tạm ngưng")
+        route, api, session = client
+        session.reset()
+
+        with metrics.track("transcript_fetch") as tracked:
+            try:
+                transcript = api.fetch(video_id, languages=TRANSCRIPT_LANGUAGES)
+                self.health.record_success(route, session.slowest)
+                text = " ".join([snippet.text for snippet in transcript.snippets])
+                return TranscriptResult(video_id=video_id, text=text)
+            except (TranscriptsDisabled, NoTranscriptFound, VideoUnavailable):
+                self.health.record_success(route, session.slowest)
+                tracked.set(outcome="unavailable")
+                print(f"Video {video_id}: Không có phụ đề.")
+                return TranscriptResult(video_id=video_id, unavailable=True)
+            except (RequestBlocked, YouTubeRequestFailed, requests.RequestException) as e:
+                # Bị chặn (IpBlocked là RequestBlocked) thì ngắt proxy ngay; lỗi HTTP / mạng đếm dần
+                blocked = isinstance(e, RequestBlocked)
+                response = session.last_response
+                retry_after = None
+                if response is not None and response.status_code in (429, 503):
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                self.health.record_failure(route, type(e).__name__, retry_after=retry_after, trip=blocked)
+                tracked.set(outcome="blocked" if blocked else "error")
+                print(f"Lỗi khi lấy transcript {video_id} qua {route}: {type(e).__name__}")
+                return TranscriptResult(video_id=video_id, error=str(e))
+            except Exception as e:
+                tracked.set(outcome="error")
+                print(f"Lỗi không xác định khi lấy transcript {video_id}: {str(e)}")
+                return TranscriptResult(video_id=video_id, error=str(e))
+
+    async def afetch(self, video_id: str) -> TranscriptResult:
+        """Bản async của fetch: chạy trên thread pool của fetcher, không chặn event loop."""
+        return await asyncio.wrap_future(self._executor.submit(self.fetch, video_id))
+
+    def fetch_many(self, video_ids: List[str]) -> Dict[str, TranscriptResult]:
+        return {result.video_id: result for result in self._executor.map(self.fetch, video_ids)}
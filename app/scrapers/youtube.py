@@ -1,11 +1,12 @@
 from datetime import datetime, timedelta, timezone
-from typing import Optional, List
-import os
-import feedparser
+from typing import Awaitable, Callable, Optional, List, Set
+import asyncio
 from pydantic import BaseModel
-from youtube_transcript_api import YouTubeTranscriptApi
-from youtube_transcript_api._errors import TranscriptsDisabled, NoTranscriptFound
-from youtube_transcript_api.proxies import WebshareProxyConfig
+
+from .. import metrics
+from .feed_reader import read_feed
+from .fetcher import AsyncFetcher
+from .transcripts import TranscriptFetcher
 
 class Transcript(BaseModel):
     text: str
@@ -16,21 +17,16 @@ class ChannelVideo(BaseModel):
     video_id: str
     published_at: datetime
     description: str
+    channel_id: Optional[str] = None
     transcript: Optional[str] = None
     
 class YoutubeScraper:
-    def __init__(self):
-        proxy_config = None
-        proxy_usename = os.getenv('PROXY_USERNAME')
-        proxy_password = os.getenv('PROXY_PASSWORD')
+    def __init__(self, fetcher: Optional[AsyncFetcher] = None, transcript_fetcher: Optional[TranscriptFetcher] = None):
+        # Dùng chung fetcher (connection pool + giới hạn đồng thời) nếu được truyền vào
+        self.fetcher = fetcher or AsyncFetcher()
 
-        if proxy_usename and proxy_password:
-            proxy_config = WebshareProxyConfig(
-                proxy_username=proxy_usename,
-                proxy_password=proxy_password
-            )
-        
-        self.transcript_api = YouTubeTranscriptApi(proxy_config=proxy_config)
+        # Thread pool + proxy pool cho transcript (xem transcripts.TranscriptFetcher)
+        self.transcript_fetcher = transcript_fetcher or TranscriptFetcher()
         
     def _get_rss_url(self, chanel_id: str) -> str:
         return f"https://www.youtube.com/feeds/videos.xml?channel_id={chanel_id}"
@@ -45,57 +41,84 @@ class YoutubeScraper:
         return video_url
     
     def get_transcript(self, video_id: str) -> Optional[Transcript]:
-        try: 
-            transcript = self.transcript_api.fetch(video_id, languages=['vi', 'en'])
-            text = " ".join([snippet.text for snippet in transcript.snippets])
-            return Transcript(text=text)
-        except (TranscriptsDisabled, NoTranscriptFound):
-            print(f"Video {video_id}: Không có phụ đề.")
-            return None
-        except Exception as e:
-            print(f"Lỗi không xác định khi lấy transcript {video_id}: {str(e)}")
-            return None
+        result = self.transcript_fetcher.fetch(video_id)
+        return Transcript(text=result.text) if result.text else None
         
-    def get_latest_videos(self, channel_id: str, hours: int = 24) -> List[ChannelVideo]:
-        # 1. Lấy dữ liệu từ RSS
-        feed = feedparser.parse(self._get_rss_url(channel_id))
-        if not feed.entries:
+    async def aget_latest_videos(
+        self, channel_id: str, hours: int = 24, since: Optional[datetime] = None, strict: bool = False
+    ) -> List[ChannelVideo]:
+        # since: mốc (watermark) thay cho `hours`, chỉ lấy video đăng sau mốc này
+        # strict=True: ném RuntimeError khi không tải được feed thay vì trả về danh sách rỗng
+        # 1. Lấy dữ liệu từ RSS (qua fetcher để có timeout và headers)
+        response = await self.fetcher.fetch(self._get_rss_url(channel_id))
+        if strict and (response.error or not response.ok):
+            raise RuntimeError(response.error or f"HTTP {response.status_code}")
+        if response.error:
+            print(f"Error fetching RSS for channel {channel_id}: {response.error}")
             return []
-        
+
         # 2. Thiết lập mốc thời gian chặn
-        cutoff_time = datetime.now(timezone.utc) - timedelta(hours=hours)
-        videos = []
+        cutoff_time = since or datetime.now(timezone.utc) - timedelta(hours=hours)
+
+        # 3. Đọc streaming, dừng khi đã qua mốc (feed kênh xếp mới nhất trước).
+        # Cả khi 304 (content là bản trong cache): video lần trước ghi lỗi phải được thử lại,
+        # video đã lưu bị get_existing_video_ids loại ra
+        with metrics.track("feed_parse"):
+            entries = read_feed(response.content, cutoff=cutoff_time)
 
-        # 3. Duyệt và lọc
-        for entry in feed.entries:
+        videos = []
+        for entry in entries:
             if "/shorts" in entry.link:
                 continue
-            
-            # Chuyển đổi thời gian từ RSS sang datetime object
-            published_time = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
-            
-            if published_time >= cutoff_time:
+            videos.append(ChannelVideo(
+                title=entry.title,
+                url=entry.link,
                 # Trích xuất video_id bằng hàm đã viết trước đó
-                v_id = self._extract_video_id(entry.link)
-                
-                videos.append(ChannelVideo(
-                    title=entry.title,           
-                    url=entry.link,               
-                    video_id=v_id,               
-                    published_at=published_time,
-                    description=entry.get("summary", "")
-                ))
+                video_id=self._extract_video_id(entry.link),
+                published_at=entry.published,
+                description=entry.summary,
+                channel_id=channel_id
+            ))
 
         return videos
+
+    async def ascrape_channel(
+        self,
+        channel_id: str,
+        hours: int = 24,
+        exclude_existing: Optional[Callable[[list[str]], Awaitable[Set[str]]]] = None,
+    ) -> list[ChannelVideo]:
+        """
+        exclude_existing: hàm async nhận danh sách video_id, trả về các id đã lưu trong DB
+        (async để truy vấn DB không chặn event loop).
+        Những video này được bỏ qua trước khi gọi API transcript.
+        """
+        videos = await self.aget_latest_videos(channel_id, hours)
+        if exclude_existing and videos:
+            existing_ids = await exclude_existing([video.video_id for video in videos])
+            videos = [video for video in videos if video.video_id not in existing_ids]
+        # youtube_transcript_api là thư viện đồng bộ: chạy trên thread pool giới hạn của TranscriptFetcher
+        transcripts = await asyncio.to_thread(
+            self.transcript_fetcher.fetch_many, [video.video_id for video in videos]
+        )
+        return [
+            video.model_copy(update={"transcript": transcripts[video.video_id].text})
+            for video in videos
+        ]
+
+    def get_latest_videos(self, channel_id: str, hours: int = 24) -> List[ChannelVideo]:
+        async def _run():
+            async with self.fetcher:
+                return await self.aget_latest_videos(channel_id, hours=hours)
+
+        return asyncio.run(_run())
     
     def scrape_channel(self, channel_id: str, hours: int = 24) -> list[ChannelVideo]:
-        videos = self.get_latest_videos(channel_id, hours)
-        res = []
-        for video in videos:
-            transcript = self.get_transcript(video.video_id)
-            res.append(video.model_copy(update={"transcript": transcript.text if transcript else None}))
-            
-        return res
+        async def _run():
+            async with self.fetcher:
+                return await self.ascrape_channel(channel_id, hours=hours)
+
+        return asyncio.run(_run())
     
 if __name__ == "__main__":
     scraper = YoutubeScraper()
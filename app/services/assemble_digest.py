@@ -0,0 +1,129 @@
+"""
+Dựng bản tin tổng hợp: gom các digest cùng một câu chuyện và xếp theo độ nóng
+(số nguồn đưa tin + độ mới), thay cho danh sách phẳng theo created_at.
+
+    python app/services/assemble_digest.py --hours 24 --top 20
+"""
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional
+import argparse
+import logging
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+import numpy as np
+from pydantic import BaseModel
+
+from app.database.repository import Repository
+from app.dedup.clustering import (
+    FEATURE_VERSION, SIMILARITY_THRESHOLD, FeatureMatrix, connected_components, decode_features,
+    encode_features, hashed_features, rank_clusters, similar_pairs,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class StoryCluster(BaseModel):
+    # Digest gần tâm cụm nhất, dùng làm tin chính
+    representative: Dict[str, Any]
+    # Mọi digest của câu chuyện (gồm cả representative), gần tâm nhất trước
+    digests: List[Dict[str, Any]]
+    size: int
+    latest_at: datetime
+    score: float
+
+
+def _load_vectors(repo: Repository, rows: List[Dict[str, Any]]) -> List[tuple]:
+    """Vector đặc trưng của từng digest: lấy từ cache, chỉ tính (và lưu) cho digest mới."""
+    missing = [row["id"] for row in rows if row["terms"] is None]
+    computed = {}
+    if missing:
+        summaries = repo.get_digest_summaries(missing)
+        titles = {row["id"]: row["title"] for row in rows}
+        computed = {
+            digest_id: hashed_features(f"{titles[digest_id]}\n{summaries.get(digest_id, '')}")
+            for digest_id in missing
+        }
+        to_save = []
+        for digest_id, (terms, tf) in computed.items():
+            terms_bytes, tf_bytes = encode_features(terms, tf)
+            to_save.append({"digest_id": digest_id, "version": FEATURE_VERSION, "terms": terms_bytes, "tf": tf_bytes})
+        repo.save_digest_vectors(to_save)
+    return [
+        computed[row["id"]] if row["terms"] is None else decode_features(row["terms"], row["tf"])
+        for row in rows
+    ]
+
+
+def assemble_digest(
+    hours: int = 24,
+    threshold: float = SIMILARITY_THRESHOLD,
+    limit: Optional[int] = None,
+    repo: Optional[Repository] = None,
+) -> List[StoryCluster]:
+    """Các câu chuyện trong `hours` giờ gần nhất, quan trọng nhất trước (tối đa `limit`)."""
+    if repo is not None:
+        return _assemble_digest(repo, hours, threshold, limit)
+    with Repository() as repo:
+        return _assemble_digest(repo, hours, threshold, limit)
+
+
+def _assemble_digest(repo: Repository, hours: int, threshold: float, limit: Optional[int]) -> List[StoryCluster]:
+    started = time.perf_counter()
+    rows = repo.get_recent_digest_vectors(hours, FEATURE_VERSION)
+    if not rows:
+        return []
+    cached = sum(1 for row in rows if row["terms"] is not None)
+    vectors = _load_vectors(repo, rows)
+    loaded = time.perf_counter()
+
+    matrix = FeatureMatrix(vectors)
+    weights, df = matrix.tfidf()
+    dense = matrix.project(weights)
+    pairs = similar_pairs(dense, matrix.signature_groups(weights, df), threshold)
+    labels = connected_components(matrix.n, pairs)
+
+    now = datetime.now(timezone.utc)
+    created = [
+        row["created_at"] if row["created_at"].tzinfo else row["created_at"].replace(tzinfo=timezone.utc)
+        for row in rows
+    ]
+    age_hours = np.array([(now - created_at).total_seconds() / 3600 for created_at in created])
+    ranked = rank_clusters(labels, dense, age_hours)[:limit]
+
+    clusters = []
+    for members, score in ranked:
+        digests = [{key: value for key, value in rows[i].items() if key not in ("terms", "tf")} for i in members]
+        clusters.append(StoryCluster(
+            representative=digests[0],
+            digests=digests,
+            size=len(members),
+            latest_at=max(created[i] for i in members),
+            score=score,
+        ))
+
+    logger.info(
+        f"Assembled {len(rows)} digests ({cached} cached vectors) into {len(np.unique(labels))} stories "
+        f"({len(pairs)} similar pairs) | load {loaded - started:.2f}s, cluster {time.perf_counter() - loaded:.2f}s"
+    )
+    return clusters
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    parser = argparse.ArgumentParser(description="Gom digest theo câu chuyện và xếp hạng")
+    parser.add_argument("--hours", type=int, default=24)
+    parser.add_argument("--top", type=int, default=20, help="Số câu chuyện hiển thị")
+    parser.add_argument("--threshold", type=float, default=SIMILARITY_THRESHOLD, help="Ngưỡng cosine")
+    args = parser.parse_args()
+
+    for rank, cluster in enumerate(assemble_digest(args.hours, args.threshold, limit=args.top), start=1):
+        print(f"{rank:>2}. [{cluster.size} nguồn] {cluster.representative['title']}")
+        print(f"    {cluster.representative['url']}")
@@ -1,11 +1,16 @@
-from typing import Optional
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Dict, List, Optional
 import logging
+import os
 import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from app.agent.summarizer import DigestAgent
+from app import metrics
+from app.agent.cache import DigestCache
+from app.agent.rate_limiter import RateLimiter
+from app.agent.summarizer import DigestAgent, DigestOutput
 from app.database.repository import Repository
 
 logging.basicConfig(
@@ -16,55 +21,141 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
-def process_digests(limit: Optional[int] = None) -> dict:
-    agent = DigestAgent()
-    repo = Repository()
-    
-    articles = repo.get_articles_without_digest(limit=limit)
-    total = len(articles)
+def process_digests(
+    limit: Optional[int] = None,
+    workers: Optional[int] = None,
+    requests_per_minute: Optional[int] = None,
+    tokens_per_minute: Optional[int] = None,
+    write_batch_size: int = 20,
+    batch_size: int = 8,
+    repo: Optional[Repository] = None,
+    agent: Optional[DigestAgent] = None,
+) -> dict:
+    """repo / agent: truyền vào để dùng DB hoặc endpoint khác (vd: benchmark); mặc định tự tạo."""
+    workers = workers or int(os.getenv("DIGEST_WORKERS", "4"))
+    if agent is None:
+        rate_limiter = RateLimiter(
+            requests_per_minute=requests_per_minute or int(os.getenv("GEMINI_RPM", "60")),
+            tokens_per_minute=tokens_per_minute or int(os.getenv("GEMINI_TPM", "250000")),
+        )
+        agent = DigestAgent(rate_limiter=rate_limiter, cache=DigestCache())
+    if repo is not None:
+        return _process_digests(repo, agent, limit, workers, write_batch_size, batch_size)
+    # Repository tự tạo thì đóng khi xong để trả kết nối về pool
+    with Repository() as repo:
+        return _process_digests(repo, agent, limit, workers, write_batch_size, batch_size)
+
+
+def _process_digests(
+    repo: Repository,
+    agent: DigestAgent,
+    limit: Optional[int],
+    workers: int,
+    write_batch_size: int,
+    batch_size: int,
+) -> dict:
+    cache = agent.cache
+
+    # Stream theo trang từ DB thay vì nạp toàn bộ danh sách vào bộ nhớ
+    articles = repo.iter_articles_without_digest(limit=limit)
+    total = 0
     processed = 0
     failed = 0
+    pending_writes: List[Dict[str, Any]] = []
     
-    logger.info(f"Starting digest processing for {total} articles")
-    
-    for idx, article in enumerate(articles, 1):
-        article_type = article["type"]
-        article_id = article["id"]
-        article_title = article["title"][:60] + "..." if len(article["title"]) > 60 else article["title"]
-        
-        logger.info(f"[{idx}/{total}] Processing {article_type}: {article_title} (ID: {article_id})")
-        
+    logger.info(f"Starting digest processing (limit={limit}, workers={workers})")
+
+    def flush_writes() -> None:
+        if pending_writes:
+            repo.bulk_create_digests(pending_writes)
+            pending_writes.clear()
+
+    def collect(batch: List[Dict[str, Any]], future: Future) -> None:
+        nonlocal processed, failed
         try:
-            digest_result = agent.generate_digest(
-                title=article["title"],
-                content=article["content"],
-                article_type=article_type
-            )
-            
+            digest_results: Dict[str, Optional[DigestOutput]] = future.result()
+        except Exception as e:
+            failed += len(batch)
+            logger.error(f"✗ Error processing batch of {len(batch)} articles: {e}")
+            return
+
+        for article in batch:
+            article_type = article["type"]
+            article_id = article["id"]
+            digest_result = digest_results.get(f"{article_type}:{article_id}")
             if digest_result:
-                repo.create_digest(
-                    article_type=article_type,
-                    article_id=article_id,
-                    url=article["url"],
-                    title=digest_result.title,
-                    summary=digest_result.summary,
-                    published_at=article.get("published_at")
-                )
+                pending_writes.append({
+                    "article_type": article_type,
+                    "article_id": article_id,
+                    "url": article["url"],
+                    "title": digest_result.title,
+                    "summary": digest_result.summary,
+                    "published_at": article.get("published_at"),
+                })
                 processed += 1
                 logger.info(f"✓ Successfully created digest for {article_type} {article_id}")
             else:
                 failed += 1
                 logger.warning(f"✗ Failed to generate digest for {article_type} {article_id}")
-        except Exception as e:
-            failed += 1
-            logger.error(f"✗ Error processing {article_type} {article_id}: {e}")
+
+        if len(pending_writes) >= write_batch_size:
+            flush_writes()
+
+    def summarize_batch(items: List[Dict[str, Any]]) -> Dict[str, Optional[DigestOutput]]:
+        with metrics.span("summarize", items=len(items)):
+            return agent.generate_digests(items)
+
+    def submit(pool: ThreadPoolExecutor, batch: List[Dict[str, Any]]) -> Future:
+        # DigestAgent tự gộp các bài ngắn vào chung request, bài dài đi riêng
+        return pool.submit(summarize_batch, [
+            {
+                "key": f"{article['type']}:{article['id']}",
+                "title": article["title"],
+                "content": article["content"],
+                "article_type": article["type"],
+            }
+            for article in batch
+        ])
+
+    # Các worker chỉ gọi LLM; mọi thao tác DB (đọc stream, ghi theo lô) nằm ở thread chính
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        in_flight: Dict[Future, List[Dict[str, Any]]] = {}
+        batch: List[Dict[str, Any]] = []
+        for idx, article in enumerate(articles, 1):
+            total = idx
+            article_title = article["title"][:60] + "..." if len(article["title"]) > 60 else article["title"]
+            logger.info(f"[{idx}] Processing {article['type']}: {article_title} (ID: {article['id']})")
+
+            batch.append(article)
+            if len(batch) < batch_size:
+                continue
+            in_flight[submit(pool, batch)] = batch
+            batch = []
+
+            # Giới hạn số việc đang chờ để không kéo cả backlog vào bộ nhớ
+            if len(in_flight) >= workers * 2:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    collect(in_flight.pop(future), future)
+
+        if batch:
+            in_flight[submit(pool, batch)] = batch
+
+        for future in list(in_flight):
+            collect(in_flight.pop(future), future)
+
+    flush_writes()
     
     logger.info(f"Processing complete: {processed} processed, {failed} failed out of {total} total")
+    if cache:
+        logger.info(f"Digest cache: {cache.hits} hits, {cache.misses} misses (hit rate {cache.hit_rate:.1%})")
+    metrics.write_report()
     
     return {
         "total": total,
         "processed": processed,
-        "failed": failed
+        "failed": failed,
+        "cache": cache.stats() if cache else {},
     }
 
 
@@ -73,4 +164,3 @@ if __name__ == "__main__":
     print(f"Total articles: {result['total']}")
     print(f"Processed: {result['processed']}")
     print(f"Failed: {result['failed']}")
-
@@ -5,15 +5,14 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
-from app.scrapers.youtube import YoutubeScraper
+from app import metrics
+from app.scrapers.transcripts import TranscriptFetcher
 from app.database.repository import Repository
+from app.dedup.simhash import simhash
 
 
-TRANSCRIPT_UNAVAILABLE_MARKER = "__UNAVAILABLE__"
-
-
-def process_youtube_transcripts(limit: Optional[int] = None) -> dict:
-    scraper = YoutubeScraper()
+def process_youtube_transcripts(limit: Optional[int] = None, batch_size: int = 50) -> dict:
+    fetcher = TranscriptFetcher()
     repo = Repository()
     
     videos = repo.get_youtube_videos_without_transcript(limit=limit)
@@ -21,19 +20,28 @@ def process_youtube_transcripts(limit: Optional[int] = None) -> dict:
     unavailable = 0
     failed = 0
     
-    for video in videos:
-        try:
-            transcript_result = scraper.get_transcript(video.video_id)
-            if transcript_result:
-                repo.update_youtube_video_transcript(video.video_id, transcript_result.text)
-                processed += 1
-            else:
-                repo.update_youtube_video_transcript(video.video_id, TRANSCRIPT_UNAVAILABLE_MARKER)
-                unavailable += 1
-        except Exception as e:
-            repo.update_youtube_video_transcript(video.video_id, TRANSCRIPT_UNAVAILABLE_MARKER)
-            unavailable += 1
-            print(f"Error processing video {video.video_id}: {e}")
+    try:
+        for start in range(0, len(videos), batch_size):
+            video_ids = [video.video_id for video in videos[start:start + batch_size]]
+            # Lấy song song trên thread pool (xoay vòng proxy), ghi DB theo lô
+            results = fetcher.fetch_many(video_ids)
+
+            found = {video_id: r.text for video_id, r in results.items() if r.text}
+            missing = [video_id for video_id, r in results.items() if not r.text]
+            repo.bulk_update_youtube_transcripts(found)
+            # Không đánh dấu vĩnh viễn: hẹn giờ thử lại theo backoff
+            repo.mark_transcripts_unavailable(missing)
+
+            fingerprints = [("youtube", video_id, simhash(text)) for video_id, text in found.items()]
+            repo.register_fingerprints([f for f in fingerprints if f[2] is not None])
+
+            processed += len(found)
+            unavailable += sum(1 for r in results.values() if r.unavailable)
+            failed += sum(1 for r in results.values() if r.error)
+    finally:
+        fetcher.close()
+        repo.close()
+        metrics.write_report()
     
     return {
         "total": len(videos),
@@ -49,4 +57,3 @@ if __name__ == "__main__":
     print(f"Processed: {result['processed']}")
     print(f"Unavailable: {result['unavailable']}")
     print(f"Failed: {result['failed']}")
-
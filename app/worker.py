@@ -0,0 +1,297 @@
+"""
+Worker lấy việc từ hàng đợi `jobs` trong DB, chạy được nhiều tiến trình trên nhiều máy.
+
+Loại việc (kind) và khóa (key):
+    youtube_channel   channel_id     cào feed kênh + transcript (Pipeline, không tóm tắt)
+    news_feed         rss_url        cào feed báo + tải bài (Pipeline, không tóm tắt)
+    transcript        video_id       lấy lại transcript cho video đã tới hạn thử lại
+    digest            "<type>:<id>"  tóm tắt bằng LLM
+
+Mỗi worker nhận một lô việc bằng SELECT ... FOR UPDATE SKIP LOCKED (Repository.claim_jobs)
+và giữ lease; một thread heartbeat gia hạn lease trong lúc chạy. Worker chết giữa chừng
+thì lease hết hạn và việc được worker khác nhận lại. Kết quả ghi DB đều idempotent
+(ON CONFLICT DO NOTHING / bỏ qua mục đã có digest) nên chạy lại một việc không sinh dữ liệu trùng.
+
+    python app/worker.py enqueue                        # đưa việc vào hàng đợi (chạy bằng cron)
+    python app/worker.py run --kinds digest --processes 4
+    python app/worker.py run --drain                    # chạy hết việc rồi thoát
+    python app/worker.py status
+"""
+import argparse
+import asyncio
+import logging
+import multiprocessing
+import os
+import socket
+import sys
+import threading
+import time
+import uuid
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app import metrics
+from app.config import YOUTUBE_CHANNELS, NEWS_RSS_FEEDS
+from app.database.repository import Repository
+from app.dedup.simhash import simhash
+
+logger = logging.getLogger(__name__)
+
+SCRAPE_KINDS = ("youtube_channel", "news_feed")
+JOB_KINDS = SCRAPE_KINDS + ("transcript", "digest")
+# Số việc mỗi lần nhận, theo loại
+JOB_BATCH_SIZES = {"youtube_channel": 10, "news_feed": 10, "transcript": 8, "digest": 8}
+DEFAULT_LEASE = timedelta(seconds=int(os.getenv("JOB_LEASE_SECONDS", "300")))
+# Thời gian ngủ khi hàng đợi rỗng
+DEFAULT_POLL_INTERVAL = 5.0
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+
+
+def enqueue_pending(repo: Repository, kinds: Optional[List[str]] = None) -> Dict[str, int]:
+    """
+    Đưa việc vào hàng đợi: cào mọi nguồn trong config, lấy lại transcript cho video
+    đã tới hạn, tóm tắt mọi nội dung chưa có digest. Gọi lặp lại an toàn (idempotent).
+    """
+    kinds = list(kinds or JOB_KINDS)
+    enqueued = {}
+    if "youtube_channel" in kinds:
+        enqueued["youtube_channel"] = repo.enqueue_jobs("youtube_channel", list(YOUTUBE_CHANNELS))
+    if "news_feed" in kinds:
+        enqueued["news_feed"] = repo.enqueue_jobs("news_feed", list(NEWS_RSS_FEEDS))
+    if "transcript" in kinds:
+        video_ids = [row.video_id for row in repo.get_youtube_videos_without_transcript()]
+        enqueued["transcript"] = repo.enqueue_jobs("transcript", video_ids)
+    if "digest" in kinds:
+        keys = [f"{item['type']}:{item['id']}" for item in repo.iter_articles_without_digest(with_content=False)]
+        enqueued["digest"] = repo.enqueue_jobs("digest", keys)
+    return enqueued
+
+
+class JobWorker:
+    def __init__(
+        self,
+        kinds: Optional[List[str]] = None,
+        batch_sizes: Optional[Dict[str, int]] = None,
+        lease: timedelta = DEFAULT_LEASE,
+        poll_interval: float = DEFAULT_POLL_INTERVAL,
+        worker_id: Optional[str] = None,
+        repo: Optional[Repository] = None,
+        hours: int = 24,
+    ):
+        self.kinds = list(kinds or JOB_KINDS)
+        self.batch_sizes = {**JOB_BATCH_SIZES, **(batch_sizes or {})}
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.worker_id = worker_id or default_worker_id()
+        self.hours = hours
+        self._owns_repo = repo is None
+        self.repo = repo or Repository()
+        self._agent = None
+        self._transcript_fetcher = None
+        self.handlers: Dict[str, Callable[[List[str]], Dict[str, str]]] = {
+            "youtube_channel": lambda keys: self._handle_scrape(channels=keys),
+            "news_feed": lambda keys: self._handle_scrape(feeds=keys),
+            "transcript": self._handle_transcripts,
+            "digest": self._handle_digests,
+        }
+        self.stats = {"done": 0, "failed": 0}
+
+    def close(self) -> None:
+        if self._transcript_fetcher is not None:
+            self._transcript_fetcher.close()
+        if self._owns_repo:
+            self.repo.close()
+
+    # --- VÒNG LẶP ---
+    def run(self, drain: bool = False, max_batches: Optional[int] = None) -> Dict[str, int]:
+        """Nhận và xử lý việc tới khi bị dừng; drain=True: thoát khi hàng đợi rỗng."""
+        batches = 0
+        logger.info(f"Worker {self.worker_id} started (kinds: {', '.join(self.kinds)})")
+        while max_batches is None or batches < max_batches:
+            claimed_any = False
+            for kind in self.kinds:
+                jobs = self.repo.claim_jobs([kind], self.worker_id, self.batch_sizes[kind], self.lease)
+                if jobs:
+                    claimed_any = True
+                    batches += 1
+                    self.process(kind, jobs)
+            if not claimed_any:
+                if drain:
+                    break
+                time.sleep(self.poll_interval)
+        logger.info(f"Worker {self.worker_id} stopped: {self.stats['done']} done, {self.stats['failed']} failed")
+        return dict(self.stats)
+
+    def process(self, kind: str, jobs: List[Dict[str, Any]]) -> None:
+        keys = {job["key"]: job["id"] for job in jobs}
+        stop = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(list(keys.values()), stop), daemon=True)
+        heartbeat.start()
+        try:
+            with metrics.track("job_batch", kind=kind):
+                failures = self.handlers[kind](list(keys))
+        except Exception as e:
+            logger.error(f"{kind}: batch of {len(jobs)} jobs failed: {e}")
+            self.repo.session.rollback()
+            failures = {key: f"{type(e).__name__}: {e}" for key in keys}
+        finally:
+            stop.set()
+            heartbeat.join()
+
+        done = [job_id for key, job_id in keys.items() if key not in failures]
+        self.repo.complete_jobs(done, self.worker_id)
+        self.repo.fail_jobs({keys[key]: error for key, error in failures.items() if key in keys}, self.worker_id)
+        self.stats["done"] += len(done)
+        self.stats["failed"] += len(failures)
+        metrics.counter("jobs_total").inc(len(done), kind=kind, outcome="done")
+        metrics.counter("jobs_total").inc(len(failures), kind=kind, outcome="failed")
+        logger.info(f"{kind}: {len(done)} done, {len(failures)} failed")
+
+    def _heartbeat(self, job_ids: List[str], stop: threading.Event) -> None:
+        # Session riêng (cùng engine): Session của worker đang được thread chính dùng
+        interval = self.lease.total_seconds() / 3
+        while not stop.wait(interval):
+            try:
+                with Session(bind=self.repo.session.get_bind()) as session:
+                    Repository(session).extend_job_leases(job_ids, self.worker_id, self.lease)
+            except Exception as e:
+                logger.warning(f"Extending leases failed: {e}")
+
+    # --- XỬ LÝ THEO LOẠI VIỆC (trả về {key: lỗi} của các việc thất bại) ---
+    def _handle_scrape(self, channels: List[str] = (), feeds: List[str] = ()) -> Dict[str, str]:
+        from app.pipeline import Pipeline
+
+        pipeline = Pipeline(hours=self.hours, channels=list(channels), feeds=list(feeds), summarize=False)
+        asyncio.run(pipeline.run())
+        # Chỉ đưa vào hàng đợi các mục lượt này vừa lưu; backlog cũ do `enqueue` định kỳ quét
+        self.repo.enqueue_jobs("digest", pipeline.unsummarized)
+        return {key: "fetch failed" for key in [*channels, *feeds] if key not in pipeline.observed}
+
+    def _handle_transcripts(self, video_ids: List[str]) -> Dict[str, str]:
+        if self._transcript_fetcher is None:
+            from app.scrapers.transcripts import TranscriptFetcher
+            self._transcript_fetcher = TranscriptFetcher()
+        results = self._transcript_fetcher.fetch_many(video_ids)
+
+        found = {video_id: r.text for video_id, r in results.items() if r.text}
+        self.repo.bulk_update_youtube_transcripts(found)
+        # Video chưa có phụ đề tự hẹn giờ thử lại; `enqueue` đưa vào hàng đợi khi tới hạn
+        self.repo.mark_transcripts_unavailable([video_id for video_id, r in results.items() if not r.text])
+        fingerprints = [("youtube", video_id, simhash(text)) for video_id, text in found.items()]
+        duplicates = self.repo.register_fingerprints([f for f in fingerprints if f[2] is not None])
+        self.repo.enqueue_jobs("digest", [f"youtube:{video_id}" for video_id in found if f"youtube:{video_id}" not in duplicates])
+        return {}
+
+    def _get_agent(self):
+        if self._agent is None:
+            from app.agent.cache import DigestCache
+            from app.agent.rate_limiter import RateLimiter
+            from app.agent.summarizer import DigestAgent
+
+            # Hạn mức chia đều cho các worker (GEMINI_RPM / GEMINI_TPM là hạn mức của cả project)
+            processes = int(os.getenv("JOB_WORKER_PROCESSES", "1"))
+            self._agent = DigestAgent(
+                rate_limiter=RateLimiter(
+                    requests_per_minute=max(1, int(os.getenv("GEMINI_RPM", "60")) // processes),
+                    tokens_per_minute=max(1, int(os.getenv("GEMINI_TPM", "250000")) // processes),
+                ),
+                cache=DigestCache(),
+            )
+        return self._agent
+
+    def _handle_digests(self, keys: List[str]) -> Dict[str, str]:
+        items = self.repo.get_articles_for_digest(keys)
+        if not items:
+            return {}
+        digests = self._get_agent().generate_digests([
+            {
+                "key": f"{item['type']}:{item['id']}",
+                "title": item["title"],
+                "content": item["content"],
+                "article_type": item["type"],
+            }
+            for item in items
+        ])
+        rows = []
+        failures = {}
+        for item in items:
+            key = f"{item['type']}:{item['id']}"
+            digest = digests.get(key)
+            if digest is None:
+                failures[key] = "no digest returned"
+                continue
+            rows.append({
+                "article_type": item["type"],
+                "article_id": item["id"],
+                "url": item["url"],
+                "title": digest.title,
+                "summary": digest.summary,
+                "published_at": item["published_at"],
+            })
+        self.repo.bulk_create_digests(rows)
+        return failures
+
+
+def _run_process(kinds: List[str], drain: bool) -> None:
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    worker = JobWorker(kinds=kinds)
+    try:
+        worker.run(drain=drain)
+    finally:
+        worker.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Worker cho hàng đợi việc trong DB")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    enqueue_parser = subparsers.add_parser("enqueue", help="Đưa việc vào hàng đợi")
+    enqueue_parser.add_argument("--kinds", default=",".join(JOB_KINDS))
+    run_parser = subparsers.add_parser("run", help="Chạy worker")
+    run_parser.add_argument("--kinds", default=",".join(JOB_KINDS))
+    run_parser.add_argument("--processes", type=int, default=1, help="Số tiến trình worker trên máy này")
+    run_parser.add_argument("--drain", action="store_true", help="Thoát khi hàng đợi rỗng")
+    subparsers.add_parser("status", help="Số việc theo loại và trạng thái")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    if args.command in ("enqueue", "run"):
+        kinds = [kind.strip() for kind in args.kinds.split(",") if kind.strip()]
+        unknown = set(kinds) - set(JOB_KINDS)
+        if unknown:
+            parser.error(f"Unknown job kind(s): {', '.join(sorted(unknown))}")
+
+    if args.command == "enqueue":
+        with Repository() as repo:
+            for kind, count in enqueue_pending(repo, kinds).items():
+                print(f"{kind}: {count} job(s) enqueued")
+    elif args.command == "status":
+        with Repository() as repo:
+            for kind, counts in sorted(repo.job_counts().items()):
+                print(f"{kind}: " + ", ".join(f"{status} {n}" for status, n in sorted(counts.items())))
+    elif args.processes <= 1:
+        _run_process(kinds, args.drain)
+    else:
+        # spawn: mỗi tiến trình tự tạo engine / pool kết nối riêng
+        os.environ["JOB_WORKER_PROCESSES"] = str(args.processes)
+        context = multiprocessing.get_context("spawn")
+        processes = [context.Process(target=_run_process, args=(kinds, args.drain)) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
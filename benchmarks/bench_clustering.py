@@ -0,0 +1,120 @@
+"""
+Benchmark dựng bản tin theo câu chuyện (app/services/assemble_digest.py) trên SQLite tạm.
+
+Sinh N digest trong 24h thuộc các câu chuyện "cài sẵn": mỗi câu chuyện có bộ từ riêng
+(tên riêng, sự kiện), số nguồn đưa tin theo phân phối Zipf (phần lớn chỉ 1 nguồn);
+mỗi digest lấy một phần bộ từ đó trộn với từ phổ biến. Đo:
+    cold   lần đầu: tính vector cho mọi digest + gom cụm
+    warm   lần sau: vector lấy từ cache digest_vectors, chỉ gom cụm
+và chất lượng so với câu chuyện cài sẵn (precision / recall theo cặp).
+
+    python benchmarks/bench_clustering.py                 # 50.000 digest
+    python benchmarks/bench_clustering.py --digests 5000
+"""
+import argparse
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import numpy as np
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app.database.migrations import upgrade
+from app.database.repository import Repository
+from app.services.assemble_digest import assemble_digest
+from bench_search import make_vocabulary
+
+STORY_WORDS = 40
+COMMON_WORDS = 2000
+FILLER_WORDS = 30
+INSERT_BATCH_SIZE = 2000
+
+
+def make_digests(count: int, rng: random.Random, now: datetime) -> List[Dict]:
+    vocabulary = make_vocabulary(60_000, rng)
+    common, specific = vocabulary[:COMMON_WORDS], vocabulary[COMMON_WORDS:]
+    common_weights = [1.0 / rank for rank in range(1, COMMON_WORDS + 1)]
+
+    digests = []
+    story = 0
+    while len(digests) < count:
+        # Số nguồn đưa cùng câu chuyện: Zipf, phần lớn là 1
+        sources = min(count - len(digests), int(rng.paretovariate(1.5)), 50)
+        # Nội dung cốt lõi của câu chuyện: từ riêng (tên, sự kiện) xen từ phổ biến
+        core = [
+            rng.choice(specific) if rng.random() < 0.4 else rng.choices(common, weights=common_weights)[0]
+            for _ in range(STORY_WORDS)
+        ]
+        published = now - timedelta(minutes=rng.randrange(24 * 60 - 30))
+        for source in range(sources):
+            # Mỗi nguồn kể lại theo cách riêng: bỏ bớt ~30% nội dung cốt lõi, thêm câu của riêng mình
+            kept = [word for word in core if rng.random() > 0.3]
+            filler = rng.choices(common, weights=common_weights, k=FILLER_WORDS)
+            cut = rng.randrange(len(kept) + 1)
+            digests.append({
+                "article_type": "news",
+                "article_id": f"{story}-{source}",
+                "url": f"https://example.com/{story}/{source}",
+                "title": " ".join(kept[:8]).capitalize(),
+                "summary": " ".join(kept[:cut] + filler + kept[cut:]),
+                "published_at": published + timedelta(minutes=rng.randrange(30)),
+                "story": story,
+            })
+        story += 1
+    return digests
+
+
+def pair_scores(truth: np.ndarray, predicted: np.ndarray):
+    """Precision / recall theo cặp (hai digest cùng cụm) qua bảng đồng xuất hiện."""
+    def same_cluster_pairs(labels):
+        _, counts = np.unique(labels, return_counts=True)
+        return int((counts * (counts - 1) // 2).sum())
+
+    joint = same_cluster_pairs(truth.astype(np.int64) * (predicted.max() + 1) + predicted)
+    predicted_pairs, true_pairs = same_cluster_pairs(predicted), same_cluster_pairs(truth)
+    return joint / max(predicted_pairs, 1), joint / max(true_pairs, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--digests", type=int, default=50_000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    digests = make_digests(args.digests, rng, now)
+    story_of = {f"news:{d['article_id']}": d["story"] for d in digests}
+
+    with tempfile.TemporaryDirectory(prefix="bench-cluster-") as tmp:
+        engine = create_engine(f"sqlite:///{Path(tmp) / 'cluster.sqlite3'}")
+        upgrade(engine)
+        repo = Repository(Session(engine))
+        print(f"Inserting {len(digests)} digests ({len(set(story_of.values()))} planted stories)...")
+        for start in range(0, len(digests), INSERT_BATCH_SIZE):
+            repo.bulk_create_digests(digests[start:start + INSERT_BATCH_SIZE])
+
+        for run in ("cold", "warm"):
+            started = time.perf_counter()
+            clusters = assemble_digest(hours=24, repo=repo)
+            elapsed = time.perf_counter() - started
+
+            ids = [d["id"] for cluster in clusters for d in cluster.digests]
+            predicted = np.repeat(np.arange(len(clusters)), [cluster.size for cluster in clusters])
+            truth = np.array([story_of[digest_id] for digest_id in ids])
+            precision, recall = pair_scores(truth, predicted)
+            print(f"{run:<5} {elapsed:6.2f}s  {len(clusters)} stories, top size {clusters[0].size}, "
+                  f"pair precision {precision:.3f}, recall {recall:.3f}")
+        repo.close()
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
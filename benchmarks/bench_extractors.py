@@ -0,0 +1,74 @@
+"""
+Benchmark bộ bóc tách nội dung trên một thư mục trang HTML đã lưu.
+
+    python benchmarks/bench_extractors.py path/to/pages --url https://congan.com.vn/ --processes 4
+
+--url quyết định SITE_RULES nào được dùng (bỏ trống => fallback chung).
+--compare-bs4 chạy thêm cách cũ (BeautifulSoup + html.parser) để so sánh.
+"""
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.scrapers.extractors import extract_article_text
+
+
+def _extract_lxml(pages, url):
+    for page in pages:
+        extract_article_text(page, url)
+
+
+def _extract_bs4(pages, url):
+    from bs4 import BeautifulSoup
+
+    for page in pages:
+        soup = BeautifulSoup(page, "html.parser")
+        content_div = soup.find("div", class_="noi-dung")
+        paragraphs = content_div.find_all("p") if content_div else soup.find_all("p")
+        " ".join(p.get_text().strip() for p in paragraphs)
+
+
+def _run(func, pages, url, processes):
+    start = time.perf_counter()
+    if processes == 1:
+        func(pages, url)
+    else:
+        shards = [pages[i::processes] for i in range(processes)]
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            list(pool.map(func, shards, [url] * processes))
+    elapsed = time.perf_counter() - start
+    pages_per_second = len(pages) / elapsed
+    return elapsed, pages_per_second, pages_per_second / processes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("corpus", help="Thư mục chứa các file .html")
+    parser.add_argument("--url", default="", help="URL mẫu để chọn cấu hình theo domain")
+    parser.add_argument("--processes", type=int, default=1)
+    parser.add_argument("--repeat", type=int, default=1, help="Lặp lại corpus để đo ổn định hơn")
+    parser.add_argument("--compare-bs4", action="store_true")
+    args = parser.parse_args()
+
+    pages = [path.read_bytes() for path in sorted(Path(args.corpus).glob("**/*.htm*"))] * args.repeat
+    if not pages:
+        sys.exit(f"No .html files found in {args.corpus}")
+    processes = max(1, min(args.processes, os.cpu_count() or 1))
+
+    candidates = [("lxml extractor", _extract_lxml)]
+    if args.compare_bs4:
+        candidates.append(("bs4 html.parser", _extract_bs4))
+
+    print(f"{len(pages)} pages, {processes} process(es)")
+    for name, func in candidates:
+        elapsed, pages_per_second, per_core = _run(func, pages, args.url, processes)
+        print(f"{name:<16} {elapsed:8.2f}s  {pages_per_second:10.1f} pages/s  {per_core:10.1f} pages/s/core")
+
+
+if __name__ == "__main__":
+    main()
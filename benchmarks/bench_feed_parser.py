@@ -0,0 +1,113 @@
+"""
+Microbenchmark: feed_reader.read_feed (streaming, dừng sớm) so với feedparser.parse + lọc.
+
+Sinh feed RSS 2.0 và Atom (kiểu YouTube) với N mục, mỗi mục cách nhau 7 phút, mới nhất trước;
+đo thời gian và bộ nhớ cấp phát đỉnh (tracemalloc) với:
+    recent   mốc 24h: chỉ ~200 mục đầu được lấy, read_feed dừng sớm
+    all      không có mốc: cả hai đều đọc hết feed
+
+Đồng thời kiểm tra hai cách cho cùng danh sách (link, ngày đăng).
+
+    python benchmarks/bench_feed_parser.py
+    python benchmarks/bench_feed_parser.py --items 20000 --repeat 3
+"""
+import argparse
+import statistics
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from pathlib import Path
+from typing import Callable, List, Optional, Tuple
+
+import feedparser
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.scrapers.feed_reader import FeedEntry, read_feed
+
+ITEM_SPACING = timedelta(minutes=7)
+DESCRIPTION = "Mô tả ngắn của bài viết về trí tuệ nhân tạo và mô hình ngôn ngữ. " * 8
+
+
+def make_rss(items: int, now: datetime) -> bytes:
+    body = "".join(
+        f"<item><title>Bài {i}</title><link>https://example.com/bai-{i}</link>"
+        f"<pubDate>{format_datetime(now - ITEM_SPACING * i)}</pubDate>"
+        f"<description>{DESCRIPTION}</description></item>"
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+        f"<title>Feed</title>{body}</channel></rss>"
+    ).encode("utf-8")
+
+
+def make_atom(items: int, now: datetime) -> bytes:
+    body = "".join(
+        f"<entry><title>Video {i}</title>"
+        f"<link rel='alternate' href='https://www.youtube.com/watch?v=vid{i}'/>"
+        f"<published>{(now - ITEM_SPACING * i).isoformat()}</published>"
+        f"<media:group><media:description>{DESCRIPTION}</media:description></media:group></entry>"
+        for i in range(items)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:media="http://search.yahoo.com/mrss/">'
+        f"{body}</feed>"
+    ).encode("utf-8")
+
+
+def with_feedparser(content: bytes, cutoff: Optional[datetime]) -> List[Tuple[str, datetime]]:
+    # Cách làm trước đây: parse toàn bộ rồi mới lọc theo published_parsed
+    result = []
+    for entry in feedparser.parse(content).entries:
+        published = datetime(*entry.published_parsed[:6], tzinfo=timezone.utc)
+        if cutoff is None or published >= cutoff:
+            result.append((entry.link, published))
+    return result
+
+
+def with_feed_reader(content: bytes, cutoff: Optional[datetime]) -> List[Tuple[str, datetime]]:
+    entries: List[FeedEntry] = read_feed(content, cutoff=cutoff)
+    return [(entry.link, entry.published) for entry in entries]
+
+
+def measure(fn: Callable, content: bytes, cutoff: Optional[datetime], repeat: int) -> Tuple[float, float, list]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(content, cutoff)
+        timings.append(time.perf_counter() - start)
+    tracemalloc.start()
+    fn(content, cutoff)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings) * 1000, peak / 1024 / 1024, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--items", type=int, default=5000, help="Số mục mỗi feed")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    now = datetime.now(timezone.utc).replace(microsecond=0)
+    feeds = {"rss": make_rss(args.items, now), "atom": make_atom(args.items, now)}
+    cases = {"recent": now - timedelta(hours=24), "all": None}
+
+    print(f"{'feed':<6}{'case':<8}{'parser':<13}{'items':>7}{'ms':>10}{'peak MB':>10}{'speedup':>9}")
+    for feed_name, content in feeds.items():
+        for case_name, cutoff in cases.items():
+            baseline_ms, baseline_mb, expected = measure(with_feedparser, content, cutoff, args.repeat)
+            ms, mb, result = measure(with_feed_reader, content, cutoff, args.repeat)
+            if result != expected:
+                print(f"MISMATCH on {feed_name}/{case_name}: {len(result)} vs {len(expected)} entries")
+                sys.exit(1)
+            print(f"{feed_name:<6}{case_name:<8}{'feedparser':<13}{len(expected):>7}{baseline_ms:>10.1f}{baseline_mb:>10.1f}")
+            print(f"{'':<14}{'feed_reader':<13}{len(result):>7}{ms:>10.1f}{mb:>10.1f}{baseline_ms / ms:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
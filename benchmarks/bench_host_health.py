@@ -0,0 +1,95 @@
+"""
+Benchmark circuit breaker của AsyncFetcher (app/scrapers/host_health.py) với host hỏng chạy local.
+
+Mỗi kịch bản tải N bài (như một feed có N mục) từ một host:
+    hang       nhận kết nối nhưng không bao giờ trả lời (site chết / treo)
+    forbidden  luôn trả 403 (bị chặn anti-bot)
+    throttled  luôn trả 429 kèm Retry-After: 60
+    healthy    trả 200 sau 20ms (kiểm tra breaker không làm chậm host tốt)
+và in thời gian, số request thật sự tới server, số request bị bỏ qua ngay (CircuitOpen).
+--baseline chạy thêm với breaker tắt (hành vi cũ) để so sánh — kịch bản hang
+tốn khoảng N / per_host_limit x timeout giây.
+
+    python benchmarks/bench_host_health.py
+    python benchmarks/bench_host_health.py --entries 50 --baseline
+"""
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.scrapers.fetcher import AsyncFetcher
+from app.scrapers.host_health import HostHealth
+
+RESPONSES = {
+    "forbidden": b"HTTP/1.1 403 Forbidden\r\nContent-Length: 0\r\n\r\n",
+    "throttled": b"HTTP/1.1 429 Too Many Requests\r\nRetry-After: 60\r\nContent-Length: 0\r\n\r\n",
+    "healthy": b"HTTP/1.1 200 OK\r\nContent-Type: text/html\r\nContent-Length: 8\r\n\r\nxin chao",
+}
+
+
+class NoBreaker(HostHealth):
+    """Hành vi trước khi có breaker: luôn gửi request, timeout cố định."""
+
+    def acquire(self, host: str) -> float:
+        return 0.0
+
+    def timeout(self, host: str, default=None) -> float:
+        return default if default is not None else self.default_timeout
+
+
+async def start_host(kind: str, hits: dict):
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while await reader.readuntil(b"\r\n\r\n"):
+                hits[kind] += 1
+                if kind == "hang":
+                    await asyncio.sleep(3600)
+                if kind == "healthy":
+                    await asyncio.sleep(0.02)
+                writer.write(RESPONSES[kind])
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, "127.0.0.1", 0)
+
+
+async def run_scenario(kind: str, entries: int, timeout: float, breaker: bool) -> None:
+    hits = {kind: 0}
+    server = await start_host(kind, hits)
+    port = server.sockets[0].getsockname()[1]
+    health = HostHealth(default_timeout=timeout) if breaker else NoBreaker(default_timeout=timeout)
+
+    start = time.perf_counter()
+    async with AsyncFetcher(timeout=timeout, health=health) as fetcher:
+        results = await fetcher.fetch_many([f"http://127.0.0.1:{port}/article/{i}" for i in range(entries)])
+    elapsed = time.perf_counter() - start
+    server.close()
+
+    fast_failed = sum(1 for r in results if r.error and r.error.startswith("CircuitOpen"))
+    ok = sum(1 for r in results if r.ok)
+    state = health.snapshot()[0].state
+    print(f"{kind:<10}{'on' if breaker else 'off':>8}{elapsed:>10.2f}{hits[kind]:>8}{fast_failed:>11}{ok:>6}  {state}")
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=50, help="Số bài tải từ mỗi host")
+    parser.add_argument("--timeout", type=float, default=10.0, help="Timeout mặc định của fetcher (giây)")
+    parser.add_argument("--baseline", action="store_true", help="Chạy thêm với breaker tắt")
+    args = parser.parse_args()
+
+    print(f"{'scenario':<10}{'breaker':>8}{'seconds':>10}{'hits':>8}{'fast-fail':>11}{'ok':>6}  state")
+    for kind in ("hang", "forbidden", "throttled", "healthy"):
+        for breaker in ((True, False) if args.baseline else (True,)):
+            await run_scenario(kind, args.entries, args.timeout, breaker)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,402 @@
+"""
+Benchmark offline cho scraper, transcript, ghi DB và tóm tắt, dùng server giả lập
+(benchmarks/fakes.py) và một DB SQLite tạm. Không gọi site thật hay Gemini thật.
+
+    python benchmarks/bench_pipeline.py                       # mọi kịch bản, quy mô đầy đủ
+    python benchmarks/bench_pipeline.py --scale 0.1 feeds db  # chạy nhanh 2 kịch bản
+    python benchmarks/bench_pipeline.py --output bench.json --compare baseline.json
+
+Kịch bản (quy mô đầy đủ):
+    feeds        1.000 feed RSS x 10 bài: đọc RSS + tải/bóc trang bài viết
+    transcripts  200 kênh YouTube x 10 video: đọc feed kênh + lấy transcript
+    db           100.000 bài báo: bulk insert + duyệt danh sách chưa có digest
+    digests      backlog 10.000 bài: process_digests với endpoint LLM giả lập
+
+Mỗi stage báo items/s, độ trễ p50/p99 (ms, tính cả thời gian chờ suất đồng thời)
+và RSS đỉnh (MB). Kết quả ghi ra JSON;
+--compare so với một file kết quả cũ và trả exit code 1 nếu throughput giảm quá ngưỡng.
+--metrics bật app.metrics và đính kèm báo cáo metrics vào JSON (so với lần chạy không
+có --metrics để thấy chi phí của instrumentation).
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from pydantic import BaseModel
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+from app import metrics
+from fakes import FakeConfig, FakeServerProcess, HttpTranscriptFetcher
+
+# Throughput giảm quá ngưỡng này so với baseline thì coi là regression
+DEFAULT_TOLERANCE = 0.2
+RSS_SAMPLE_INTERVAL = 0.02
+
+
+class StageResult(BaseModel):
+    items: int
+    seconds: float
+    items_per_second: float
+    p50_ms: Optional[float] = None
+    p99_ms: Optional[float] = None
+    peak_rss_mb: float
+    rss_growth_mb: float
+
+
+def _current_rss_bytes() -> int:
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Không có /proc (macOS...): dùng đỉnh toàn tiến trình
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return maxrss if sys.platform == "darwin" else maxrss * 1024
+
+
+def _percentile(sorted_values: List[float], fraction: float) -> float:
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class Stage:
+    """Đo một stage: số mục, thời gian, độ trễ từng thao tác và RSS đỉnh (lấy mẫu bằng thread nền)."""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.items = 0
+        self.latencies: List[float] = []
+
+    @contextmanager
+    def timed(self, items: int = 1):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.latencies.append(time.perf_counter() - start)
+            self.items += items
+
+    def record(self, seconds: float, items: int = 1) -> None:
+        self.latencies.append(seconds)
+        self.items += items
+
+    @contextmanager
+    def run(self, results: Dict[str, StageResult]):
+        start_rss = peak_rss = _current_rss_bytes()
+        stop = threading.Event()
+
+        def sample() -> None:
+            nonlocal peak_rss
+            while not stop.wait(RSS_SAMPLE_INTERVAL):
+                peak_rss = max(peak_rss, _current_rss_bytes())
+
+        sampler = threading.Thread(target=sample, daemon=True)
+        sampler.start()
+        start = time.perf_counter()
+        try:
+            yield self
+        finally:
+            elapsed = time.perf_counter() - start
+            stop.set()
+            sampler.join()
+            peak_rss = max(peak_rss, _current_rss_bytes())
+
+            latencies = sorted(self.latencies)
+            results[self.name] = StageResult(
+                items=self.items,
+                seconds=round(elapsed, 3),
+                items_per_second=round(self.items / elapsed, 1) if elapsed else 0.0,
+                p50_ms=round(_percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+                p99_ms=round(_percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+                peak_rss_mb=round(peak_rss / 1e6, 1),
+                rss_growth_mb=round((peak_rss - start_rss) / 1e6, 1),
+            )
+            print(f"  {self.name}: {results[self.name].model_dump()}")
+
+
+def _sqlite_engine(workdir: Path, name: str):
+    from app.database.migrations import upgrade
+
+    engine = create_engine(f"sqlite:///{workdir / name}")
+    upgrade(engine)
+    return engine
+
+
+# --- KỊCH BẢN ---
+def scenario_feeds(server: FakeServerProcess, scale: float, workdir: Path) -> Dict[str, StageResult]:
+    from app.scrapers.fetcher import AsyncFetcher
+    from app.scrapers.news import WebScraper
+
+    feed_count = max(1, int(1000 * scale))
+    results: Dict[str, StageResult] = {}
+
+    async def run() -> None:
+        # Mọi "host" giả lập đều là 127.0.0.1: bỏ giới hạn theo host, chỉ giữ giới hạn toàn cục
+        async with AsyncFetcher(per_host_limit=1024) as fetcher:
+            scraper = WebScraper(fetcher=fetcher)
+
+            async def list_feed(feed: int):
+                start = time.perf_counter()
+                entries = await scraper.alist_rss_entries(f"{server.base_url}/rss/{feed}", hours=24 * 365)
+                rss_stage.record(time.perf_counter() - start)
+                return entries
+
+            async def fetch_article(entry):
+                start = time.perf_counter()
+                article = await scraper.afetch_article(entry)
+                if article.content:
+                    extract_stage.record(time.perf_counter() - start)
+                return article
+
+            rss_stage = Stage("rss")
+            with rss_stage.run(results):
+                feeds = await asyncio.gather(*(list_feed(i) for i in range(feed_count)))
+            entries = [entry for entries in feeds for entry in entries]
+
+            extract_stage = Stage("extract")
+            with extract_stage.run(results):
+                await asyncio.gather(*(fetch_article(entry) for entry in entries))
+
+    asyncio.run(run())
+    return results
+
+
+def scenario_transcripts(server: FakeServerProcess, scale: float, workdir: Path) -> Dict[str, StageResult]:
+    from app.scrapers.fetcher import AsyncFetcher
+    from app.scrapers.youtube import YoutubeScraper
+
+    channel_count = max(1, int(200 * scale))
+    results: Dict[str, StageResult] = {}
+    transcript_fetcher = HttpTranscriptFetcher(server.base_url)
+
+    async def run() -> None:
+        # Mọi "host" giả lập đều là 127.0.0.1: bỏ giới hạn theo host, chỉ giữ giới hạn toàn cục
+        async with AsyncFetcher(per_host_limit=1024) as fetcher:
+            scraper = YoutubeScraper(fetcher=fetcher, transcript_fetcher=transcript_fetcher)
+            scraper._get_rss_url = lambda channel_id: f"{server.base_url}/youtube/{channel_id}"
+
+            async def list_channel(channel: int):
+                start = time.perf_counter()
+                videos = await scraper.aget_latest_videos(f"ch{channel}", hours=24 * 365)
+                feed_stage.record(time.perf_counter() - start)
+                return videos
+
+            async def fetch_transcript(video):
+                start = time.perf_counter()
+                result = await transcript_fetcher.afetch(video.video_id)
+                transcript_stage.record(time.perf_counter() - start, items=1 if result.text else 0)
+
+            feed_stage = Stage("youtube_rss")
+            with feed_stage.run(results):
+                channels = await asyncio.gather(*(list_channel(i) for i in range(channel_count)))
+            videos = [video for videos in channels for video in videos]
+
+            transcript_stage = Stage("transcript")
+            with transcript_stage.run(results):
+                await asyncio.gather(*(fetch_transcript(video) for video in videos))
+
+    try:
+        asyncio.run(run())
+    finally:
+        transcript_fetcher.close()
+    return results
+
+
+def _synthetic_articles(count: int, start: int = 0) -> List[Dict]:
+    now = datetime.now(timezone.utc)
+    return [
+        {
+            "title": f"Bài báo {i}",
+            "url": f"https://example.com/bai-{i}",
+            "source": "benchmark",
+            "published_at": now - timedelta(seconds=i),
+            "content": f"Nội dung bài {i}. " + "Trí tuệ nhân tạo và dữ liệu. " * 40,
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def scenario_db(server: FakeServerProcess, scale: float, workdir: Path) -> Dict[str, StageResult]:
+    from app.database.repository import BULK_CHUNK_SIZE, Repository
+
+    article_count = max(BULK_CHUNK_SIZE, int(100_000 * scale))
+    results: Dict[str, StageResult] = {}
+    repo = Repository(Session(_sqlite_engine(workdir, "db.sqlite3")))
+
+    insert_stage = Stage("bulk_insert")
+    with insert_stage.run(results):
+        for start in range(0, article_count, BULK_CHUNK_SIZE):
+            chunk = _synthetic_articles(min(BULK_CHUNK_SIZE, article_count - start), start)
+            with insert_stage.timed(items=len(chunk)):
+                repo.bulk_create_news_articles(chunk)
+
+    scan_stage = Stage("pending_scan")
+    with scan_stage.run(results):
+        iterator = repo.iter_articles_without_digest(batch_size=500, with_content=False)
+        while True:
+            start = time.perf_counter()
+            item = next(iterator, None)
+            if item is None:
+                break
+            scan_stage.record(time.perf_counter() - start)
+    repo.session.close()
+    return results
+
+
+def scenario_digests(server: FakeServerProcess, scale: float, workdir: Path) -> Dict[str, StageResult]:
+    os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+    os.environ["GEMINI_API_ENDPOINT"] = server.base_url
+
+    from app.agent.rate_limiter import RateLimiter
+    from app.agent.summarizer import DigestAgent
+    from app.database.repository import BULK_CHUNK_SIZE, Repository
+    from app.services.process_digest import logger as digest_logger, process_digests
+
+    # Log từng bài làm chậm chính benchmark
+    digest_logger.setLevel(logging.WARNING)
+
+    backlog = max(10, int(10_000 * scale))
+    results: Dict[str, StageResult] = {}
+    repo = Repository(Session(_sqlite_engine(workdir, "digests.sqlite3")))
+    for start in range(0, backlog, BULK_CHUNK_SIZE):
+        repo.bulk_create_news_articles(_synthetic_articles(min(BULK_CHUNK_SIZE, backlog - start), start))
+
+    stage = Stage("summarize")
+
+    class TimedDigestAgent(DigestAgent):
+        def generate_digests(self, items):
+            start = time.perf_counter()
+            digests = super().generate_digests(items)
+            stage.record(time.perf_counter() - start, items=sum(1 for d in digests.values() if d))
+            return digests
+
+    # Không cache, hạn mức rất cao: đo chính pipeline chứ không đo rate limiter
+    agent = TimedDigestAgent(
+        rate_limiter=RateLimiter(requests_per_minute=1_000_000, tokens_per_minute=10**12),
+        cache=None,
+        backoff_base=0.05,
+    )
+    calls_before = server.stats()["llm_calls"]
+    with stage.run(results):
+        process_digests(repo=repo, agent=agent, write_batch_size=100)
+    print(f"  summarize: {server.stats()['llm_calls'] - calls_before} LLM requests for {backlog} items")
+    repo.session.close()
+    return results
+
+
+SCENARIOS: Dict[str, Callable[[FakeServerProcess, float, Path], Dict[str, StageResult]]] = {
+    "feeds": scenario_feeds,
+    "transcripts": scenario_transcripts,
+    "db": scenario_db,
+    "digests": scenario_digests,
+}
+
+
+# --- SO SÁNH VỚI BASELINE ---
+def compare(current: Dict, baseline: Dict, tolerance: float) -> List[str]:
+    regressions = []
+    for scenario, stages in current["scenarios"].items():
+        for stage, result in stages.items():
+            previous = baseline.get("scenarios", {}).get(scenario, {}).get(stage)
+            if not previous or not previous.get("items_per_second"):
+                continue
+            change = result["items_per_second"] / previous["items_per_second"] - 1
+            line = (
+                f"{scenario}/{stage}: {previous['items_per_second']} -> "
+                f"{result['items_per_second']} items/s ({change:+.1%})"
+            )
+            print(line)
+            if change < -tolerance:
+                regressions.append(line)
+    return regressions
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=Path(__file__).parent,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("scenarios", nargs="*", help=f"Kịch bản cần chạy: {', '.join(SCENARIOS)} (mặc định: tất cả)")
+    parser.add_argument("--scale", type=float, default=1.0, help="Hệ số quy mô (0.1 = nhanh gấp ~10 lần)")
+    parser.add_argument("--latency-ms", type=float, default=None, help="Ghi đè độ trễ trang bài viết / feed")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Tỉ lệ lỗi 503 của server giả lập")
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="Tỉ lệ lỗi 429 của LLM giả lập")
+    parser.add_argument("--output", help="Ghi kết quả JSON ra file")
+    parser.add_argument("--compare", help="File JSON kết quả cũ để so sánh")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE)
+    parser.add_argument("--metrics", action="store_true", help="Bật app.metrics và ghi kèm báo cáo metrics")
+    args = parser.parse_args()
+    if args.metrics:
+        metrics.enable()
+
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"Unknown scenario(s): {', '.join(sorted(unknown))}")
+
+    config = FakeConfig(error_rate=args.error_rate, llm_error_rate=args.llm_error_rate)
+    if args.latency_ms is not None:
+        config.feed_latency = config.article_latency = args.latency_ms / 1000
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_revision": _git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "scale": args.scale,
+            "fake_config": config.model_dump(),
+            "metrics_enabled": metrics.enabled(),
+        },
+        "scenarios": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="bench-") as tmp, FakeServerProcess(config) as server:
+        workdir = Path(tmp)
+        for name in args.scenarios or list(SCENARIOS):
+            print(f"[{name}]")
+            stages = SCENARIOS[name](server, args.scale, workdir)
+            report["scenarios"][name] = {stage: result.model_dump() for stage, result in stages.items()}
+    if metrics.enabled():
+        report["metrics"] = metrics.run_report()
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        Path(args.output).write_text(output, encoding="utf-8")
+    else:
+        print(output)
+
+    if args.compare:
+        baseline = json.loads(Path(args.compare).read_text(encoding="utf-8"))
+        regressions = compare(report, baseline, args.tolerance)
+        if regressions:
+            print(f"{len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Benchmark tìm kiếm toàn văn (Repository.search) trên kho tài liệu tổng hợp.
+
+Sinh N tài liệu tiếng Việt có dấu (tiêu đề + thân bài), tần suất từ theo phân phối Zipf
+như văn bản thật, ghi qua Repository._index_documents (cùng đường ghi với lúc cào) rồi đo
+độ trễ p50/p99 của từng loại query:
+    common       1 từ rất phổ biến (khớp phần lớn kho, tốn nhất khi xếp hạng)
+    rare         1 từ hiếm
+    two_terms    2 từ tần suất trung bình (AND)
+    recent       từ trung bình + lọc since 7 ngày
+    deep_page    từ trung bình, trang thứ 11 (offset 200)
+
+Mặc định dùng SQLite tạm (FTS5); --database-url để chạy trên Postgres (tsvector + GIN).
+Tài liệu benchmark có ref "bench-..." và được xóa sau khi chạy trên DB ngoài.
+
+    python benchmarks/bench_search.py                    # 1.000.000 tài liệu
+    python benchmarks/bench_search.py --docs 50000 --queries 50
+    python benchmarks/bench_search.py --database-url postgresql://.../news_bench
+"""
+import argparse
+import itertools
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Dict, List
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+
+from app.database.migrations import upgrade
+from app.database.repository import Repository
+
+INSERT_BATCH_SIZE = 5000
+TITLE_WORDS = 10
+BODY_WORDS = 80
+KINDS = ["news", "news", "youtube", "digest"]
+
+ONSETS = ["", "b", "c", "ch", "d", "đ", "g", "gi", "h", "k", "kh", "l", "m", "n", "ng", "nh",
+          "ph", "qu", "r", "s", "t", "th", "tr", "v", "x"]
+RHYMES = ["a", "à", "á", "ả", "ã", "ạ", "ai", "an", "ang", "anh", "ao", "ăn", "âm", "ân", "ất",
+          "e", "ê", "ếu", "i", "iên", "inh", "o", "ô", "ông", "ơ", "ời", "u", "uệ", "ưa", "ước",
+          "ương", "ữu", "y", "yến", "uân", "oan", "ọc", "ết", "ình", "ệ"]
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    """Âm tiết tiếng Việt giả (phụ âm đầu + vần có dấu), xáo trộn rồi gán thứ hạng Zipf theo thứ tự."""
+    syllables = [onset + rhyme for onset, rhyme in itertools.product(ONSETS, RHYMES)]
+    words = syllables + [f"{a}{b}" for a, b in itertools.product(syllables, repeat=2)]
+    rng.shuffle(words)
+    return words[:size]
+
+
+def make_documents(count: int, vocabulary: List[str], rng: random.Random, now: datetime):
+    cum_weights = list(itertools.accumulate(1.0 / rank for rank in range(1, len(vocabulary) + 1)))
+    for i in range(count):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=TITLE_WORDS + BODY_WORDS)
+        yield {
+            "kind": rng.choice(KINDS),
+            "ref": f"bench-{i}",
+            "title": " ".join(words[:TITLE_WORDS]).capitalize(),
+            "url": f"https://example.com/bench/{i}",
+            "published_at": now - timedelta(minutes=rng.randrange(365 * 24 * 60)),
+            "body": " ".join(words[TITLE_WORDS:]),
+        }
+
+
+def load(repo: Repository, count: int, vocabulary: List[str], rng: random.Random, now: datetime) -> float:
+    """Ghi kho tài liệu theo lô, trả về số tài liệu/giây (gồm cả chuẩn hóa văn bản)."""
+    start = time.perf_counter()
+    documents = make_documents(count, vocabulary, rng, now)
+    while True:
+        batch = list(itertools.islice(documents, INSERT_BATCH_SIZE))
+        if not batch:
+            break
+        repo._index_documents([
+            repo._search_row(d["kind"], d["ref"], d["title"], d["url"], d["published_at"], d["body"])
+            for d in batch
+        ])
+        repo.session.commit()
+        print(f"\r  indexed {batch[-1]['ref'][6:]}", end="", flush=True)
+    print()
+    return count / (time.perf_counter() - start)
+
+
+def query_cases(vocabulary: List[str], now: datetime) -> Dict[str, List[dict]]:
+    common = vocabulary[:5]
+    middle = vocabulary[200:400]
+    rare = vocabulary[-500:]
+    return {
+        "common": [{"query": word} for word in common],
+        "rare": [{"query": word} for word in rare],
+        "two_terms": [{"query": f"{a} {b}"} for a, b in zip(middle[::2], middle[1::2])],
+        "recent": [{"query": word, "since": now - timedelta(days=7)} for word in middle],
+        "deep_page": [{"query": word, "offset": 200} for word in middle],
+    }
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, round(fraction * (len(ordered) - 1)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1_000_000, help="Số tài liệu trong kho")
+    parser.add_argument("--vocabulary", type=int, default=50_000, help="Số từ phân biệt")
+    parser.add_argument("--queries", type=int, default=100, help="Số query mỗi loại")
+    parser.add_argument("--database-url", help="DB để chạy (mặc định: SQLite tạm)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    now = datetime.now(timezone.utc)
+    vocabulary = make_vocabulary(args.vocabulary, rng)
+
+    with tempfile.TemporaryDirectory(prefix="bench-search-") as tmp:
+        engine = create_engine(args.database_url or f"sqlite:///{Path(tmp) / 'search.sqlite3'}")
+        upgrade(engine)
+        repo = Repository(Session(engine))
+        try:
+            print(f"Indexing {args.docs} documents ({engine.dialect.name})...")
+            docs_per_second = load(repo, args.docs, vocabulary, rng, now)
+            print(f"insert: {docs_per_second:,.0f} docs/s")
+            if engine.dialect.name == "postgresql":
+                with engine.begin() as conn:
+                    conn.execute(text("ANALYZE search_documents"))
+
+            print(f"{'query':<11}{'n':>5}{'p50 ms':>10}{'p99 ms':>10}{'avg hits':>10}")
+            for name, cases in query_cases(vocabulary, now).items():
+                cases = list(itertools.islice(itertools.cycle(cases), args.queries))
+                timings: List[float] = []
+                hits = 0
+                for case in cases:
+                    start = time.perf_counter()
+                    results = repo.search(limit=20, **case)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    hits += len(results)
+                print(f"{name:<11}{len(cases):>5}{percentile(timings, 0.5):>10.2f}"
+                      f"{percentile(timings, 0.99):>10.2f}{hits / len(cases):>10.1f}")
+                repo.session.rollback()
+        finally:
+            if args.database_url:
+                repo.session.execute(text("DELETE FROM search_documents WHERE ref LIKE 'bench-%'"))
+                repo.session.commit()
+            repo.close()
+            engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
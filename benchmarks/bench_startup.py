@@ -0,0 +1,99 @@
+"""
+Đo thời gian khởi động (import) của các entry point chạy bằng cron / worker.
+
+Mỗi module được import trong một tiến trình Python mới, lặp lại vài lần và lấy trung vị.
+Thoát với exit code 1 nếu vượt ngân sách thời gian hoặc nếu module nạp các SDK nặng
+lẽ ra phải được nạp trễ (Gemini SDK, driver DB, youtube_transcript_api).
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --runs 10 --budget-ms 800 --top 15
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).parent.parent
+
+# Ngân sách (ms) cho `import <module>` trong tiến trình mới, tính cả khởi động interpreter
+BUDGETS_MS = {
+    "app.runner": 1200,
+    "app.pipeline": 1200,
+    "app.scheduler": 1200,
+    "app.services.process_digest": 1200,
+    "app.services.process_youtube": 1200,
+}
+# Không được nạp lúc import: chỉ nạp khi thật sự dùng
+DEFERRED_MODULES = ("google.generativeai", "google.api_core", "psycopg2", "youtube_transcript_api")
+
+_PROBE = """
+import json, sys
+import {module}
+print(json.dumps(sorted(m for m in {deferred!r} if m in sys.modules)))
+"""
+
+
+def measure(module: str, runs: int) -> Dict[str, object]:
+    timings = []
+    loaded: List[str] = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-W", "ignore", "-c", _PROBE.format(module=module, deferred=DEFERRED_MODULES)],
+            cwd=ROOT, capture_output=True, text=True, check=True,
+        ).stdout
+        timings.append((time.perf_counter() - start) * 1000)
+        loaded = json.loads(output.strip().splitlines()[-1])
+    return {"median_ms": round(statistics.median(timings), 1), "min_ms": round(min(timings), 1), "deferred_loaded": loaded}
+
+
+def slowest_imports(module: str, top: int) -> List[str]:
+    """Các import tốn thời gian nhất (cộng dồn) theo `python -X importtime`."""
+    stderr = subprocess.run(
+        [sys.executable, "-W", "ignore", "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    ).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # Chỉ lấy các import trực tiếp của module (thụt lề đúng một cấp) để không đếm trùng
+        depth = (len(name) - len(name.lstrip())) // 2
+        if depth != 1:
+            continue
+        rows.append((int(cumulative), name.strip()))
+    rows.sort(reverse=True)
+    return [f"{us / 1000:8.1f} ms  {name}" for us, name in rows[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help=f"Module cần đo (mặc định: {', '.join(BUDGETS_MS)})")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None, help="Ghi đè ngân sách cho mọi module")
+    parser.add_argument("--top", type=int, default=0, help="In N import chậm nhất của mỗi module")
+    args = parser.parse_args()
+
+    failures = 0
+    for module in args.modules or list(BUDGETS_MS):
+        budget = args.budget_ms or BUDGETS_MS.get(module, 1200)
+        result = measure(module, args.runs)
+        over_budget = result["median_ms"] > budget
+        status = "FAIL" if over_budget or result["deferred_loaded"] else "OK  "
+        print(f"[{status}] {module}: {result['median_ms']} ms (min {result['min_ms']}, budget {budget:.0f})")
+        if result["deferred_loaded"]:
+            print(f"       loaded at import time: {', '.join(result['deferred_loaded'])}")
+        if status == "FAIL":
+            failures += 1
+        for line in slowest_imports(module, args.top) if args.top else []:
+            print(f"       {line}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,297 @@
+"""
+Server giả lập chạy local cho benchmark (không gọi site thật, không tốn tiền API).
+
+Một FakeServer phục vụ:
+    GET  /rss/<feed>                         RSS báo với `items_per_feed` bài
+    GET  /article/<feed>/<i>                 trang HTML bài viết
+    GET  /youtube/<channel>                  Atom feed của kênh YouTube
+    GET  /transcript/<video_id>              transcript dạng JSON (404 = không có phụ đề)
+    POST /v1beta/models/<model>:generateContent   endpoint Gemini (REST)
+
+    GET  /stats                              số liệu của server (số request LLM)
+
+Mỗi loại route có độ trễ và tỉ lệ lỗi cấu hình được (FakeConfig).
+Benchmark chạy server trong tiến trình riêng (FakeServerProcess) để server không
+tranh GIL với code đang được đo:
+
+    python benchmarks/fakes.py --port 8080
+"""
+import argparse
+import json
+import random
+import re
+import subprocess
+import sys
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Dict, Optional
+
+import httpx
+from pydantic import BaseModel
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.scrapers.transcripts import TranscriptFetcher, TranscriptResult
+
+WORDS = (
+    "trí tuệ nhân tạo mô hình ngôn ngữ dữ liệu huấn luyện suy luận hệ thống công bố "
+    "nghiên cứu kết quả hiệu năng người dùng sản phẩm thị trường chính sách an toàn"
+).split()
+
+
+class FakeConfig(BaseModel):
+    items_per_feed: int = 10
+    paragraphs_per_article: int = 20
+    transcript_words: int = 1500
+    # Độ trễ (giây) và tỉ lệ lỗi theo loại route
+    feed_latency: float = 0.005
+    article_latency: float = 0.01
+    transcript_latency: float = 0.02
+    llm_latency: float = 0.05
+    error_rate: float = 0.0
+    llm_error_rate: float = 0.0
+    # Tỉ lệ video không có phụ đề
+    transcript_missing_rate: float = 0.1
+    seed: int = 42
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "FakeServer"
+    protocol_version = "HTTP/1.1"
+    # Header và body được ghi riêng: tắt Nagle để keep-alive không dính delayed ACK (~40ms)
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args) -> None:
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str) -> None:
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _maybe_fail(self, latency: float, error_rate: float, status: int = 503) -> bool:
+        # Độ trễ dao động ±50% quanh giá trị cấu hình
+        time.sleep(latency * random.uniform(0.5, 1.5))
+        if error_rate and random.random() < error_rate:
+            body = json.dumps({"error": {"code": status, "message": "fake error", "status": "UNAVAILABLE"}})
+            self._send(status, body.encode("utf-8"), "application/json")
+            return True
+        return False
+
+    def do_GET(self) -> None:
+        config = self.server.config
+        parts = self.path.strip("/").split("/")
+        route = parts[0]
+        if route == "stats":
+            self._send(200, json.dumps({"llm_calls": self.server.llm_calls}).encode("utf-8"), "application/json")
+        elif route == "rss" and len(parts) == 2:
+            if not self._maybe_fail(config.feed_latency, config.error_rate):
+                self._send(200, self.server.rss(parts[1]), "application/rss+xml; charset=utf-8")
+        elif route == "article" and len(parts) == 3:
+            if not self._maybe_fail(config.article_latency, config.error_rate):
+                self._send(200, self.server.article(parts[1], parts[2]), "text/html; charset=utf-8")
+        elif route == "youtube" and len(parts) == 2:
+            if not self._maybe_fail(config.feed_latency, config.error_rate):
+                self._send(200, self.server.youtube_feed(parts[1]), "application/atom+xml; charset=utf-8")
+        elif route == "transcript" and len(parts) == 2:
+            if not self._maybe_fail(config.transcript_latency, config.error_rate):
+                body = self.server.transcript(parts[1])
+                if body is None:
+                    self._send(404, b"{}", "application/json")
+                else:
+                    self._send(200, body, "application/json")
+        else:
+            self._send(404, b"not found", "text/plain")
+
+    def do_POST(self) -> None:
+        config = self.server.config
+        payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if ":generateContent" not in self.path:
+            self._send(404, b"not found", "text/plain")
+            return
+        if self._maybe_fail(config.llm_latency, config.llm_error_rate, status=429):
+            return
+        self._send(200, self.server.generate(payload), "application/json")
+
+
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Benchmark mở rất nhiều kết nối cùng lúc
+    request_queue_size = 1024
+
+    def __init__(self, config: Optional[FakeConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        super().__init__((host, port), _Handler)
+        self.config = config or FakeConfig()
+        self.now = datetime.now(timezone.utc)
+        self.llm_calls = 0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeServer":
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+
+    def __enter__(self) -> "FakeServer":
+        return self.start()
+
+    def __exit__(self, *exc_info) -> None:
+        self.stop()
+
+    # --- NỘI DUNG TỔNG HỢP (tất định theo seed + id để chạy lại cho kết quả giống nhau) ---
+    def _rng(self, *key) -> random.Random:
+        return random.Random(f"{self.config.seed}:{':'.join(map(str, key))}")
+
+    def rss(self, feed: str) -> bytes:
+        items = []
+        for i in range(self.config.items_per_feed):
+            published = format_datetime(self.now - timedelta(minutes=i * 7))
+            items.append(
+                f"<item><title>Bài {feed}-{i}</title>"
+                f"<link>{self.base_url}/article/{feed}/{i}</link>"
+                f"<pubDate>{published}</pubDate></item>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><rss version="2.0"><channel>'
+            f"<title>Feed {feed}</title>{''.join(items)}</channel></rss>"
+        ).encode("utf-8")
+
+    def article(self, feed: str, index: str) -> bytes:
+        rng = self._rng("article", feed, index)
+        paragraphs = "".join(f"<p>{_text(rng, 40)}.</p>" for _ in range(self.config.paragraphs_per_article))
+        return (
+            f"<html><head><title>Bài {feed}-{index}</title></head><body>"
+            f"<nav><a href='/'>Trang chủ</a></nav>"
+            f"<div class='noi-dung'>{paragraphs}</div>"
+            f"<div class='related'><p>Tin liên quan {feed}</p></div>"
+            f"</body></html>"
+        ).encode("utf-8")
+
+    def youtube_feed(self, channel: str) -> bytes:
+        entries = []
+        for i in range(self.config.items_per_feed):
+            published = (self.now - timedelta(minutes=i * 30)).isoformat()
+            entries.append(
+                f"<entry><title>Video {channel}-{i}</title>"
+                f"<link rel='alternate' href='https://www.youtube.com/watch?v={channel}x{i}'/>"
+                f"<published>{published}</published><summary>Mô tả {i}</summary></entry>"
+            )
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?><feed xmlns="http://www.w3.org/2005/Atom">'
+            f"{''.join(entries)}</feed>"
+        ).encode("utf-8")
+
+    def transcript(self, video_id: str) -> Optional[bytes]:
+        rng = self._rng("transcript", video_id)
+        if rng.random() < self.config.transcript_missing_rate:
+            return None
+        words = _text(rng, self.config.transcript_words).split()
+        snippets = [{"text": " ".join(words[i:i + 12])} for i in range(0, len(words), 12)]
+        return json.dumps({"snippets": snippets}, ensure_ascii=False).encode("utf-8")
+
+    def generate(self, payload: Dict) -> bytes:
+        with self._lock:
+            self.llm_calls += 1
+        prompt = payload["contents"][-1]["parts"][0]["text"]
+        system = "".join(part.get("text", "") for part in payload.get("systemInstruction", {}).get("parts", []))
+        schema = payload.get("generationConfig", {}).get("responseSchema", {})
+        # Như model thật: dạng kết quả theo system instruction / responseSchema, không theo user prompt
+        ids = re.findall(r"^### id: (\d+)$", prompt, re.M)
+        if "JSON array" in system or "items" in schema:
+            output = [{"id": int(i), "title": f"Tiêu đề {i}", "summary": "Tóm tắt giả lập."} for i in ids]
+        else:
+            output = {"title": f"Tiêu đề ({len(prompt)} ký tự)", "summary": "Tóm tắt giả lập."}
+        response = {
+            "candidates": [{
+                "content": {"parts": [{"text": json.dumps(output, ensure_ascii=False)}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+        }
+        return json.dumps(response).encode("utf-8")
+
+
+class FakeServerProcess:
+    """Chạy FakeServer trong tiến trình con; dùng như context manager."""
+
+    def __init__(self, config: Optional[FakeConfig] = None):
+        self.config = config or FakeConfig()
+        self.base_url = ""
+        self._process: Optional[subprocess.Popen] = None
+
+    def __enter__(self) -> "FakeServerProcess":
+        self._process = subprocess.Popen(
+            [sys.executable, __file__, "--config", self.config.model_dump_json()],
+            stdout=subprocess.PIPE,
+            text=True,
+        )
+        # Dòng đầu tiên tiến trình con in ra là URL đang lắng nghe
+        self.base_url = self._process.stdout.readline().strip()
+        if not self.base_url:
+            self._process.kill()
+            raise RuntimeError("Fake server failed to start")
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self._process.terminate()
+        self._process.wait(timeout=10)
+
+    def stats(self) -> Dict[str, int]:
+        return httpx.get(f"{self.base_url}/stats").json()
+
+
+class HttpTranscriptFetcher(TranscriptFetcher):
+    """TranscriptFetcher lấy transcript từ FakeServer thay cho YouTube (giữ nguyên thread pool)."""
+
+    def __init__(self, base_url: str, max_workers: Optional[int] = None):
+        super().__init__(max_workers=max_workers, proxy_configs=[])
+        self.base_url = base_url
+        self._clients = threading.local()
+
+    def fetch(self, video_id: str) -> TranscriptResult:
+        client = getattr(self._clients, "client", None)
+        if client is None:
+            client = self._clients.client = httpx.Client(timeout=10.0)
+        try:
+            response = client.get(f"{self.base_url}/transcript/{video_id}")
+        except httpx.HTTPError as e:
+            return TranscriptResult(video_id=video_id, error=str(e))
+        if response.status_code == 404:
+            return TranscriptResult(video_id=video_id, unavailable=True)
+        if response.status_code != 200:
+            return TranscriptResult(video_id=video_id, error=f"HTTP {response.status_code}")
+        snippets = response.json()["snippets"]
+        return TranscriptResult(video_id=video_id, text=" ".join(s["text"] for s in snippets))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Chạy server giả lập cho benchmark")
+    parser.add_argument("--port", type=int, default=0)
+    parser.add_argument("--config", default="{}", help="FakeConfig dạng JSON")
+    args = parser.parse_args()
+
+    server = FakeServer(FakeConfig.model_validate_json(args.config), port=args.port)
+    print(server.base_url, flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
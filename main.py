@@ -1,8 +1,16 @@
-from app.runner import run_scrapers
+import logging
+
+from app.pipeline import run_pipeline
 
 def main(hours: int = 24):
-    result = run_scrapers(hours=hours)
-    print(f"Đã cào thành công {len(result['youtube'])} YouTube videos")
-    print(f"Đã cào thành công {len(result['news'])} bài báo.")
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        datefmt='%Y-%m-%d %H:%M:%S'
+    )
+    # fetch → extract → persist → transcript → summarize chạy chồng lên nhau qua queue có giới hạn
+    stats = run_pipeline(hours=hours)
+    print(f"Đã lưu {stats['persist'].processed} mục mới, lấy được {stats['transcript'].processed} transcript.")
+    print(f"Đã tạo {stats['summarize'].processed} bản tóm tắt.")
 if __name__ == "__main__":
-    main(hours=100)
\ No newline at end of file
+    main(hours=100)